@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+#
+# This module benchmarks the MPAS plotting programs on synthetic meshes,
+# so that performance changes can be measured offline and reproducibly.
+#
+# For each mesh size, the meshes are created with "make_mpasmesh.py" in the
+# work directory (once, they are reused by later runs), then the programs are
+# run with "--profile" and their stage timings are collected:
+#
+#   startup   plot_mpaspatch.py listing the variables, i.e. the start-up cost
+#   patches   get_mpaspatches.py building and writing the patch file
+#   frame     plot_mpaspatch.py for one 2D field, incl. the geometry loading
+#   levels    plot_mpaspatch.py for 3 levels of a 3D field, per-frame rendering
+#   max       plot_mpaspatch.py for the column maximum of a 3D field
+#   diff      plot_mpaspatch.py for the difference of two forecast files
+#
+# Each case is repeated and the fastest run is kept. The results can be saved
+# as a baseline and later runs compared against it, for example:
+#
+#   bench_mpas.py -w /scratch/bench -c 100k,1M --save baseline.json
+#   ... change the code ...
+#   bench_mpas.py -w /scratch/bench -c 100k,1M -b baseline.json
+#
+# A timing that is slower than the baseline by more than the tolerance is
+# reported as a regression and the exit status is 1. So is a "startup" case
+# slower than the start-up budget ("--startup-budget", seconds of the whole
+# process to the variable listing), with or without a baseline. The baselines depend on
+# the machine, so they should be created on the node type that is compared.
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+from netCDF4 import Dataset
+
+import make_mpasmesh
+
+scriptdir = os.path.dirname(os.path.abspath(__file__))
+
+allcases  = ["startup", "patches", "frame", "levels", "max", "diff"]
+
+# Ignore differences below this (seconds), they are noise
+noise_floor = 0.05
+
+# Default time (seconds) to the first output of plot_mpaspatch.py, without the plotting imports
+startup_budget = 1.0
+
+########################################################################
+
+def prepare_meshes(workdir, sizestr, verbose=False):
+    '''Create the synthetic forecast files and the patch file of one mesh size, if they do not exist'''
+
+    meshdir = os.path.join(workdir, sizestr)
+    os.makedirs(os.path.join(meshdir, "png"), exist_ok=True)
+
+    fcstfiles = []
+    for hour in range(2):
+        timestr  = f"2023-04-14_{hour:02d}:00:00"
+        fcstfile = os.path.join(meshdir, f"synthetic.history.{timestr.replace(':','.')}.nc")
+        if not os.path.lexists(fcstfile):
+            print(f"Creating {fcstfile} ...", flush=True)
+            make_mpasmesh.make_mesh(fcstfile, make_mpasmesh.parse_count(sizestr), seed=hour, timestr=timestr, verbose=verbose)
+        fcstfiles.append(fcstfile)
+
+    with Dataset(fcstfiles[0], 'r') as mesh:
+        nCells = mesh.dimensions["nCells"].size
+
+    patchfile = os.path.join(meshdir, f"synthetic.{nCells}.patches")
+
+    return meshdir, nCells, fcstfiles, patchfile
+
+########################################################################
+
+def run_program(program, arguments, workdir, verbose=False):
+    '''Run a program with "--profile", returns its wall time and the profiling record'''
+
+    proffile = os.path.join(workdir, f"profile.{os.getpid()}.json")
+    if os.path.lexists(proffile):
+        os.remove(proffile)
+
+    cmd = [sys.executable, os.path.join(scriptdir, program)] + arguments + ["--profile", proffile]
+    if verbose:
+        print(f"    Running: {' '.join(cmd)}", flush=True)
+
+    time0 = time.perf_counter()
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    wall  = time.perf_counter() - time0
+
+    if result.returncode != 0:
+        print(f"ERROR: {program} failed with status {result.returncode}:")
+        print('\n'.join(result.stdout.splitlines()[-10:]))
+        return None, None
+
+    record = None
+    if os.path.lexists(proffile):
+        with open(proffile, 'r') as jsonfile:
+            record = json.loads(jsonfile.readlines()[-1])
+        os.remove(proffile)
+
+    return wall, record
+
+########################################################################
+
+def case_metrics(wall, record):
+    '''Timings of one run: the process wall time, the stages and the rendering time per frame'''
+
+    metrics = {"process": wall}
+    if record is None:
+        return metrics
+
+    for name, stage in record["stages"].items():
+        metrics[name] = stage["seconds"]
+
+    if "savefig" in record["stages"]:
+        nframes = record["stages"]["savefig"]["calls"]
+        render  = sum(metrics.get(name, 0.0) for name in ("colour mapping", "features", "savefig"))
+        metrics["per_frame"] = render/nframes
+
+    return metrics
+
+########################################################################
+
+def run_case(case, meshdir, nCells, fcstfiles, patchfile, nprocess=None, verbose=False):
+    '''Run one benchmark case, returns its timings'''
+
+    pngdir = os.path.join(meshdir, "png")
+
+    if case == "startup":
+        program, arguments = "plot_mpaspatch.py", [fcstfiles[0], "list"]
+    elif case == "patches":
+        if os.path.lexists(patchfile):
+            os.remove(patchfile)
+        program, arguments = "get_mpaspatches.py", [fcstfiles[0], "-o", meshdir]
+        if nprocess is not None:
+            arguments += ["-n", str(nprocess)]
+    elif case == "frame":
+        program, arguments = "plot_mpaspatch.py", [fcstfiles[0], "refl10cm_max", "-p", patchfile, "-o", pngdir]
+    elif case == "levels":
+        program, arguments = "plot_mpaspatch.py", [fcstfiles[0], "theta", "-l", "0,1,2", "-p", patchfile, "-o", pngdir]
+    elif case == "max":
+        program, arguments = "plot_mpaspatch.py", [fcstfiles[0], "refl10cm", "-l", "max", "-p", patchfile, "-o", pngdir]
+    elif case == "diff":
+        program, arguments = "plot_mpaspatch.py", [fcstfiles[1], fcstfiles[0], "refl10cm_max", "-p", patchfile, "-o", pngdir]
+    else:
+        print(f"ERROR: unknown benchmark case \"{case}\".")
+        return None
+
+    wall, record = run_program(program, arguments, meshdir, verbose)
+    if wall is None:
+        return None
+
+    return case_metrics(wall, record)
+
+########################################################################
+
+def compare_results(results, baseline, tolerance):
+    '''Print the timings against the baseline, returns the number of regressions'''
+
+    nregress = 0
+
+    print(f"\n{'case':18s} {'metric':18s} {'baseline':>10s} {'now':>10s} {'ratio':>7s}")
+    for key, metrics in results.items():
+        basemetrics = baseline.get(key, {})
+        for name, value in metrics.items():
+            if name in basemetrics:
+                base  = basemetrics[name]
+                ratio = value/base if base > 0.0 else float('inf')
+                flag  = ""
+                if ratio > tolerance and value-base > noise_floor:
+                    flag = "  <-- REGRESSION"
+                    nregress += 1
+                elif ratio < 1.0/tolerance and base-value > noise_floor:
+                    flag = "  faster"
+                print(f"{key:18s} {name:18s} {base:10.3f} {value:10.3f} {ratio:7.2f}{flag}")
+            else:
+                print(f"{key:18s} {name:18s} {'-':>10s} {value:10.3f}")
+
+    return nregress
+
+########################################################################
+
+def check_budget(results, budget):
+    '''Print the start-up times over the budget, returns their number'''
+
+    nover = 0
+    for key, metrics in results.items():
+        if key.endswith("/startup") and metrics["process"] > budget:
+            print(f"{key:18s} start-up {metrics['process']:.3f} s is over the budget of {budget:.3f} s  <-- OVER BUDGET")
+            nover += 1
+
+    return nover
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark the MPAS plotting programs on synthetic meshes',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('-v','--verbose',   help='Verbose output',                                   action="store_true", default=False)
+    parser.add_argument('-w','--workdir',   help='Directory for the synthetic meshes and images',    type=str,   default="./mpas_bench")
+    parser.add_argument('-c','--cells',     help='Mesh sizes [s1,s2,...], e.g. 10k,100k,1M,10M',     type=str,   default="10k,100k")
+    parser.add_argument('-k','--cases',     help=f'Benchmark cases [{",".join(allcases)}]',          type=str,   default=",".join(allcases))
+    parser.add_argument('-r','--repeat',    help='Number of runs of each case, the fastest is kept', type=int,   default=3)
+    parser.add_argument('-n','--nprocess',  help='Number of processes for get_mpaspatches.py',       type=int,   default=None)
+    parser.add_argument('-b','--baseline',  help='Compare with the baseline in this file',           type=str,   default=None)
+    parser.add_argument('-t','--tolerance', help='Slow-down ratio reported as a regression',         type=float, default=1.25)
+    parser.add_argument('--save',           help='Save the results as a baseline to this file',      type=str,   default=None)
+    parser.add_argument('--startup-budget', help=f'Maximum seconds of the startup case, 0 for no check, default {startup_budget}',
+                                            type=float, default=startup_budget)
+
+    args = parser.parse_args()
+
+    cases = args.cases.split(',')
+    for case in cases:
+        if case not in allcases:
+            print(f"ERROR: unknown benchmark case \"{case}\", should be in {allcases}.")
+            sys.exit(1)
+
+    baseline = None
+    if args.baseline is not None:
+        if not os.path.lexists(args.baseline):
+            print(f"ERROR: baseline file \"{args.baseline}\" not found.")
+            sys.exit(1)
+        with open(args.baseline, 'r') as jsonfile:
+            baseline = json.load(jsonfile)
+
+    #@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+    results = {}
+    failed  = 0
+    for sizestr in args.cells.split(','):
+
+        meshdir, nCells, fcstfiles, patchfile = prepare_meshes(args.workdir, sizestr, args.verbose)
+
+        # The plotting cases need the patch file
+        if "patches" not in cases and not os.path.lexists(patchfile):
+            run_case("patches", meshdir, nCells, fcstfiles, patchfile, args.nprocess, args.verbose)
+
+        for case in cases:
+            print(f"Running {case:8s} on {nCells} cells ...", flush=True)
+
+            best = None
+            for n in range(args.repeat):
+                metrics = run_case(case, meshdir, nCells, fcstfiles, patchfile, args.nprocess, args.verbose)
+                if metrics is None:
+                    break
+                if best is None:
+                    best = metrics
+                else:
+                    best = {name: min(value, metrics.get(name, value)) for name, value in best.items()}
+
+            if best is None:
+                failed += 1
+            else:
+                results[f"{sizestr}/{case}"] = best
+
+    if baseline is not None:
+        nregress = compare_results(results, baseline["results"], args.tolerance)
+        print(f"\nCompared with {args.baseline} (host {baseline['host']}, {baseline['date']}): {nregress} regression(s).")
+    else:
+        nregress = compare_results(results, {}, args.tolerance)
+
+    nover = 0
+    if args.startup_budget > 0.0:
+        nover = check_budget(results, args.startup_budget)
+        print(f"Start-up budget of {args.startup_budget} seconds: {nover} case(s) over it.")
+
+    if args.save is not None:
+        with open(args.save, 'w') as jsonfile:
+            json.dump({ "host"    : platform.node(),
+                        "python"  : platform.python_version(),
+                        "date"    : time.strftime('%Y-%m-%dT%H:%M:%S'),
+                        "repeat"  : args.repeat,
+                        "results" : results }, jsonfile, indent=2)
+        print(f"Results saved to {args.save}.")
+
+    if failed > 0 or nregress > 0 or nover > 0:
+        sys.exit(1)
@@ -4,16 +4,27 @@
 #
 # Given an MPAS mesh file, `get_mpas_patches` will create a Path Patch for each MPAS grid, by looping
 # over a Cell's vertices. Because this operation is a nCell * nEdge operation, it will take some
-# quite some time. Using multiprocessing will speed up the process significantly.
+# quite some time. Using multiprocessing will speed up the process significantly. The cells are
+# handed out to the processes in small chunks from a work queue, and the number of processes
+# defaults to the CPUs available to the job (CPU affinity and SLURM_CPUS_PER_TASK).
 #
 # However, once a patch collection is created it is saved (using Python's Pickle module) as a 'patch'
 # file. This patch file can be loaded for furture plots on that mesh, which will speed up future
-# plots creation.
+# plots creation. The patches are stored in the Hilbert order of the cells (see mpas_cellorder.py),
+# with the permutation as attributes "cell_order" and "cell_rank" of the patch collection.
 #
 # This module was created based on "mpas_patches.py" from the following repository:
 #
 # * https://github.com/MiCurry/MPAS-Plotting
 #
+# For large (global or refined) meshes, the build can be spread over the tasks of a Slurm job
+# array. Each task builds one contiguous range of cells into a partial (shard) file with
+# "--shard i/N", then "--merge" checks that the shards cover all cells and concatenates them
+# into the patch file, for example:
+#
+#   jobid=$(sbatch --parsable run_get_array.slurm)       # --array=0-15
+#   sbatch --dependency=afterok:$jobid --wrap "get_mpaspatches.py --merge $gridfile"
+#
 #  Note that the generated Pickle file is Matplotlib version dependent.
 #  You may have to recreate this file after the Python environment is changed.
 #
@@ -25,6 +36,7 @@
 import os
 import sys
 import time
+import glob
 import pickle as pkle
 
 import numpy as np
@@ -37,6 +49,9 @@ import multiprocessing as mp
 from netCDF4 import Dataset
 import argparse
 
+import mpas_profile
+import mpas_cellorder
+
 ########################################################################
 
 def dump(obj, level=0, maxlevel=10):
@@ -65,19 +80,12 @@ def update_progress(job_title, progress):
 
 ########################################################################
 
-def get_mpas_patches(istart, isize, connect, patch_queue):
-
-    nEdgesOnCell   = connect.recv()
-    verticesOnCell = connect.recv()
-    latVertex      = connect.recv()
-    lonVertex      = connect.recv()
-
-    mesh_patches = [None] * isize
+def get_mpas_patches(cells, nEdgesOnCell, verticesOnCell, latVertex, lonVertex):
+    '''Create the patches of the cells in the list'''
 
-    myproc = mp.current_process()
-    print(f"Process {myproc.name} processing {isize} cells starting from {istart}", flush=True)
+    mesh_patches = [None] * len(cells)
 
-    for cell in range(istart,istart+isize):
+    for n, cell in enumerate(cells):
         # For each cell, get the latitude and longitude points of its vertices
         # and make a patch of that point vertices
         vertices = verticesOnCell[cell,:nEdgesOnCell[cell]]
@@ -110,12 +118,124 @@ def get_mpas_patches(istart, isize, connect, patch_queue):
                                closed=True,
                                readonly=True)
 
-        mesh_patches[cell-istart] = patches.PathPatch(cell_patch)
+        mesh_patches[n] = patches.PathPatch(cell_patch)
+
+    return mesh_patches
+
+########################################################################
+
+def patch_worker(connect, task_queue, patch_queue):
+    '''Build the patches of the chunks of cells from task_queue until a None task is received
+
+    A chunk is a range of positions in the Hilbert order of the cells (see mpas_cellorder.py).
+    The patches of each chunk are returned through patch_queue as (istart,isize,patches),
+    and the worker finishes with (None,name,cells,chunks,busy seconds) for the throughput report.
+    '''
+
+    nEdgesOnCell   = connect.recv()
+    verticesOnCell = connect.recv()
+    latVertex      = connect.recv()
+    lonVertex      = connect.recv()
+    cell_order     = connect.recv()
+
+    myproc = mp.current_process()
+
+    ncells  = 0
+    nchunks = 0
+    busy    = 0.0
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
 
-    patch_queue.put((istart,isize,mesh_patches))
+        istart,isize = task
+        time0 = time.perf_counter()
+        mesh_patches = get_mpas_patches(cell_order[istart:istart+isize], nEdgesOnCell, verticesOnCell, latVertex, lonVertex)
+        busy += time.perf_counter() - time0
+
+        patch_queue.put((istart,isize,mesh_patches))
+        ncells  += isize
+        nchunks += 1
+
+    patch_queue.put((None,myproc.name,ncells,nchunks,busy))
 
     return
 
+########################################################################
+
+def shard_range(ishard, nshard, nCells):
+    '''Contiguous range of cells (start, size) in the Hilbert order of shard ishard out of nshard'''
+
+    nsize,nreminder = divmod(nCells,nshard)
+
+    istart = ishard*nsize + min(ishard,nreminder)
+    isize  = nsize + (1 if ishard < nreminder else 0)
+
+    return istart, isize
+
+########################################################################
+
+def shard_fname(pickle_fname, ishard, nshard):
+    return f"{pickle_fname}.shard{ishard:04d}of{nshard:04d}"
+
+########################################################################
+
+def merge_shards(pickle_fname, nCells):
+    '''Read the shard files of pickle_fname and check that they cover all cells exactly once
+
+    Returns the patches of all cells and the names of the shard files.
+    '''
+
+    shardfiles = sorted(glob.glob(f"{glob.escape(pickle_fname)}.shard*of*"))
+    if len(shardfiles) == 0:
+        print(f"ERROR: no shard files found for {pickle_fname}.")
+        sys.exit(1)
+
+    mesh_patches = [None] * nCells
+    nshards      = set()
+    ishards      = set()
+    ranges       = []
+    for shardfile in shardfiles:
+        with open(shardfile, 'rb') as shard_file:
+            shard = pkle.load(shard_file)
+
+        if shard.get("order") != "hilbert":
+            print(f"ERROR: shard {shardfile} is not in the Hilbert order of cells, please rebuild it.")
+            sys.exit(1)
+
+        if shard["nCells"] != nCells:
+            print(f"ERROR: shard {shardfile} is for a mesh of {shard['nCells']} cells, expected {nCells}.")
+            sys.exit(1)
+
+        nshards.add(shard["nshard"])
+        ishards.add(shard["ishard"])
+        ranges.append((shard["istart"],shard["isize"],shardfile))
+        mesh_patches[shard["istart"]:shard["istart"]+shard["isize"]] = shard["patches"]
+
+    if len(nshards) != 1:
+        print(f"ERROR: shard files of builds with different numbers of shards {sorted(nshards)}.")
+        sys.exit(1)
+
+    nshard  = nshards.pop()
+    missing = sorted(set(range(nshard)) - ishards)
+    if len(missing) > 0:
+        print(f"ERROR: missing shards {missing} of {nshard}.")
+        sys.exit(1)
+
+    # The ranges must be contiguous from the first cell to the last one
+    iend = 0
+    for istart,isize,shardfile in sorted(ranges):
+        if istart != iend:
+            print(f"ERROR: cells {min(istart,iend)} - {max(istart,iend)-1} are {'missing' if istart > iend else 'duplicated'} before {shardfile}.")
+            sys.exit(1)
+        iend = istart+isize
+
+    if iend != nCells:
+        print(f"ERROR: cells {iend} - {nCells-1} are missing from the shards.")
+        sys.exit(1)
+
+    return mesh_patches, shardfiles
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description='Create MPAS patch file for plot_mpaspatch.py',
@@ -126,15 +246,19 @@ if __name__ == "__main__":
     parser.add_argument('gridfile',help='MPAS forecast file')
 
     parser.add_argument('-v','--verbose',   help='Verbose output',                             action="store_true", default=False)
-    parser.add_argument('-n','--nprocess',  help='Number of processes',                        type=int,            default=None)
+    parser.add_argument('-n','--nprocess',  help='Number of processes, default to the CPUs available to the job', type=int, default=None)
+    parser.add_argument('-c','--chunksize', help='Number of cells in each work chunk, default to about 20 chunks per process', type=int, default=None)
     parser.add_argument('-o','--outfile',   help='Name of output file or output directory',    type=str,            default=None)
+    parser.add_argument('--shard',          help='Build shard i of N [i/N] into a partial file, e.g. ${SLURM_ARRAY_TASK_ID}/16', type=str, default=None)
+    parser.add_argument('--merge',          help='Check & merge the partial files from "--shard" into the patch file', action="store_true", default=False)
+    mpas_profile.add_arguments(parser)
 
     args = parser.parse_args()
 
+    prof = mpas_profile.Profiler.from_args('get_mpaspatches', args)
+
     if args.nprocess is None:
-        #print(mp.cpu_count())
-        #print(os.cpu_count())
-        nprocess = mp.cpu_count()//2
+        nprocess = mpas_profile.get_nprocess()
     else:
         nprocess = args.nprocess
 
@@ -152,16 +276,39 @@ if __name__ == "__main__":
         print("ERROR: need a MPAS history/diag file.")
         sys.exit(1)
 
+    if args.shard is not None:
+        try:
+            ishard,nshard = [int(item) for item in args.shard.split('/')]
+        except ValueError:
+            ishard,nshard = -1,0
+        if nshard < 1 or ishard < 0 or ishard >= nshard:
+            print(f"ERROR: shard should be \"i/N\" with 0 <= i < N, got \"{args.shard}\".")
+            sys.exit(1)
+
+        if args.merge:
+            print("ERROR: --shard and --merge cannot be used together.")
+            sys.exit(1)
+
     #@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
 
     time0 = time.time()
 
-    with Dataset(args.gridfile,'r') as mesh:
+    with prof.stage("read mesh"), Dataset(args.gridfile,'r') as mesh:
         nCells         = len(mesh.dimensions['nCells'])
-        nEdgesOnCell   = mesh.variables['nEdgesOnCell'][:]
-        verticesOnCell = mesh.variables['verticesOnCell'][:]
-        latVertex      = mesh.variables['latVertex'][:]
-        lonVertex      = mesh.variables['lonVertex'][:]
+        if not args.merge:
+            nEdgesOnCell   = mesh.variables['nEdgesOnCell'][:]
+            verticesOnCell = mesh.variables['verticesOnCell'][:]
+            latVertex      = mesh.variables['latVertex'][:]
+            lonVertex      = mesh.variables['lonVertex'][:]
+
+            prof.count("bytes_read", nEdgesOnCell.nbytes+verticesOnCell.nbytes+latVertex.nbytes+lonVertex.nbytes)
+
+        latCell        = mesh.variables['latCell'][:]
+        lonCell        = mesh.variables['lonCell'][:]
+
+    # Cells close on the map are kept close in the patch file
+    with prof.stage("cell order"):
+        cell_order, cell_rank = mpas_cellorder.cell_order(latCell, lonCell)
 
     if pickle_fname is None:
         pickle_fname = os.path.basename(args.gridfile).split('.')[0]
@@ -172,50 +319,97 @@ if __name__ == "__main__":
         print("Pickle file (", pickle_fname, ") exists. Skipping")
         sys.exit(0)
 
-    print(f"\nNo pickle file found, creating patches \"{pickle_fname}\" using ({nprocess}) processes ...")
-    print("If this is a large mesh, then this proccess will take a while...")
-
-    baches_queue = mp.Queue(nprocess)                # queue to return processed cell patches
-    connects =[mp.Pipe() for i in range(nprocess)]   # pipe for passing initial arrays
-
-    nsize,nreminder = divmod(nCells,nprocess)
-
-    arg_tuples = []
-    istart = 0
-    for i in range(nprocess):
-        isize = nsize
-        if i < nreminder:
-            isize += 1
-        arg_tuples.append((istart,isize,connects[i][0],baches_queue))
-        istart += isize
-
-    #print(arg_tuples)
-
-    processes = [mp.Process(target=get_mpas_patches,args=arg_tuple) for arg_tuple in arg_tuples]
-
-    for process in processes:
-        process.start()
-
-    for p in range(nprocess):
-        connects[p][1].send(nEdgesOnCell   )
-        connects[p][1].send(verticesOnCell )
-        connects[p][1].send(latVertex      )
-        connects[p][1].send(lonVertex      )
-
-    mesh_patches = [None] * nCells
-    nsize = 0
-    for p in range(nprocess):
-        i,isize,proc_patches    = baches_queue.get()
-        mesh_patches[i:i+isize] = proc_patches
-
-        nsize += isize
-        update_progress("Creating Patch file: "+pickle_fname, nsize/nCells)
+    if args.shard is not None and os.path.isfile(shard_fname(pickle_fname, ishard, nshard)):
+        print(f"Shard file ({shard_fname(pickle_fname, ishard, nshard)}) exists. Skipping")
+        sys.exit(0)
 
-    for process in processes:
-        process.join()
+    if args.merge:
+        with prof.stage("merge"):
+            mesh_patches, shardfiles = merge_shards(pickle_fname, nCells)
+        print(f"\nMerged {len(shardfiles)} shards of {nCells} cells.")
 
-    # Create patch collection
-    patch_collection = mplcollections.PatchCollection(mesh_patches)
+    else:
+        if args.shard is None:
+            cstart, csize = 0, nCells
+            print(f"\nNo pickle file found, creating patches \"{pickle_fname}\" using ({nprocess}) processes ...")
+            print("If this is a large mesh, then this proccess will take a while...")
+        else:
+            cstart, csize = shard_range(ishard, nshard, nCells)
+            print(f"\nCreating shard {ishard} of {nshard} (cells {cstart} - {cstart+csize-1}) for \"{pickle_fname}\" using ({nprocess}) processes ...")
+
+        with prof.stage("build patches"):
+            # Many small chunks are handed out from a queue, so that the workers that
+            # finish early keep working and the slowest one does not set the wall time.
+            chunksize = args.chunksize
+            if chunksize is None:
+                chunksize = min(20000, max(500, csize//(nprocess*20)))
+            nprocess = max(1, min(nprocess, -(-csize//chunksize)))
+
+            task_queue   = mp.Queue()                      # queue of the chunks of cells to be processed
+            baches_queue = mp.Queue()                      # queue to return processed cell patches
+            connects =[mp.Pipe() for i in range(nprocess)] # pipe for passing initial arrays
+
+            for istart in range(cstart,cstart+csize,chunksize):
+                task_queue.put((istart,min(chunksize,cstart+csize-istart)))
+            for p in range(nprocess):
+                task_queue.put(None)
+
+            processes = [mp.Process(target=patch_worker,args=(connects[p][0],task_queue,baches_queue)) for p in range(nprocess)]
+
+            for process in processes:
+                process.start()
+
+            for p in range(nprocess):
+                connects[p][1].send(nEdgesOnCell   )
+                connects[p][1].send(verticesOnCell )
+                connects[p][1].send(latVertex      )
+                connects[p][1].send(lonVertex      )
+                connects[p][1].send(cell_order     )
+
+            mesh_patches = [None] * csize
+            workers = []
+            nsize = 0
+            while len(workers) < nprocess:
+                i,isize,*proc_patches = baches_queue.get()
+                if i is None:                               # a worker has finished
+                    workers.append((isize,*proc_patches))
+                    continue
+
+                mesh_patches[i-cstart:i-cstart+isize] = proc_patches[0]
+
+                nsize += isize
+                update_progress("Creating Patch file: "+pickle_fname, nsize/csize)
+
+            for process in processes:
+                process.join()
+
+            print(f"\n{nprocess} processes, chunks of {chunksize} cells:")
+            for name,ncells,nchunks,busy in sorted(workers):
+                print(f"    {name:16s}: {ncells:9d} cells in {nchunks:4d} chunks, {busy:8.2f} s busy, {ncells/max(busy,1e-6):10.1f} cells/s")
+
+            prof.count("cells", csize)
+
+        if args.shard is not None:
+            shardfile = shard_fname(pickle_fname, ishard, nshard)
+            with prof.stage("write"):
+                with open(shardfile, 'wb') as shard_file:
+                    pkle.dump({"nCells": nCells, "nshard": nshard, "ishard": ishard, "order": "hilbert",
+                               "istart": cstart, "isize": csize, "patches": mesh_patches}, shard_file)
+
+                prof.count("bytes_written", os.path.getsize(shardfile))
+
+            time2 = time.time()
+            print(f"\nCreated shard file: {shardfile}. Used ({time2-time0}) seconds.")
+            print(f"Run \"{os.path.basename(sys.argv[0])} --merge\" after all {nshard} shards are done.")
+
+            prof.finish()
+            sys.exit(0)
+
+    # Create patch collection, the patches are in the Hilbert order of the cells
+    with prof.stage("patch collection"):
+        patch_collection = mplcollections.PatchCollection(mesh_patches)
+        patch_collection.cell_order = cell_order
+        patch_collection.cell_rank  = cell_rank
 
     #
     # Write out a MPAS patch file
@@ -223,9 +417,18 @@ if __name__ == "__main__":
     print(f"Writting to pickle file ({pickle_fname}) .... ")
 
     # Pickle the patch collection
-    pickle_file = open(pickle_fname, 'wb')
-    pkle.dump(patch_collection, pickle_file)
-    pickle_file.close()
+    with prof.stage("write"):
+        pickle_file = open(pickle_fname, 'wb')
+        pkle.dump(patch_collection, pickle_file)
+        pickle_file.close()
+
+        prof.count("bytes_written", os.path.getsize(pickle_fname))
+
+    if args.merge:
+        for shardfile in shardfiles:
+            os.remove(shardfile)
 
     time2 = time.time()
     print(f"\nCreated a patch file for mesh: {pickle_fname}. Used ({time2-time0}) seconds.")
+
+    prof.finish()
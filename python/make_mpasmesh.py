@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+#
+# This module writes a synthetic MPAS mesh with forecast fields in the layout
+# of an MPAS history file, for testing and benchmarking the plotting tools
+# without the real (multi-GB) WoFS files.
+#
+# Two kinds of meshes can be created:
+#
+#   hex      A regional mesh of regular hexagons, laid out on the Lambert
+#            conformal plane of the WoFS output grid (wofs_mpas_output.grid)
+#            and mapped to the sphere. The mesh fills the output domain by
+#            default, so that the cell size follows the number of cells.
+#            With "--planar" the file is written as a planar MPAS mesh
+#            (on_a_sphere = "NO", xCell/yCell in meters), the latitudes and
+#            longitudes are still provided for the plotting programs.
+#   voronoi  A global quasi-uniform spherical Voronoi mesh of Fibonacci
+#            points, with pentagons and heptagons as in the MPAS global meshes.
+#            It needs SciPy and about 3 minutes for 10 million cells.
+#
+# The fields are an ensemble of Gaussian "storms" over the central US:
+#
+#   refl10cm_max(Time,nCells), t2m(Time,nCells)
+#   refl10cm(Time,nCells,nVertLevels), theta(Time,nCells,nVertLevels)
+#
+# A different "--seed" moves the storms, for testing the difference plots.
+#
+# Examples:
+#
+#   make_mpasmesh.py 1M -o /scratch/bench
+#   make_mpasmesh.py 1M -o /scratch/bench -s 1 -t 2023-04-14_01:00:00
+#   make_mpasmesh.py 500k -m voronoi -o global.history.2023-04-14_00.00.00.nc
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import sys
+import math
+import time
+import argparse
+
+import numpy as np
+
+from netCDF4 import Dataset
+
+sphere_radius = 6371229.0                     # Earth radius in MPAS
+
+domain_width  = 1600*3000.0                   # Size of the WoFS output grid
+domain_height =  960*3000.0
+
+########################################################################
+
+def parse_count(countstr):
+    '''Convert a count like "100k", "2.5M" to an integer'''
+
+    units = {'K': 10**3, 'M': 10**6, 'G': 10**9}
+
+    countstr = countstr.strip().upper()
+    if countstr and countstr[-1] in units:
+        return int(float(countstr[:-1])*units[countstr[-1]])
+    return int(float(countstr))
+
+########################################################################
+
+def lambert_to_latlon(x, y, ctrlat, ctrlon):
+    '''Inverse Lambert conformal projection (tangent cone) on the sphere, returns latitudes/longitudes in radians'''
+
+    phi0 = math.radians(ctrlat)
+    lam0 = math.radians(ctrlon)
+
+    n    = math.sin(phi0)
+    F    = math.cos(phi0)*math.tan(math.pi/4+phi0/2)**n/n
+    rho0 = sphere_radius*F/math.tan(math.pi/4+phi0/2)**n
+
+    rho   = np.sign(n)*np.hypot(x, rho0-y)
+    theta = np.arctan2(x, rho0-y)
+
+    lats = 2.0*np.arctan((sphere_radius*F/rho)**(1.0/n)) - math.pi/2
+    lons = (lam0 + theta/n) % (2*math.pi)        # MPAS longitudes are in [0, 2*pi)
+
+    return lats, lons
+
+########################################################################
+
+def hex_mesh(ncells, dx=None, ctrlat=38.3, ctrlon=-97.5, planar=False):
+    '''Regional mesh of hexagons on the Lambert conformal plane
+
+    The cell centers form a triangular lattice, cell (i,j) is at
+    (i+j/2, j*sqrt(3)/2)*dx in axial coordinates. The vertices are the
+    centroids of the lattice triangles, "up" U(i,j) and "down" D(i,j),
+    so that the cells share their vertices as in a real MPAS mesh.
+    '''
+
+    # Rows and columns with the aspect ratio of the output domain
+    nx = max(2, int(round(math.sqrt(ncells*domain_width/domain_height*math.sqrt(3)/2))))
+    ny = max(2, int(round(ncells/nx)))
+    if dx is None:
+        dx = domain_width/nx
+    dy = dx*math.sqrt(3)/2
+
+    nCells = nx*ny
+    rows, cols = np.divmod(np.arange(nCells, dtype=np.int64), nx)
+    iaxial = cols - rows//2
+
+    # Vertex index of the triangles (t=0 up, t=1 down), including the row below and the column left of the mesh
+    imin = -((ny-1)//2) - 1
+    ni   = nx - imin
+    def vertex_id(t, i, j):
+        return ((j+1)*ni + (i-imin))*2 + t
+
+    # Counter-clockwise from the bottom vertex
+    verticesOnCell = np.stack([ vertex_id(0, iaxial,   rows-1),
+                                vertex_id(1, iaxial,   rows-1),
+                                vertex_id(0, iaxial,   rows  ),
+                                vertex_id(1, iaxial-1, rows  ),
+                                vertex_id(0, iaxial-1, rows  ),
+                                vertex_id(1, iaxial-1, rows-1) ], axis=1)
+
+    # Keep the vertices used by the cells only
+    used = np.zeros((ny+1)*ni*2, dtype=bool)
+    used[verticesOnCell] = True
+    newid = np.cumsum(used) - 1
+    verticesOnCell = newid[verticesOnCell]
+
+    vids     = np.flatnonzero(used)
+    vij, vt  = np.divmod(vids, 2)
+    vj, vi   = np.divmod(vij, ni)
+    vj      -= 1
+    vi      += imin
+    del used, newid, vids, vij
+
+    x0 = dx*(nx-0.5)/2
+    y0 = dy*(ny-1)/2
+
+    xCell   = dx*(iaxial + 0.5*rows) - x0
+    yCell   = dy*rows - y0
+    xVertex = dx*(vi + 0.5*vj + 0.5 + 0.5*vt) - x0
+    yVertex = dy*vj + dx*(1+vt)/(2*math.sqrt(3)) - y0
+
+    latCell,   lonCell   = lambert_to_latlon(xCell,   yCell,   ctrlat, ctrlon)
+    latVertex, lonVertex = lambert_to_latlon(xVertex, yVertex, ctrlat, ctrlon)
+
+    if planar:
+        zCell = np.zeros(nCells)
+    else:
+        xCell = sphere_radius*np.cos(latCell)*np.cos(lonCell)
+        yCell = sphere_radius*np.cos(latCell)*np.sin(lonCell)
+        zCell = sphere_radius*np.sin(latCell)
+
+    # Lateral boundary zone: 7 at the outermost row, down to 1 at the 7th row, 0 inside
+    edgedist = np.minimum(np.minimum(cols, nx-1-cols), np.minimum(rows, ny-1-rows))
+    bdyMaskCell = np.maximum(0, 7-edgedist)
+
+    return { "nEdgesOnCell"  : np.full(nCells, 6, dtype=np.int32),
+             "verticesOnCell": (verticesOnCell+1).astype(np.int32),     # 1-based as in MPAS
+             "latCell"       : latCell,     "lonCell"   : lonCell,
+             "latVertex"     : latVertex,   "lonVertex" : lonVertex,
+             "xCell"         : xCell,       "yCell"     : yCell,     "zCell": zCell,
+             "areaCell"      : np.full(nCells, dx*dy),
+             "bdyMaskCell"   : bdyMaskCell.astype(np.int32),
+             "attrs"         : { "on_a_sphere" : "NO" if planar else "YES",
+                                 "sphere_radius": 0.0 if planar else sphere_radius,
+                                 "is_periodic" : "NO",
+                                 "dc"          : dx,
+                                 "mesh_spec"   : "1.0",
+                                 "synthetic_mesh": f"hex {nx}x{ny}, dx={dx:.1f} m, center=({ctrlat},{ctrlon})" } }
+
+########################################################################
+
+def voronoi_mesh(ncells):
+    '''Global spherical Voronoi mesh of the Fibonacci points'''
+
+    from scipy.spatial import SphericalVoronoi
+
+    points = np.arange(ncells) + 0.5
+    phi    = np.arccos(1.0 - 2.0*points/ncells)
+    theta  = math.pi*(1.0 + math.sqrt(5.0))*points
+    points = np.stack([np.cos(theta)*np.sin(phi), np.sin(theta)*np.sin(phi), np.cos(phi)], axis=1)
+
+    voronoi = SphericalVoronoi(points)
+    voronoi.sort_vertices_of_regions()            # counter-clockwise
+
+    nEdgesOnCell   = np.array([len(region) for region in voronoi.regions], dtype=np.int32)
+    maxEdges       = nEdgesOnCell.max()
+    verticesOnCell = np.empty((ncells, maxEdges), dtype=np.int32)
+    for cell, region in enumerate(voronoi.regions):
+        verticesOnCell[cell,:len(region)] = region
+        verticesOnCell[cell,len(region):] = region[-1]      # padded with the last vertex
+
+    def latlon(xyz):
+        return np.arcsin(np.clip(xyz[:,2], -1.0, 1.0)), np.arctan2(xyz[:,1], xyz[:,0]) % (2*math.pi)
+
+    latCell,   lonCell   = latlon(points)
+    latVertex, lonVertex = latlon(voronoi.vertices)
+
+    return { "nEdgesOnCell"  : nEdgesOnCell,
+             "verticesOnCell": verticesOnCell+1,
+             "latCell"       : latCell,     "lonCell"   : lonCell,
+             "latVertex"     : latVertex,   "lonVertex" : lonVertex,
+             "xCell"         : sphere_radius*points[:,0],
+             "yCell"         : sphere_radius*points[:,1],
+             "zCell"         : sphere_radius*points[:,2],
+             "areaCell"      : np.full(ncells, 4*math.pi*sphere_radius**2/ncells),
+             "bdyMaskCell"   : np.zeros(ncells, dtype=np.int32),
+             "attrs"         : { "on_a_sphere" : "YES",
+                                 "sphere_radius": sphere_radius,
+                                 "is_periodic" : "NO",
+                                 "mesh_spec"   : "1.0",
+                                 "synthetic_mesh": f"spherical Voronoi, {ncells} Fibonacci points" } }
+
+########################################################################
+
+def make_storms(seed, nstorms=60):
+    '''Storm centers (degrees), radii (degrees) and peak reflectivity, moved by a nonzero seed'''
+
+    rng = np.random.default_rng(20230414)
+    lats  = rng.uniform(28.0, 48.0,    nstorms)
+    lons  = rng.uniform(-112.0, -82.0, nstorms)
+    radii = rng.uniform(0.2, 1.2,      nstorms)
+    peaks = rng.uniform(40.0, 70.0,    nstorms)
+
+    if seed != 0:
+        rng = np.random.default_rng(seed)
+        lats  += rng.normal(0.0, 0.3, nstorms)
+        lons  += rng.normal(0.0, 0.3, nstorms)
+        peaks += rng.normal(0.0, 3.0, nstorms)
+
+    return lats, lons, radii, peaks
+
+########################################################################
+
+def storm_fields(latCell, lonCell, storms):
+    '''Column maximum reflectivity (dBZ) and normalized storm intensity of the cells'''
+
+    glats = np.degrees(latCell)
+    glons = (np.degrees(lonCell)+540.0)%360.0 - 180.0
+    coslat = np.cos(latCell)
+
+    intensity = np.zeros(len(glats))
+    refl      = np.zeros(len(glats))
+    for slat, slon, radius, peak in zip(*storms):
+        dist2 = ((glons-slon)*coslat)**2 + (glats-slat)**2
+        shape = np.exp(-dist2/radius**2)
+        intensity = np.maximum(intensity, shape)
+        refl      = np.maximum(refl, peak*shape-5.0)
+
+    return refl, intensity
+
+########################################################################
+
+def write_mpasfile(outfile, mesh, nlevels=10, seed=0, timestr="2023-04-14_00:00:00", chunksize=1000000, verbose=False):
+    '''Write the mesh and the synthetic fields in the layout of an MPAS history file'''
+
+    nCells    = len(mesh["nEdgesOnCell"])
+    nVertices = len(mesh["latVertex"])
+    storms    = make_storms(seed)
+
+    # Vertical profile of the storms, peaking in the lower third of the column
+    klevels = np.arange(nlevels)
+    reflprofile  = np.exp(-((klevels-0.3*nlevels)/(0.35*nlevels))**2)
+    thetaprofile = 300.0 + 40.0*klevels/max(1, nlevels-1)
+
+    with Dataset(outfile, 'w') as ncfile:
+
+        for attr, value in mesh["attrs"].items():
+            ncfile.setncattr(attr, value)
+        ncfile.setncattr("source", "make_mpasmesh.py")
+
+        ncfile.createDimension('Time',        None)
+        ncfile.createDimension('StrLen',      64)
+        ncfile.createDimension('nCells',      nCells)
+        ncfile.createDimension('nVertices',   nVertices)
+        ncfile.createDimension('maxEdges',    mesh["verticesOnCell"].shape[1])
+        ncfile.createDimension('nVertLevels', nlevels)
+
+        def add_variable(name, dtype, dims, long_name, units, values=None):
+            var = ncfile.createVariable(name, dtype, dims)
+            var.long_name = long_name
+            var.units     = units
+            if values is not None:
+                var[:] = values
+            return var
+
+        var = add_variable('xtime', 'S1', ('Time','StrLen'), 'Model valid time', '')
+        var[0,:] = np.array(list(timestr.ljust(64)), dtype='S1')
+
+        add_variable('nEdgesOnCell',  'i4', ('nCells',),            'Number of edges on a cell',             '-',   mesh["nEdgesOnCell"])
+        add_variable('verticesOnCell','i4', ('nCells','maxEdges'),  'Vertices on a cell, counter-clockwise', '-',   mesh["verticesOnCell"])
+        add_variable('latCell',       'f8', ('nCells',),            'Latitude of cell centers',   'rad', mesh["latCell"])
+        add_variable('lonCell',       'f8', ('nCells',),            'Longitude of cell centers',  'rad', mesh["lonCell"])
+        add_variable('latVertex',     'f8', ('nVertices',),         'Latitude of vertices',       'rad', mesh["latVertex"])
+        add_variable('lonVertex',     'f8', ('nVertices',),         'Longitude of vertices',      'rad', mesh["lonVertex"])
+        add_variable('xCell',         'f8', ('nCells',),            'X coordinate of cell centers', 'm', mesh["xCell"])
+        add_variable('yCell',         'f8', ('nCells',),            'Y coordinate of cell centers', 'm', mesh["yCell"])
+        add_variable('zCell',         'f8', ('nCells',),            'Z coordinate of cell centers', 'm', mesh["zCell"])
+        add_variable('areaCell',      'f8', ('nCells',),            'Area of cells',              'm^2', mesh["areaCell"])
+        add_variable('bdyMaskCell',   'i4', ('nCells',),            'Lateral boundary mask of cells', '-', mesh["bdyMaskCell"])
+
+        refl2d  = add_variable('refl10cm_max', 'f4', ('Time','nCells'),               'Column maximum reflectivity', 'dBZ')
+        t2m     = add_variable('t2m',          'f4', ('Time','nCells'),               '2-meter temperature',         'K')
+        refl3d  = add_variable('refl10cm',     'f4', ('Time','nCells','nVertLevels'), '10 cm radar reflectivity',    'dBZ')
+        theta   = add_variable('theta',        'f4', ('Time','nCells','nVertLevels'), 'Potential temperature',       'K')
+
+        # Written in chunks of cells to keep the memory usage bounded for the large meshes
+        for i0 in range(0, nCells, chunksize):
+            i1 = min(nCells, i0+chunksize)
+            glats = np.degrees(mesh["latCell"][i0:i1])
+            refl, intensity = storm_fields(mesh["latCell"][i0:i1], mesh["lonCell"][i0:i1], storms)
+
+            refl2d[0,i0:i1] = np.maximum(refl, 0.0)
+            t2m[0,i0:i1]    = 305.0 - 0.6*(glats-25.0) - 6.0*intensity
+            refl3d[0,i0:i1,:] = np.maximum(refl[:,None]*reflprofile[None,:], 0.0)
+            theta[0,i0:i1,:]  = thetaprofile[None,:] - 0.2*(glats[:,None]-25.0) - 4.0*intensity[:,None]*reflprofile[None,:]
+
+            if verbose:
+                print(f"    Written fields of cells {i0} - {i1-1}", flush=True)
+
+    return nCells
+
+########################################################################
+
+def make_mesh(outfile, ncells, meshtype="hex", planar=False, dx=None, center=(38.3,-97.5),
+              nlevels=10, seed=0, timestr="2023-04-14_00:00:00", verbose=False):
+    '''Create a synthetic mesh and write it to outfile, returns the number of cells'''
+
+    if meshtype == "voronoi":
+        mesh = voronoi_mesh(ncells)
+    else:
+        mesh = hex_mesh(ncells, dx, center[0], center[1], planar)
+
+    return write_mpasfile(outfile, mesh, nlevels, seed, timestr, verbose=verbose)
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Create a synthetic MPAS mesh & forecast file for testing the plotting programs',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('ncells',help='Number of cells, e.g. 10k, 1M, 10M (the hex mesh is rounded to full rows)')
+
+    parser.add_argument('-v','--verbose',   help='Verbose output',                                    action="store_true", default=False)
+    parser.add_argument('-m','--mesh',      help='Mesh type, regional hexagons or global Voronoi',    choices=["hex","voronoi"], default="hex")
+    parser.add_argument('--planar',         help='Write the hex mesh as a planar MPAS mesh',          action="store_true", default=False)
+    parser.add_argument('-d','--dx',        help='Cell spacing (m) of the hex mesh, default to fill the WoFS output domain', type=float, default=None)
+    parser.add_argument('-c','--center',    help='Center of the hex mesh [lat,lon]',                  type=str, default="38.3,-97.5")
+    parser.add_argument('-z','--nlevels',   help='Number of vertical levels of the 3D fields',        type=int, default=10)
+    parser.add_argument('-s','--seed',      help='Seed for moving the storms, 0 for the reference positions', type=int, default=0)
+    parser.add_argument('-t','--time',      help='Valid time [YYYY-mm-dd_HH:MM:SS]',                  type=str, default="2023-04-14_00:00:00")
+    parser.add_argument('-o','--outfile',   help='Name of output file or output directory',           type=str, default=None)
+
+    args = parser.parse_args()
+
+    ncells = parse_count(args.ncells)
+    if ncells < 100:
+        print(f"ERROR: the mesh is too small, got {ncells} cells.")
+        sys.exit(1)
+
+    if args.planar and args.mesh != "hex":
+        print("ERROR: only the hex mesh can be planar.")
+        sys.exit(1)
+
+    if args.nlevels < 1:
+        print(f"ERROR: need at least one vertical level, got {args.nlevels}.")
+        sys.exit(1)
+
+    center = [float(item) for item in args.center.split(',')]
+
+    # Named like the MPAS history files, which the plotting programs parse for the valid time
+    fname = f"synthetic.history.{args.time.replace(':','.')}.nc"
+    if args.outfile is None:
+        outfile = fname
+    elif os.path.isdir(args.outfile):
+        outfile = os.path.join(args.outfile, fname)
+    else:
+        outfile = args.outfile
+
+    time0 = time.time()
+
+    nCells = make_mesh(outfile, ncells, args.mesh, args.planar, args.dx, center,
+                       args.nlevels, args.seed, args.time, args.verbose)
+
+    print(f"Created {outfile} with {nCells} cells. Used ({time.time()-time0:.1f}) seconds.")
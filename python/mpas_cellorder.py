@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#
+# This module orders the MPAS cells along a Hilbert space-filling curve.
+#
+# The MPAS cell order comes from the mesh generation, so cells that are close
+# to each other on the map are often far apart in memory. The caches derived
+# from the mesh (e.g. the patch file from "get_mpaspatches.py") keep their
+# cells in Hilbert order instead, so that a region of the map is a few
+# contiguous ranges of cells. They store the permutation with the cache:
+#
+#   cell_order[i]   the MPAS cell stored at position i of the cache
+#   cell_rank[c]    the position of MPAS cell c in the cache (the inverse)
+#
+# and a field in MPAS order is put in the cache order with one take,
+# field[cell_order].
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import numpy as np
+
+########################################################################
+
+def hilbert_index(ix, iy, nbits):
+    '''Distance along the Hilbert curve of the integer points (ix, iy) in [0, 2**nbits)'''
+
+    x = np.asarray(ix, dtype=np.int64).copy()
+    y = np.asarray(iy, dtype=np.int64).copy()
+    d = np.zeros(x.shape, dtype=np.int64)
+
+    n = 1 << nbits
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s*s*((3*rx) ^ ry)
+
+        # Rotate the quadrant, so that the curve is continuous
+        flip = rx & ~ry
+        x[flip] = n-1 - x[flip]
+        y[flip] = n-1 - y[flip]
+
+        swap = ~ry
+        x[swap], y[swap] = y[swap], x[swap]
+
+        s >>= 1
+
+    return d
+
+########################################################################
+
+def cell_order(latCell, lonCell, nbits=16):
+    '''Hilbert order of the cells from their center latitudes/longitudes (radians)
+
+    Returns cell_order and its inverse cell_rank, see above.
+    '''
+
+    glats = np.degrees(np.asarray(latCell))
+    glons = (np.degrees(np.asarray(lonCell))+540.0)%360.0 - 180.0
+
+    # Scaled to the extent of the mesh, for full resolution on regional meshes
+    scale = (1 << nbits) - 1
+    def scaled(values):
+        vmin, vmax = values.min(), values.max()
+        return np.round((values-vmin)/max(vmax-vmin, 1.0e-12)*scale)
+
+    order = np.argsort(hilbert_index(scaled(glons), scaled(glats), nbits), kind='stable')
+
+    return order, inverse_order(order)
+
+########################################################################
+
+def inverse_order(order):
+    '''Inverse of a permutation'''
+
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order), dtype=order.dtype)
+
+    return rank
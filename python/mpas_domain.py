@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+#
+# This module decides which MPAS cells are in a regional domain, i.e. a
+# lat/lon polygon in the ".custom.pts" format of "create_region":
+#
+#   Name: wofs_mpas
+#   Type: custom
+#   Point: 38.5, -97.0          (a point inside the domain)
+#   23.0, -121.0                (the polygon vertices, lat, lon)
+#   47.2, -130.0
+#   ...
+#
+# The polygon edges are great-circle arcs, as in create_region. The test is
+# a vectorized winding number on the cell centers, looping over the few
+# polygon edges only. The flags are cached in a ".domain.npz" file next to
+# the MPAS file, for example "wofs_mpas.1894063.wofs_mpas.domain.npz",
+# together with a fingerprint of the cell locations and the polygon, so
+# they are computed once per (mesh, polygon).
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import csv
+
+import numpy as np
+
+import mpas_profile
+import mpas_remap
+
+########################################################################
+
+def read_custom_pts(fname):
+    '''Polygon of a ".custom.pts" file as a closed list of (lon, lat), and its inside point'''
+
+    with open(fname, 'r') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader);next(reader);
+        point = next(reader)
+        inpoint = (float(point[1]), float(point[0].split(':')[1]))
+        lonlats = []
+        for row in reader:
+            if len(row) < 2:
+                continue
+            lonlats.append((float(row[1]),float(row[0])))
+
+    lonlats.append(lonlats[0])
+
+    return lonlats, inpoint
+
+########################################################################
+
+def domain_name(fname):
+    '''Name of a domain from its ".custom.pts" file name'''
+
+    return os.path.basename(fname).split('.')[0]
+
+########################################################################
+
+def unit_vectors(lons, lats):
+    '''Unit vectors of points on the sphere, from longitudes/latitudes in degrees'''
+
+    lons = np.radians(np.asarray(lons, dtype=np.float64))
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+
+    return np.stack([np.cos(lats)*np.cos(lons), np.cos(lats)*np.sin(lons), np.sin(lats)], axis=-1)
+
+########################################################################
+
+def winding_angle(points, vertices):
+    '''Angle (radians) swept by the polygon edges around the points, seen from the points'''
+
+    winding = np.zeros(len(points))
+    for a, b in zip(vertices[:-1], vertices[1:]):
+        pa = points @ a
+        pb = points @ b
+        winding += np.arctan2(points @ np.cross(a, b), a @ b - pa*pb)
+
+    return winding
+
+########################################################################
+
+def points_in_polygon(lons, lats, lonlats, inpoint=None, chunksize=1000000):
+    '''Flags of the points (lons, lats) that are inside the closed polygon lonlats, in degrees
+
+    The polygon edges are great-circle arcs, as in create_region. A point is inside
+    when the polygon winds around it as around the inside point "inpoint" (the
+    mean of the vertices when not given), which also tells apart the region
+    antipodal to the polygon.
+    '''
+
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+
+    vertices = unit_vectors(*np.asarray(lonlats, dtype=np.float64).T)
+    if inpoint is None:
+        center = vertices[:-1].mean(axis=0)
+    else:
+        center = unit_vectors(*inpoint)
+    turns = np.rint(winding_angle(center[None,:]/np.linalg.norm(center), vertices)[0]/(2*np.pi))
+    if turns == 0:
+        raise ValueError("The inside point of the polygon is out of it")
+
+    inside = np.zeros(lons.size, dtype=bool)
+    for start in range(0, lons.size, chunksize):
+        points = unit_vectors(lons.ravel()[start:start+chunksize], lats.ravel()[start:start+chunksize])
+        inside[start:start+chunksize] = np.rint(winding_angle(points, vertices)/(2*np.pi)) == turns
+
+    return inside.reshape(lons.shape)
+
+########################################################################
+
+def domain_mask(meshfile, glons, glats, lonlats, name, inpoint=None, prof=None, verbose=False):
+    '''Flags of the cells in the domain polygon, read from the cache next to meshfile or computed and cached'''
+
+    if prof is None:
+        prof = mpas_profile.Profiler('mpas_domain')
+
+    nCells      = len(glons)
+    fingerprint = mpas_remap.mesh_fingerprint(glats, glons)
+    polygon     = repr(("great circle", inpoint, [(float(lon), float(lat)) for lon, lat in lonlats]))
+    cachefile   = mpas_remap.cache_fname(meshfile, nCells, f"{name}.domain.npz")
+
+    if os.path.lexists(cachefile):
+        with np.load(cachefile) as cache:
+            if str(cache["fingerprint"]) == fingerprint and str(cache["polygon"]) == polygon:
+                if verbose:
+                    print(f"Domain mask loaded from {cachefile}.")
+                return cache["inside"]
+
+        print(f"Domain mask in {cachefile} is for another mesh or polygon, recomputing.")
+
+    with prof.stage("domain mask"):
+        inside = points_in_polygon(glons, glats, lonlats, inpoint)
+
+    try:
+        np.savez(cachefile, inside=inside, fingerprint=fingerprint, polygon=polygon)
+        if verbose:
+            print(f"Domain mask written to {cachefile}.")
+    except OSError as ex:
+        print(f"WARNING: cannot cache the domain mask ({ex}).")
+
+    return inside
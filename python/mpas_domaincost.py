@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+#
+# This module estimates the compute cost of a regional MPAS domain before it
+# is created, from its polygon (".custom.pts") and the global or parent mesh
+# that "create_region" would cut it from, e.g.
+#
+#   mpas_domaincost.py x1.65536002.grid.nc wofs_mpas.custom.pts
+#
+# The cells whose centers are in the polygon are counted with the vectorized
+# test of "mpas_domain.py", and the forecast cost is estimated as
+#
+#   core-seconds = cells * time steps * cost per cell and time step
+#
+# The cost per cell-step (core-microseconds) depends on the machine, the
+# physics and the number of levels. It is given with "-c", or calibrated
+# with "--calibrate CELLS,MINUTES" from a forecast that has been run with
+# the same configuration on "npefcst" cores.
+#
+# The program also checks that the polygon covers the output Lambert grid
+# (wofs_mpas_output.grid) with a margin, which should be larger than the
+# lateral boundary zone of the regional mesh (7 cell rows). With "-o", it
+# searches for the polygon with the fewest cells that still covers the grid:
+# the grid outline expanded by the margin, with "k" vertices per side, and
+# pushed out until its great-circle edges clear the grid sides.
+# The candidates for k = 1..kmax are counted and the cheapest one is written
+# as a new ".custom.pts" file.
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from netCDF4 import Dataset
+
+import mpas_profile
+import mpas_remap
+import mpas_domain
+
+########################################################################
+
+def rectangle_outline(gridspec, expand, spacing):
+    '''Outline of the output grid expanded by "expand" meters, in its projection plane, every "spacing" meters'''
+
+    x0, x1 = -expand, (gridspec["nx"]-1)*gridspec["dx"] + expand
+    y0, y1 = -expand, (gridspec["ny"]-1)*gridspec["dy"] + expand
+
+    nx = max(2, int(np.ceil((x1-x0)/spacing))+1)
+    ny = max(2, int(np.ceil((y1-y0)/spacing))+1)
+    xs = np.linspace(x0, x1, nx)
+    ys = np.linspace(y0, y1, ny)
+
+    x = np.concatenate((xs, np.full(ny-1, x1), xs[-2::-1], np.full(ny-2, x0)))
+    y = np.concatenate((np.full(nx, y0), ys[1:], np.full(nx-1, y1), ys[-2:0:-1]))
+
+    return x, y
+
+########################################################################
+
+def densify(lonlats, npoints=100):
+    '''Points along the great-circle edges of a closed lat/lon polygon, as longitudes and latitudes'''
+
+    vertices = mpas_domain.unit_vectors(*np.asarray(lonlats, dtype=np.float64).T)
+    frac     = np.linspace(0.0, 1.0, npoints, endpoint=False)[None,:,None]
+
+    # Spherical linear interpolation along each edge
+    a, b   = vertices[:-1,None,:], vertices[1:,None,:]
+    omega  = np.arccos(np.clip(np.sum(a*b, axis=2, keepdims=True), -1.0, 1.0))
+    sinom  = np.maximum(np.sin(omega), 1.0e-12)
+    points = (np.sin((1.0-frac)*omega)*a + np.sin(frac*omega)*b)/sinom
+    points = points.reshape(-1, 3)
+
+    return np.degrees(np.arctan2(points[:,1], points[:,0])), np.degrees(np.arcsin(np.clip(points[:,2], -1.0, 1.0)))
+
+########################################################################
+
+class GridCoverage:
+    '''Checks whether lat/lon polygons cover the output grid'''
+
+    def __init__(self, gridspec):
+        import cartopy.crs as ccrs
+
+        self.gridspec = gridspec
+        self.proj     = mpas_remap.grid_projection(gridspec)
+        self.carr     = ccrs.PlateCarree()
+        self.xmax     = (gridspec["nx"]-1)*gridspec["dx"]
+        self.ymax     = (gridspec["ny"]-1)*gridspec["dy"]
+
+    #-------------------------------------------------------------------
+
+    def to_lonlat(self, x, y):
+        lonlats = self.carr.transform_points(self.proj, np.asarray(x), np.asarray(y))
+        return lonlats[:,0], lonlats[:,1]
+
+    #-------------------------------------------------------------------
+
+    def to_xy(self, lons, lats):
+        xyz = self.proj.transform_points(self.carr, np.asarray(lons), np.asarray(lats))
+        return xyz[:,0], xyz[:,1]
+
+    #-------------------------------------------------------------------
+
+    def clearance(self, lonlats):
+        '''Distance (m) between the output grid and the polygon edges, None if the polygon does not contain the grid'''
+
+        # The grid is in the polygon if its outline is
+        lons, lats = self.to_lonlat(*rectangle_outline(self.gridspec, 0.0, self.gridspec["dx"]))
+        inside = mpas_domain.points_in_polygon(lons, lats, lonlats)
+
+        # Distance from the polygon edges to the grid rectangle
+        x, y = self.to_xy(*densify(lonlats))
+        ddx  = np.maximum(np.maximum(-x, x-self.xmax), 0.0)
+        ddy  = np.maximum(np.maximum(-y, y-self.ymax), 0.0)
+        dist = np.hypot(ddx, ddy).min()
+
+        if not inside.all() or dist == 0.0:
+            return None
+
+        return dist
+
+    #-------------------------------------------------------------------
+
+    def candidate(self, expand, nside):
+        '''Polygon on the grid outline expanded by "expand" meters, with nside vertices per side'''
+
+        x0, x1 = -expand, self.xmax + expand
+        y0, y1 = -expand, self.ymax + expand
+
+        xs = np.linspace(x0, x1, nside+1)
+        ys = np.linspace(y0, y1, nside+1)
+        x  = np.concatenate((xs[:-1], np.full(nside, x1), xs[:0:-1], np.full(nside, x0)))
+        y  = np.concatenate((np.full(nside, y0), ys[:-1], np.full(nside, y1), ys[:0:-1]))
+
+        lons, lats = self.to_lonlat(x, y)
+        lonlats = [(float(lon), float(lat)) for lon, lat in zip(lons, lats)]
+        lonlats.append(lonlats[0])
+
+        return lonlats
+
+########################################################################
+
+def forecast_cost(ncells, cost, dt, fcsthours, npefcst):
+    '''Time steps, core-seconds per step, core-hours and wall minutes of a forecast'''
+
+    nsteps     = int(np.ceil(fcsthours*3600.0/dt))
+    step_cores = ncells*cost*1.0e-6
+    corehours  = step_cores*nsteps/3600.0
+    wallmins   = corehours*60.0/npefcst
+
+    return nsteps, step_cores, corehours, wallmins
+
+########################################################################
+
+def print_cost(title, ncells, args):
+
+    nsteps, step_cores, corehours, wallmins = forecast_cost(ncells, args.cost, args.dt, args.fcsthours, args.npefcst)
+
+    print(f"{title}:")
+    print(f"    cells                 : {ncells:12d}  ({ncells/args.npefcst:.0f} per core on {args.npefcst} cores)")
+    print(f"    time steps            : {nsteps:12d}  (dt = {args.dt} s, {args.fcsthours} hours)")
+    print(f"    per step              : {step_cores:12.2f} core-seconds, {step_cores/args.npefcst:.3f} seconds wall")
+    print(f"    per forecast          : {corehours:12.2f} core-hours, {wallmins:.1f} minutes wall")
+    if args.members > 1:
+        print(f"    per {args.members:3d}-member ensemble: {corehours*args.members:12.2f} core-hours")
+
+########################################################################
+
+def write_custom_pts(fname, name, inpoint, lonlats):
+    '''Write a polygon in the ".custom.pts" format of create_region'''
+
+    with open(fname, 'w') as ptsfile:
+        ptsfile.write(f"Name: {name}\n")
+        ptsfile.write("Type: custom\n")
+        ptsfile.write(f"Point: {inpoint[1]:.4f}, {inpoint[0]:.4f}\n")
+        for lon, lat in lonlats[:-1]:
+            ptsfile.write(f"{lat:.4f}, {lon:.4f}\n")
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Estimate the cost of a regional MPAS domain and find a cheaper polygon',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('meshfile', help='MPAS global or parent mesh file')
+    parser.add_argument('pts_file', help='Domain polygon file (.custom.pts)')
+
+    parser.add_argument('-v','--verbose',   help='Verbose output',                                        action="store_true", default=False)
+    parser.add_argument('-g','--outgrid',   help='Output grid specification to be covered',               type=str,   default=mpas_remap.default_gridspec)
+    parser.add_argument('-m','--margin',    help='Minimum distance (km) from the output grid to the domain edge', type=float, default=30.0)
+    parser.add_argument('-c','--cost',      help='Cost per cell and time step (core-microseconds)',       type=float, default=1900.0)
+    parser.add_argument('--calibrate',      help='Calibrate the cost from a forecast run [cells,wall minutes]', type=str, default=None)
+    parser.add_argument('-p','--npefcst',   help='Number of cores of the forecast',                       type=int,   default=1152)
+    parser.add_argument('-t','--dt',        help='Model time step (seconds)',                             type=float, default=25.0)
+    parser.add_argument('-f','--fcsthours', help='Forecast length (hours)',                               type=float, default=6.0)
+    parser.add_argument('-e','--members',   help='Number of ensemble members',                            type=int,   default=1)
+    parser.add_argument('-k','--kmax',      help='Maximum number of vertices per side of the searched polygons', type=int, default=8)
+    parser.add_argument('-o','--outfile',   help='Search for the cheapest polygon that covers the output grid and write it to this file',
+                                            type=str, default=None)
+    mpas_profile.add_arguments(parser)
+
+    args = parser.parse_args()
+
+    for fname in (args.meshfile, args.pts_file, args.outgrid):
+        if not os.path.lexists(fname):
+            print(f"ERROR: file {fname} not found.")
+            sys.exit(1)
+
+    if args.margin < 0.0:
+        print(f"ERROR: the margin must not be negative, got {args.margin}.")
+        sys.exit(1)
+
+    if args.calibrate is not None:
+        try:
+            refcells, refmins = [float(item) for item in args.calibrate.split(',')]
+        except ValueError:
+            print(f"ERROR: --calibrate expects [cells,wall minutes], got \"{args.calibrate}\".")
+            sys.exit(1)
+        nsteps    = np.ceil(args.fcsthours*3600.0/args.dt)
+        args.cost = refmins*60.0*args.npefcst/(refcells*nsteps)*1.0e6
+        print(f"Calibrated cost: {args.cost:.1f} core-microseconds per cell and time step.")
+
+    prof = mpas_profile.Profiler.from_args('mpas_domaincost', args)
+
+    time0 = time.time()
+
+    with prof.stage("read"), Dataset(args.meshfile, 'r') as mesh:
+        glats = np.degrees(mesh.variables['latCell'][:])
+        glons = (np.degrees(mesh.variables['lonCell'][:])+540.0)%360.0 - 180.0
+    prof.count("cells_read", len(glats))
+
+    lonlats, inpoint = mpas_domain.read_custom_pts(args.pts_file)
+    name = mpas_domain.domain_name(args.pts_file)
+
+    gridspec = mpas_remap.read_gridspec(args.outgrid)
+    coverage = GridCoverage(gridspec)
+    margin   = args.margin*1000.0
+
+    #
+    # Cost of the domain
+    #
+    with prof.stage("count"):
+        ncells = np.count_nonzero(mpas_domain.points_in_polygon(glons, glats, lonlats, inpoint))
+
+    print_cost(f"Domain {name} from {args.pts_file}", ncells, args)
+
+    clearance = coverage.clearance(lonlats)
+    if clearance is None:
+        print("    output grid coverage  : NOT covered by the polygon")
+    else:
+        status = "OK" if clearance >= margin else f"less than the margin {args.margin} km"
+        print(f"    output grid coverage  : {clearance/1000.0:.1f} km from the domain edge, {status}")
+
+    #
+    # Search for the cheapest covering polygon
+    #
+    if args.outfile is not None:
+
+        with prof.stage("search"):
+            # The polygons expanded until their edges clear the grid by the margin, at most maxexpand
+            maxexpand  = margin + 500.0e3
+            candidates = []
+            for nside in range(1, args.kmax+1):
+                expand = margin
+                while expand <= maxexpand:
+                    candidate = coverage.candidate(expand, nside)
+                    clearance = coverage.clearance(candidate)
+                    if clearance is not None and clearance >= margin:
+                        candidates.append((nside, expand, candidate))
+                        break
+                    expand += gridspec["dx"]
+
+            # Only the cells in the lat/lon box of the candidate edges can be in the candidates
+            best = None
+            if len(candidates) > 0:
+                lons, lats = np.concatenate([densify(candidate) for _, _, candidate in candidates], axis=1)
+                near = np.flatnonzero( (glons >= lons.min()) & (glons <= lons.max()) &
+                                       (glats >= lats.min()) & (glats <= lats.max()) )
+                nlons, nlats = glons[near], glats[near]
+
+            for nside, expand, candidate in candidates:
+                count = np.count_nonzero(mpas_domain.points_in_polygon(nlons, nlats, candidate))
+                if args.verbose:
+                    print(f"    {nside} vertices per side, expanded by {expand/1000.0:6.1f} km: {count} cells")
+                if best is None or count < best[0]:
+                    best = (count, nside, candidate)
+
+        if best is None:
+            print(f"ERROR: no polygon with up to {args.kmax} vertices per side covers the output grid.")
+            sys.exit(1)
+
+        count, nside, candidate = best
+        print_cost(f"\nCheapest covering polygon ({nside} vertices per side)", count, args)
+        _, _, corehours0, _ = forecast_cost(ncells, args.cost, args.dt, args.fcsthours, args.npefcst)
+        _, _, corehours1, _ = forecast_cost(count,  args.cost, args.dt, args.fcsthours, args.npefcst)
+        print(f"    saving                : {ncells-count:12d} cells, {corehours0-corehours1:.2f} core-hours per forecast")
+
+        ctrlon, ctrlat = coverage.to_lonlat([coverage.xmax/2], [coverage.ymax/2])
+        write_custom_pts(args.outfile, name, (ctrlon[0], ctrlat[0]), candidate)
+        print(f"Polygon written to {args.outfile}.")
+
+    print(f"Used ({time.time()-time0:.1f}) seconds.")
+
+    prof.finish()
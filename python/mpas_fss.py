@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+#
+# This module computes the fractions skill score (FSS) of forecasts over a
+# set of thresholds and neighbourhood widths, against analyses in GRIB2
+# files on a Lambert conformal grid (template 3.30), for example the composite
+# reflectivity of MPAS against the HRRR analyses:
+#
+#   mpas_fss.py -a '/lfs4/BMC/hrrr/%Y%m%d/hrrr.t%Hz.wrfprsf00.grib2' -f refl10cm_max \
+#               -t 20,30,40 -w 1,5,9,17,33,65 -o fss_HT_2023041400.csv wofs_mpas.diag.2023-04-14_*.nc
+#
+# The forecasts are MPAS files, whose cell fields are remapped to the grid of
+# the analyses with the cached weights of mpas_remap.py, or UPP GRIB2 files
+# on the same grid as the analyses, e.g. for the hourly precipitation of the
+# MPAS-A_PCP files (see mpas_pcp.py) against Stage IV, which has first to be
+# interpolated to the HRRR grid (e.g. with "wgrib2 -new_grid lambert:..."):
+#
+#   mpas_fss.py -a 'stage4_hrrr/st4_conus.%Y%m%d%H.01h.grib2' -m ':APCP:surface 0:' \
+#               -f ':APCP:surface 0:(0-1|[1-9][0-9]*-[0-9]+) hour acc' -t 1,5,10 MPAS-A_PCP_2023041400_HTf??.grib2
+#
+# The first message matching the pattern is used, the pattern above skips the
+# run-total APCP ("0-N hour acc", N > 1) of the MPAS-A_PCP files.
+#
+# An MPAS field can be a sum of variables, e.g. "rainc+rainnc", and with
+# "--bucket" the field of the previous forecast file is subtracted from it.
+#
+# The exceedance (0/1) fields of a threshold are summed once into summed-area
+# tables, then the fractions of every neighbourhood width come from four
+# lookups of the tables per grid point. The cost is O(N) per threshold and
+# width instead of O(N*w*w) for a direct convolution. The neighbourhoods are
+# truncated at the edges of the grid and at the missing points.
+#
+# One forecast file is scored per worker process. The FSS, its components
+# (the mean square difference of the fractions and its reference) and the
+# base rates are written to a CSV file, or a netCDF file with "-o *.nc".
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import sys
+import csv
+import glob
+import time
+import datetime
+import argparse
+
+import multiprocessing as mp
+
+import numpy as np
+
+from netCDF4 import Dataset
+
+import mpas_profile
+import mpas_remap
+import mpas_grib2
+import mpas_verify
+
+score_names = ['fss', 'fss_useful', 'mse', 'mse_ref', 'fcst_rate', 'anal_rate']
+
+########################################################################
+
+def summed_area(field):
+    '''Summed-area table (ny+1, nx+1) of a 2D field, with a row and a column of zeros in front'''
+
+    dtype = np.int64 if field.dtype == bool or np.issubdtype(field.dtype, np.integer) else np.float64
+
+    table = np.zeros((field.shape[0]+1, field.shape[1]+1), dtype=dtype)
+    np.cumsum(np.cumsum(field, axis=0, dtype=dtype), axis=1, out=table[1:,1:])
+
+    return table
+
+########################################################################
+
+def window_sum(table, width):
+    '''Sums over the width x width windows centred on the grid points, from a summed-area table'''
+
+    ny, nx = table.shape[0]-1, table.shape[1]-1
+    half   = width//2
+
+    # with the table padded by its edges, the windows clipped at the domain boundaries are plain slices
+    table = np.pad(table, half, mode='edge')
+    rows  = table[width:width+ny] - table[:ny]
+
+    return rows[:, width:width+nx] - rows[:, :nx]
+
+########################################################################
+
+def fss_scores(fcst, anal, thresholds, widths):
+    '''FSS of fcst against anal for each threshold and neighbourhood width (odd, in grid points)
+
+    Returns a list of (threshold, width, fss, fss_useful, mse, mse_ref, fcst_rate, anal_rate).
+    Only the points valid in both fields are counted.
+    '''
+
+    fcst  = np.ma.filled(np.ma.asarray(fcst, dtype=np.float64), np.nan)
+    anal  = np.asarray(anal, dtype=np.float64)
+    valid = np.isfinite(fcst) & np.isfinite(anal)
+
+    npoints = np.count_nonzero(valid)
+    if npoints == 0:
+        return []
+
+    fcst = np.where(valid, fcst, -np.inf)
+    anal = np.where(valid, anal, -np.inf)
+
+    valid_table = summed_area(valid)
+    counts = { width: window_sum(valid_table, width)[valid] for width in widths }
+
+    scores = []
+    for threshold in thresholds:
+        fbinary = fcst >= threshold
+        abinary = anal >= threshold
+        fcst_rate = np.count_nonzero(fbinary)/npoints
+        anal_rate = np.count_nonzero(abinary)/npoints
+
+        fcst_table = summed_area(fbinary)
+        anal_table = summed_area(abinary)
+
+        for width in widths:
+            ffrac = window_sum(fcst_table, width)[valid]/counts[width]
+            afrac = window_sum(anal_table, width)[valid]/counts[width]
+
+            mse     = np.mean((ffrac-afrac)**2)
+            mse_ref = np.mean(ffrac**2) + np.mean(afrac**2)
+            fss     = 1.0 - mse/mse_ref if mse_ref > 0.0 else np.nan
+
+            scores.append((threshold, width, fss, 0.5+anal_rate/2.0, mse, mse_ref, fcst_rate, anal_rate))
+
+    return scores
+
+########################################################################
+
+def read_mpas(fname, expression):
+    '''Sum of the variables "v1+v2+..." on the cells of an MPAS file'''
+
+    with Dataset(fname, 'r') as mesh:
+        field = 0.0
+        for varname in expression.split('+'):
+            if varname not in mesh.variables:
+                raise ValueError(f"variable {varname} not found in {fname}")
+            field = field + mesh.variables[varname][0]
+
+    return field
+
+########################################################################
+
+def read_grib(fname, pattern, gridspec=None):
+    '''First message of a GRIB2 file matching the inventory pattern, decoded to (ny, nx)
+
+    Returns the field and its message. The grid is checked against gridspec when it is given.
+    '''
+
+    selected = mpas_grib2.match(mpas_grib2.scan_inventory(fname), pattern)
+    if len(selected) == 0:
+        raise ValueError(f"no message of {fname} matches \"{pattern}\"")
+
+    msg = selected[0]
+    if gridspec is not None and mpas_verify.grid_gridspec(msg.grid) != gridspec:
+        raise ValueError(f"{msg.name} of {fname} is not on the grid of the analyses")
+
+    return mpas_grib2.decode_message((fname, msg)), msg
+
+########################################################################
+
+fss_state = {}
+
+def fss_file(task):
+    '''FSS of one forecast file, a task of the worker processes'''
+
+    fcstfile, prevfile, fhour, validtime = task
+
+    state = fss_state
+    prof  = mpas_profile.Profiler('mpas_fss')
+
+    analfile = validtime.strftime(state['analysis'])
+    try:
+        with prof.stage("read"):
+            anal, _ = read_grib(analfile, state['match'], state['gridspec'])
+
+            if state['remap'] is None:
+                fcst, _ = read_grib(fcstfile, state['field'], state['gridspec'])
+            else:
+                cells = read_mpas(fcstfile, state['field'])
+                if prevfile is not None:
+                    cells = cells - read_mpas(prevfile, state['field'])
+                with prof.stage("remap"):
+                    fcst = state['remap'](cells)
+
+    except (OSError, ValueError) as ex:
+        print(f"WARNING: {ex}, {fcstfile} skipped.", flush=True)
+        return []
+
+    with prof.stage("fss"):
+        scores = fss_scores(fcst, anal, state['thresholds'], state['widths'])
+
+    vstr = validtime.strftime('%Y-%m-%d_%H:%M:%S')
+    return [ [state['name'], fhour, vstr, *score] for score in scores ]
+
+########################################################################
+
+def write_csv(fname, rows):
+    '''Write the scores to a CSV file'''
+
+    with open(fname, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['variable', 'fhour', 'valid_time', 'threshold', 'width', 'scale_km'] + score_names)
+        for row in rows:
+            writer.writerow(row[:6] + [f"{value:.6g}" for value in row[6:]])
+
+########################################################################
+
+def write_netcdf(fname, rows, attrs):
+    '''Write the scores to a netCDF file, one record per forecast hour, threshold and width'''
+
+    columns = { 'fhour': ('f4', 'hours'), 'threshold': ('f4', None), 'width': ('i4', 'grid points'), 'scale_km': ('f4', 'km') }
+    columns.update({ name: ('f8', None) for name in score_names })
+
+    with Dataset(fname, 'w') as ncfile:
+        ncfile.createDimension('record', len(rows))
+        for key, value in attrs.items():
+            ncfile.setncattr(key, value)
+
+        for column, name in [(0, 'variable'), (2, 'valid_time')]:
+            var = ncfile.createVariable(name, str, ('record',))
+            for record, row in enumerate(rows):
+                var[record] = row[column]
+
+        for column, name in zip([1, 3, 4, 5]+list(range(6, 6+len(score_names))), columns):
+            dtype, units = columns[name]
+            var = ncfile.createVariable(name, dtype, ('record',))
+            if units is not None:
+                var.setncattr('units', units)
+            var[:] = np.array([row[column] for row in rows])
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Fractions skill score of MPAS or UPP forecasts against analyses in GRIB2 files',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('fcstfiles', nargs='+',help='MPAS forecast files or UPP GRIB2 files, or their patterns')
+
+    parser.add_argument('-v','--verbose',   help='Verbose output',                              action="store_true", default=False)
+    parser.add_argument('-a','--analysis',  help='Analysis GRIB2 file of the valid time, a strftime template', type=str, required=True)
+    parser.add_argument('-f','--field',     help='MPAS variable(s) "v1+v2", or the inventory match of the field in the UPP files', type=str, default='refl10cm_max')
+    parser.add_argument('-m','--match',     help='Inventory match of the field in the analyses, default that of mpas_verify.py for the MPAS variable',
+                                            type=str, default=None)
+    parser.add_argument('-t','--thresholds',help='Thresholds [t1,t2,...]',                      type=str, default='20,30,40')
+    parser.add_argument('-w','--widths',    help='Neighbourhood widths in grid points, odd [w1,w2,...]', type=str, default='1,3,5,9,17,33,65')
+    parser.add_argument('--bucket',         help='Subtract the field of the previous MPAS file, e.g. for hourly precipitation',
+                                            action="store_true", default=False)
+    parser.add_argument('-g','--gridfile',  help='MPAS file with the cell locations, default the first forecast file', type=str, default=None)
+    parser.add_argument('--method',         help='Remap method of the MPAS fields',             choices=mpas_remap.remap_methods, default="nearest")
+    parser.add_argument('-o','--outfile',   help='Scores output file, .csv or .nc',             type=str, default='mpas_fss.csv')
+    parser.add_argument('-n','--nprocess',  help='Number of worker processes',                   type=int, default=None)
+    parser.add_argument('--cachedir',       help='Directory of the remap weights, default to that of the grid file', type=str, default=None)
+    mpas_profile.add_arguments(parser)
+
+    args = parser.parse_args()
+
+    fcstfiles = sorted(set(fname for pattern in args.fcstfiles for fname in glob.glob(pattern)))
+    if len(fcstfiles) == 0:
+        print(f"ERROR: no forecast file matches {args.fcstfiles}.")
+        sys.exit(1)
+
+    try:
+        thresholds = [float(item) for item in args.thresholds.split(',')]
+        widths     = [int(item)   for item in args.widths.split(',')]
+    except ValueError:
+        print(f"ERROR: thresholds and widths must be numbers, get \"{args.thresholds}\" and \"{args.widths}\".")
+        sys.exit(1)
+
+    if any(width < 1 or width%2 == 0 for width in widths):
+        print(f"ERROR: neighbourhood widths must be odd, get {widths}.")
+        sys.exit(1)
+
+    isgrib = fcstfiles[0].endswith(('.grib2', '.grb2'))
+
+    match = args.match
+    if match is None:
+        match = mpas_verify.verify_fields.get(args.field)
+        if match is None:
+            print(f"ERROR: no analysis field for {args.field}, use option -m.")
+            sys.exit(1)
+
+    prof = mpas_profile.Profiler.from_args('mpas_fss', args)
+
+    time0 = time.time()
+
+    #
+    # Forecast hours
+    #
+    tasks = []
+    fieldname = args.field
+    with prof.stage("read"):
+        if isgrib:
+            for fcstfile in fcstfiles:
+                try:
+                    msg = mpas_grib2.match(mpas_grib2.scan_inventory(fcstfile), args.field)[0]
+                except (ValueError, IndexError):
+                    print(f"WARNING: no {args.field} in {fcstfile}, skipped.")
+                    continue
+                validtime = msg.reftime + datetime.timedelta(hours=msg.endStep)
+                tasks.append((fcstfile, None, msg.endStep, validtime))
+                fieldname = msg.name
+        else:
+            times = [mpas_verify.valid_time(fcstfile) for fcstfile in fcstfiles]
+            inittime = times[0][1] if times[0][1] is not None else min(validtime for validtime, _ in times)
+            for n, (fcstfile, (validtime, _)) in enumerate(zip(fcstfiles, times)):
+                prevfile = None
+                if args.bucket:
+                    if n == 0:
+                        continue
+                    prevfile = fcstfiles[n-1]
+                tasks.append((fcstfile, prevfile, (validtime-inittime).total_seconds()/3600.0, validtime))
+
+    if len(tasks) == 0:
+        print(f"ERROR: no forecast to be scored in {fcstfiles}.")
+        sys.exit(1)
+
+    #
+    # Grid of the analyses, and the remap weights of MPAS
+    #
+    gridspec = None
+    for fcstfile, prevfile, fhour, validtime in tasks:
+        analfile = validtime.strftime(args.analysis)
+        if os.path.lexists(analfile):
+            selected = mpas_grib2.match(mpas_grib2.scan_inventory(analfile), match)
+            if len(selected) == 0:
+                print(f"ERROR: no message of {analfile} matches \"{match}\".")
+                sys.exit(1)
+            try:
+                gridspec = mpas_verify.grid_gridspec(selected[0].grid)
+            except ValueError as ex:
+                print(f"ERROR: {analfile}: {ex}.")
+                sys.exit(1)
+            break
+
+    if gridspec is None:
+        print(f"ERROR: no analysis file {args.analysis} found for the forecast files.")
+        sys.exit(1)
+
+    print(f"{len(tasks)} forecasts of {args.field}, analyses on the {gridspec['nx']}x{gridspec['ny']} grid of {analfile}")
+
+    remap = None
+    if not isgrib:
+        gridfile = fcstfiles[0] if args.gridfile is None else args.gridfile
+        gridname = f"lambert{gridspec['nx']}x{gridspec['ny']}"
+        with prof.stage("weights"):
+            remap = mpas_remap.Remapper.load(gridfile, None, args.method, args.cachedir, prof, args.verbose,
+                                             gridspec=gridspec, gridname=gridname)
+
+    # The workers inherit the remap weights, so they must be forked
+    fss_state.update(analysis=args.analysis, match=match, field=args.field, gridspec=gridspec, remap=remap,
+                     thresholds=thresholds, widths=widths, name=fieldname)
+
+    nprocess = args.nprocess if args.nprocess is not None else mpas_profile.get_nprocess(len(tasks))
+
+    with prof.stage("fss"):
+        if nprocess > 1 and len(tasks) > 1:
+            with mp.get_context('fork').Pool(min(nprocess, len(tasks))) as pool:
+                results = pool.map(fss_file, tasks)
+        else:
+            results = [fss_file(task) for task in tasks]
+
+    prof.count("fields_scored", sum(1 for frows in results if frows))
+
+    # scale_km is inserted after the width
+    dx   = min(gridspec['dx'], gridspec['dy'])/1000.0
+    rows = [ row[:5] + [row[4]*dx] + row[5:] for frows in results for row in frows ]
+
+    #
+    # FSS over all hours, from the sums of the components
+    #
+    print(f"    {'threshold':>10s} {'width':>6s} {'km':>7s} {'FSS':>7s} {'useful':>7s}")
+    for threshold in thresholds:
+        for width in widths:
+            selected = [row for row in rows if row[3] == threshold and row[4] == width]
+            mse      = sum(row[8] for row in selected)
+            mse_ref  = sum(row[9] for row in selected)
+            fss      = 1.0 - mse/mse_ref if mse_ref > 0.0 else np.nan
+            useful   = np.mean([row[7] for row in selected]) if selected else np.nan
+            print(f"    {threshold:10g} {width:6d} {width*dx:7.1f} {fss:7.4f} {useful:7.4f}")
+
+    if args.verbose:
+        for row in rows:
+            print(f"    f{row[1]:04.1f} {row[3]:8g} {row[4]:4d}: fss={row[6]:7.4f} fcst_rate={row[10]:.4f} anal_rate={row[11]:.4f}")
+
+    if args.outfile.endswith('.nc'):
+        write_netcdf(args.outfile, rows, { 'field': args.field, 'analysis': args.analysis, 'match': match,
+                                           'method': args.method, 'dx_km': dx })
+    else:
+        write_csv(args.outfile, rows)
+
+    print(f"FSS of {len(rows)} hours/thresholds/widths written to {args.outfile}. Used ({time.time()-time0:.1f}) seconds.")
+
+    prof.finish()
@@ -0,0 +1,476 @@
+#!/usr/bin/env python
+#
+# This module reads GRIB2 files by message, without decoding the whole file.
+#
+# The inventory of a file is built by reading the section headers of each
+# message only (sections 0, 1, 3 and 4), the data sections are skipped with
+# a seek. Each message gets a line similar to "wgrib2 -s":
+#
+#   98:45871273:d=2023041400:APCP:surface 0:0-2 hour acc fcst
+#
+# i.e. message number, byte offset, reference time, name, level type and
+# level (the typeOfLevel of ecCodes/cfgrib), forecast time. The fields of a
+# multi-field message (e.g. U and V written with "wgrib2 -submsg_uv") are
+# numbered "N.1", "N.2", ... and each one is read as a message on its own. The names are
+# the NCEP mnemonics of the UPP table fix_files/UPP/hrrr_params_grib2_tbl_new.
+#
+# The messages are selected with a regular expression on the inventory lines
+# (as "wgrib2 -match"), and only the selected messages are read by their byte
+# range. They are copied as is with "-x", or decoded with ecCodes in parallel
+# worker processes, so the cost of getting one field is proportional to the
+# size of that field, not of the file. For example,
+#
+#   mpas_grib2.py MPAS-A_2023041400f02.grib2                     # inventory
+#   mpas_grib2.py MPAS-A_2023041400f02.grib2 -m ":APCP:surface 0:0-[0-9]+ hour acc" -x apcp.grib2
+#   mpas_grib2.py MPAS-A_2023041400f02.grib2 -m ":REFD:hybrid" --decode
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import re
+import sys
+import struct
+import argparse
+import datetime
+import collections
+
+import numpy as np
+
+import multiprocessing as mp
+
+import mpas_profile
+
+default_table = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'fix_files', 'UPP', 'hrrr_params_grib2_tbl_new')
+
+# Code table 4.5, fixed surface types as the typeOfLevel of ecCodes
+level_types = { 1: 'surface',            2: 'cloudBase',          3: 'cloudTop',
+                4: 'isothermZero',       5: 'adiabaticCondensation',
+                6: 'maxWind',            7: 'tropopause',         8: 'nominalTop',
+               10: 'atmosphere',        20: 'isothermal',       100: 'isobaricInhPa',
+              101: 'meanSea',          102: 'heightAboveSea',   103: 'heightAboveGround',
+              104: 'sigma',            105: 'hybrid',           106: 'depthBelowLand',
+              107: 'theta',            108: 'pressureFromGround', 111: 'eta',
+              200: 'atmosphereSingleLayer', 215: 'cloudCeiling', 220: 'planetaryBoundaryLayer' }
+
+# Code table 4.4, time units in hours
+time_units = { 0: 1.0/60, 1: 1.0, 2: 24.0, 10: 3.0, 11: 6.0, 12: 12.0, 13: 1.0/3600 }
+
+# Code table 4.10, statistical processes
+stat_types = { 0: 'avg', 1: 'accum', 2: 'max', 3: 'min', 4: 'diff' }
+stat_names = { 'avg': 'ave', 'accum': 'acc', 'max': 'max', 'min': 'min', 'diff': 'diff' }
+
+# Offset of the statistical processing part of the product definition templates
+stat_offsets = { 8: 34, 11: 37, 12: 36 }
+
+# Code table 3.2, radius (m) of the spherical Earth shapes
+earth_radii = { 0: 6367470.0, 6: 6371229.0, 8: 6371200.0 }
+
+# A field of a GRIB2 file. The fields of a multi-field message (e.g. the U and V
+# of "wgrib2 -submsg_uv") have their sub-message number and the byte ranges
+# (offset, length) of the sections 1-7 that make them a message on their own
+Message = collections.namedtuple('Message', ['number', 'offset', 'length', 'reftime',
+                                             'discipline', 'category', 'parameter', 'name',
+                                             'typeOfLevel', 'level', 'level2',
+                                             'stepType', 'startStep', 'endStep', 'nx', 'ny', 'grid',
+                                             'submsg', 'sections'], defaults=[None, None])
+
+_param_names = {}
+
+########################################################################
+
+def param_names(tablefile=default_table):
+    '''NCEP mnemonics of the parameters, {(discipline, category, number): name}'''
+
+    if tablefile not in _param_names:
+        names = {}
+        try:
+            with open(tablefile, 'r') as table:
+                for line in table:
+                    items = line.split()
+                    if len(items) < 5 or line.startswith('!'):
+                        continue
+                    names.setdefault((int(items[0]), int(items[1]), int(items[2])), items[4])
+        except OSError:
+            print(f"WARNING: GRIB2 parameter table {tablefile} not found, use the parameter numbers.")
+
+        _param_names[tablefile] = names
+
+    return _param_names[tablefile]
+
+########################################################################
+
+def uint(data):
+    return int.from_bytes(data, 'big')
+
+def sint(data):
+    '''GRIB2 signed integer, the first bit is the sign'''
+    value = int.from_bytes(data, 'big')
+    sign  = 1 << (8*len(data)-1)
+    return -(value & (sign-1)) if value & sign else value
+
+def surface_value(scale, value):
+    '''Value of a fixed surface from octets of its scale factor and scaled value'''
+    if scale[0] == 0xFF or uint(value) == 0xFFFFFFFF:
+        return 0.0
+    return sint(value)/10.0**sint(scale)
+
+########################################################################
+
+def parse_product(sect4, names, discipline):
+    '''Parameter, level and forecast time of a product definition section'''
+
+    template  = uint(sect4[7:9])
+    category  = sect4[9]
+    parameter = sect4[10]
+    name      = names.get((discipline, category, parameter), f"var{discipline}_{category}_{parameter}")
+
+    unit  = time_units.get(sect4[17], 1.0)
+    fhour = sint(sect4[18:22])*unit
+
+    type1, type2 = sect4[22], sect4[28]
+    level  = surface_value(sect4[23:24], sect4[24:28])
+    level2 = surface_value(sect4[29:30], sect4[30:34]) if type2 != 0xFF else None
+
+    typeOfLevel = level_types.get(type1, f"level{type1}")
+    if type1 in (100, 108):                                 # Pa to hPa
+        level  = level/100.0
+        level2 = level2/100.0 if level2 is not None else None
+    if type2 == type1 and 100 <= type1 <= 108:
+        typeOfLevel += "Layer"
+
+    stepType, startStep, endStep = 'instant', fhour, fhour
+    if template in stat_offsets and len(sect4) >= stat_offsets[template]+19:
+        stat     = sect4[stat_offsets[template]+7:]         # first time range
+        stepType = stat_types.get(stat[5], f"stat{stat[5]}")
+        endStep  = fhour + uint(stat[8:12])*time_units.get(stat[7], 1.0)
+
+    return category, parameter, name, typeOfLevel, level, level2, stepType, startStep, endStep
+
+########################################################################
+
+def parse_grid(sect3):
+    '''Grid definition of a grid definition section, as a dict
+
+    The Lambert conformal (template 30), lat/lon (0) and rotated lat/lon (1)
+    grids are decoded, the angles are in degrees and the distances in meters.
+    Bit 0x08 of "resflags" is set when the vector components are grid relative.
+    '''
+
+    template = uint(sect3[12:14])
+    grid = { 'template': template, 'nx': uint(sect3[30:34]), 'ny': uint(sect3[34:38]) }
+
+    shape = sect3[14]
+    if shape == 1:
+        grid['radius'] = uint(sect3[16:20])/10.0**sect3[15]
+    else:
+        grid['radius'] = earth_radii.get(shape, 6371229.0)    # ellipsoids are taken as the sphere of UPP
+
+    if template == 30:
+        grid.update( la1 = sint(sect3[38:42])*1e-6, lo1 = uint(sect3[42:46])*1e-6, resflags = sect3[46],
+                     lad = sint(sect3[47:51])*1e-6, lov = uint(sect3[51:55])*1e-6,
+                     dx  = uint(sect3[55:59])*1e-3, dy  = uint(sect3[59:63])*1e-3,
+                     scanmode = sect3[64],
+                     latin1 = sint(sect3[65:69])*1e-6, latin2 = sint(sect3[69:73])*1e-6 )
+    elif template in (0, 1):
+        basic, subdiv = uint(sect3[38:42]), uint(sect3[42:46])
+        unit = 1e-6 if basic in (0, 0xFFFFFFFF) or subdiv in (0, 0xFFFFFFFF) else basic/subdiv
+        grid.update( la1 = sint(sect3[46:50])*unit, lo1 = uint(sect3[50:54])*unit, resflags = sect3[54],
+                     la2 = sint(sect3[55:59])*unit, lo2 = uint(sect3[59:63])*unit,
+                     dx  = uint(sect3[63:67])*unit, dy  = uint(sect3[67:71])*unit,
+                     scanmode = sect3[71] )
+        if template == 1:
+            grid.update( lasp = sint(sect3[72:76])*unit, losp = uint(sect3[76:80])*unit,
+                         rotation = struct.unpack('>f', sect3[80:84])[0] )     # IEEE 32-bit float
+
+    return grid
+
+########################################################################
+
+def scan_inventory(fname, tablefile=default_table):
+    '''Inventory of the messages in a GRIB2 file, from their section headers only'''
+
+    names    = param_names(tablefile)
+    messages = []
+    number   = 0
+
+    with open(fname, 'rb') as gribfile:
+        offset = 0
+        while True:
+            gribfile.seek(offset)
+            sect0 = gribfile.read(16)
+            if len(sect0) < 16:
+                break
+            if sect0[0:4] != b'GRIB':                       # padding between messages
+                start = sect0.find(b'G', 1)
+                offset += start if start > 0 else 16
+                continue
+            if sect0[7] != 2:
+                raise ValueError(f"Message at byte {offset} of {fname} is GRIB edition {sect0[7]}, only GRIB2 is supported")
+
+            discipline = sect0[6]
+            length     = uint(sect0[8:16])
+            end        = offset + length
+
+            # Sections 2-7 (or 3-7, 4-7) are repeated for each field of a multi-field message
+            reftime, grid, product = None, None, None
+            ranges, bitmap, fields = {}, None, []
+            position = offset + 16
+            while position < end - 4:
+                gribfile.seek(position)
+                header = gribfile.read(6)
+                if len(header) < 5 or header[0:4] == b"7777":
+                    break
+                slength, snumber = uint(header[0:4]), header[4]
+                if slength < 5:
+                    raise ValueError(f"Bad section {snumber} at byte {position} of {fname}")
+
+                ranges[snumber] = (position, slength)
+                if snumber in (1, 3, 4):
+                    section = header + gribfile.read(slength-6)
+                    if snumber == 1:
+                        reftime = datetime.datetime(uint(section[12:14]), *section[14:19])
+                    elif snumber == 3:
+                        grid = parse_grid(section)
+                    else:
+                        product = parse_product(section, names, discipline)
+                elif snumber == 6:
+                    if header[5] == 0:                      # a bitmap, which the next fields can reuse
+                        bitmap = ranges[6]
+                    elif header[5] == 254 and bitmap is not None:
+                        ranges[6] = bitmap
+                elif snumber == 7 and product is not None:
+                    fields.append((product, grid, tuple(ranges[key] for key in sorted(ranges))))
+                position += slength
+
+            if len(fields) == 0:
+                print(f"WARNING: no product definition in message at byte {offset} of {fname}, skipped.")
+
+            number += 1
+            for isub, (product, grid, sections) in enumerate(fields, 1):
+                if len(fields) == 1:                        # read as is
+                    messages.append(Message(number, offset, length, reftime, discipline, *product,
+                                            grid['nx'], grid['ny'], grid))
+                else:
+                    flength = 16 + sum(slength for _, slength in sections) + 4
+                    messages.append(Message(number, offset, flength, reftime, discipline, *product,
+                                            grid['nx'], grid['ny'], grid, isub, sections))
+
+            offset = end
+
+    return messages
+
+########################################################################
+
+def ftime_string(msg):
+    '''Forecast time of a message as in wgrib2, e.g. "2 hour fcst", "0-2 hour acc fcst"'''
+
+    if msg.stepType == 'instant':
+        return "anl" if msg.endStep == 0 else f"{msg.endStep:g} hour fcst"
+
+    return f"{msg.startStep:g}-{msg.endStep:g} hour {stat_names.get(msg.stepType, msg.stepType)} fcst"
+
+def inventory_line(msg):
+    '''One line of the inventory, similar to "wgrib2 -s"'''
+
+    datestr = msg.reftime.strftime('%Y%m%d%H') if msg.reftime is not None else "unknown"
+    levstr  = f"{msg.typeOfLevel} {msg.level:g}"
+    if msg.level2 is not None and msg.typeOfLevel.endswith("Layer"):
+        levstr += f"-{msg.level2:g}"
+
+    number  = msg.number if msg.submsg is None else f"{msg.number}.{msg.submsg}"
+
+    return f"{number}:{msg.offset}:d={datestr}:{msg.name}:{levstr}:{ftime_string(msg)}"
+
+########################################################################
+
+def grid_projection(grid):
+    '''Cartopy projection of a grid definition, None when the grid is not supported'''
+
+    import cartopy.crs as ccrs
+
+    globe = ccrs.Globe(ellipse=None, semimajor_axis=grid['radius'], semiminor_axis=grid['radius'])
+
+    lon180 = lambda lon: (lon+180.0) % 360.0 - 180.0
+
+    if grid['template'] == 30:
+        return ccrs.LambertConformal(central_longitude=lon180(grid['lov']), central_latitude=grid['lad'],
+                                     standard_parallels=(grid['latin1'], grid['latin2']), globe=globe)
+    elif grid['template'] == 1:
+        return ccrs.RotatedPole(pole_longitude=lon180(grid['losp']+180.0), pole_latitude=-grid['lasp'],
+                                central_rotated_longitude=grid['rotation'], globe=globe)
+    elif grid['template'] == 0:
+        return ccrs.PlateCarree(globe=globe)
+
+    return None
+
+########################################################################
+
+def grid_extent(grid, proj):
+    '''Extent (x0, x1, y0, y1) of the grid boxes in the projection plane, for imshow(origin='lower')
+
+    The extent is reversed along the directions the grid points are scanned backward.
+    '''
+
+    import cartopy.crs as ccrs
+
+    if grid['template'] == 30:
+        x0, y0 = proj.transform_point(grid['lo1'], grid['la1'], ccrs.Geodetic(globe=proj.globe))
+    else:
+        x0, y0 = (grid['lo1']+180.0) % 360.0 - 180.0, grid['la1']
+
+    dx = -grid['dx'] if grid['scanmode'] & 0x80 else grid['dx']
+    dy =  grid['dy'] if grid['scanmode'] & 0x40 else -grid['dy']
+
+    return ( x0-0.5*dx, x0+(grid['nx']-0.5)*dx, y0-0.5*dy, y0+(grid['ny']-0.5)*dy )
+
+########################################################################
+
+def match(messages, pattern=None, **keys):
+    '''Messages whose inventory line matches the regular expression pattern and whose fields equal keys'''
+
+    selected = []
+    regex = re.compile(pattern) if pattern is not None else None
+    for msg in messages:
+        if regex is not None and not regex.search(inventory_line(msg)):
+            continue
+        if any(getattr(msg, key) != value for key, value in keys.items()):
+            continue
+        selected.append(msg)
+
+    return selected
+
+########################################################################
+
+def message_bytes(gribfile, msg):
+    '''Bytes of a message from an open GRIB2 file, a field of a multi-field message as a message on its own'''
+
+    gribfile.seek(msg.offset)
+    if msg.sections is None:
+        return gribfile.read(msg.length)
+
+    sect0  = gribfile.read(16)
+    chunks = [sect0[0:8] + msg.length.to_bytes(8, 'big')]
+    for position, slength in msg.sections:
+        gribfile.seek(position)
+        chunks.append(gribfile.read(slength))
+    chunks.append(b"7777")
+
+    return b"".join(chunks)
+
+########################################################################
+
+def read_bytes(fname, messages):
+    '''Raw bytes of the messages, read by their byte ranges'''
+
+    with open(fname, 'rb') as gribfile:
+        return [message_bytes(gribfile, msg) for msg in messages]
+
+########################################################################
+
+def decode_message(task):
+    '''Decode one message with ecCodes, task is (file name, message); missing values are NaN'''
+
+    import eccodes
+
+    fname, msg = task
+    with open(fname, 'rb') as gribfile:
+        data = message_bytes(gribfile, msg)
+
+    gid = eccodes.codes_new_from_message(data)
+    try:
+        nx = eccodes.codes_get(gid, 'Nx')
+        ny = eccodes.codes_get(gid, 'Ny')
+        values = eccodes.codes_get_values(gid).astype(np.float32)
+        if eccodes.codes_get(gid, 'bitmapPresent'):
+            values[values == eccodes.codes_get(gid, 'missingValue')] = np.nan
+    finally:
+        eccodes.codes_release(gid)
+
+    return values.reshape(ny, nx)
+
+########################################################################
+
+def read_fields(fname, messages, nprocess=None, prof=None):
+    '''Decode the messages of a GRIB2 file to (ny, nx) arrays, in parallel worker processes'''
+
+    if prof is None:
+        prof = mpas_profile.Profiler('mpas_grib2')
+
+    if nprocess is None:
+        nprocess = mpas_profile.get_nprocess(len(messages))
+
+    tasks = [(fname, msg) for msg in messages]
+    with prof.stage("decode"):
+        if nprocess > 1 and len(tasks) > 1:
+            with mp.Pool(min(nprocess, len(tasks))) as pool:
+                fields = pool.map(decode_message, tasks)
+        else:
+            fields = [decode_message(task) for task in tasks]
+
+    prof.count("bytes_read", sum(msg.length for msg in messages))
+    prof.count("points_decoded", sum(field.size for field in fields))
+
+    return fields
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='List, extract or decode messages of a GRIB2 file by its inventory',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('gribfile',         help='GRIB2 file')
+
+    parser.add_argument('-m','--match',     help='Regular expression to select messages by their inventory lines', type=str, default=None)
+    parser.add_argument('-x','--extract',   help='Copy the selected messages to this GRIB2 file',  type=str, default=None)
+    parser.add_argument('--decode',         help='Decode the selected messages and print their ranges', action="store_true", default=False)
+    parser.add_argument('-n','--nprocess',  help='Number of worker processes for decoding',       type=int, default=None)
+    parser.add_argument('--table',          help='GRIB2 parameter table of the names',            type=str, default=default_table)
+    mpas_profile.add_arguments(parser)
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.gribfile):
+        print(f"ERROR: GRIB2 file {args.gribfile} not found.")
+        sys.exit(1)
+
+    prof = mpas_profile.Profiler.from_args('mpas_grib2', args)
+
+    try:
+        with prof.stage("inventory"):
+            messages = scan_inventory(args.gribfile, args.table)
+    except ValueError as ex:
+        print(f"ERROR: {ex}.")
+        sys.exit(1)
+    prof.count("messages_scanned", len(messages))
+
+    selected = match(messages, args.match)
+
+    if args.match is not None and len(selected) == 0:
+        print(f"ERROR: no message in {args.gribfile} matches \"{args.match}\".")
+        sys.exit(1)
+
+    if args.extract is not None:
+        with prof.stage("extract"), open(args.extract, 'wb') as outfile:
+            for data in read_bytes(args.gribfile, selected):
+                outfile.write(data)
+        prof.count("bytes_read", sum(msg.length for msg in selected))
+        print(f"Extracted {len(selected)} messages of {args.gribfile} to {args.extract}.")
+    elif args.decode:
+        fields = read_fields(args.gribfile, selected, args.nprocess, prof)
+        for msg, field in zip(selected, fields):
+            print(f"{inventory_line(msg)}:min={np.nanmin(field):g}:max={np.nanmax(field):g}")
+    else:
+        for msg in selected:
+            print(inventory_line(msg))
+
+    prof.finish()
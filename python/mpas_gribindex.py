@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+#
+# This module keeps the cfgrib index files of GRIB2 files in a shared cache
+# directory, instead of next to the GRIB2 files.
+#
+# cfgrib scans the whole file to build its index of the messages, and tries
+# to save it as "<file>.<hash>.idx" next to the file. For the read-only files
+# on /lfs4 it cannot, so every open (one per typeOfLevel, and the second file
+# of a difference) scans the file again. The index does not depend on the
+# filter, it is filtered after it is loaded, so one index serves all opens
+# of a file.
+#
+# The index of a file is kept as
+#
+#   <cache>/<file name>.<fingerprint>.<hash>.idx
+#
+# where the fingerprint comes from the real path, size and modification time
+# of the file, so a rewritten file gets a new index. The cache directory is
+# "-d", or $MPAS_GRIBINDEX, or ~/.cache/mpas_gribindex.
+#
+# The index is built on the first open, or right after UPP writes the file:
+#
+#   mpas_gribindex.py MPAS-A_2023041400f01.grib2
+#   mpas_gribindex.py --prune 7                  # remove indices older than 7 days
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+
+########################################################################
+
+def cache_root(cachedir=None):
+    if cachedir is None:
+        cachedir = os.environ.get("MPAS_GRIBINDEX", os.path.join(os.path.expanduser("~"), ".cache", "mpas_gribindex"))
+    return cachedir
+
+########################################################################
+
+def file_fingerprint(fname):
+    '''Fingerprint of a file, from its real path, size and modification time'''
+
+    realpath = os.path.realpath(fname)
+    stat     = os.stat(realpath)
+
+    return hashlib.sha1(f"{realpath}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+
+########################################################################
+
+def indexpath(fname, cachedir=None):
+    '''cfgrib "indexpath" template of a GRIB2 file in the cache, cfgrib fills in {short_hash}'''
+
+    cachedir = cache_root(cachedir)
+    os.makedirs(cachedir, exist_ok=True)
+
+    return os.path.join(cachedir, f"{os.path.basename(fname)}.{file_fingerprint(fname)}.{{short_hash}}.idx")
+
+########################################################################
+
+def open_dataset(fname, filters, cachedir=None):
+    '''Open a GRIB2 file with xarray/cfgrib, with its index in the cache'''
+
+    import xarray as xr
+
+    try:
+        idxpath = indexpath(fname, cachedir)
+    except OSError:                                 # no cache, cfgrib keeps the index in memory
+        idxpath = ''
+
+    # cfgrib checks the file path saved in the index, so the same file is always opened by its real path
+    return xr.open_dataset(os.path.realpath(fname), engine='cfgrib', filter_by_keys=filters, indexpath=idxpath)
+
+########################################################################
+
+def build_index(fname, cachedir=None):
+    '''Build the index of a GRIB2 file in the cache, as xarray/cfgrib would on open, returns its number of messages'''
+
+    from cfgrib import dataset, messages
+
+    stream     = messages.FileStream(os.path.realpath(fname), errors="warn")
+    index_keys = dataset.compute_index_keys(("time", "step"), {})
+    index      = dataset.open_fileindex(stream, indexpath(fname, cachedir), index_keys)
+
+    return sum(len(message_ids) for _, message_ids in index.iter_index())
+
+########################################################################
+
+def prune(days, cachedir=None):
+    '''Remove the index files not used in "days" days, returns their number'''
+
+    cachedir = cache_root(cachedir)
+    if not os.path.isdir(cachedir):
+        return 0
+
+    oldest  = time.time() - days*86400.0
+    removed = 0
+    for fname in os.listdir(cachedir):
+        path = os.path.join(cachedir, fname)
+        if fname.endswith(".idx") and os.stat(path).st_atime < oldest:
+            os.remove(path)
+            removed += 1
+
+    return removed
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Build the cfgrib indices of GRIB2 files in a shared cache',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('gribfiles',        help='GRIB2 files', nargs='*')
+
+    parser.add_argument('-d','--indexdir',  help='Cache directory of the indices',          type=str,   default=None)
+    parser.add_argument('--prune',          help='Remove the indices not used in this number of days', type=float, default=None)
+
+    args = parser.parse_args()
+
+    if args.prune is not None:
+        removed = prune(args.prune, args.indexdir)
+        print(f"Removed {removed} index files from {cache_root(args.indexdir)}.")
+
+    for gribfile in args.gribfiles:
+        if not os.path.isfile(gribfile):
+            print(f"ERROR: GRIB2 file {gribfile} not found.")
+            sys.exit(1)
+
+        time0 = time.time()
+        nmessages = build_index(gribfile, args.indexdir)
+        print(f"Indexed {nmessages} messages of {gribfile} in ({time.time()-time0:.1f}) seconds.")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+#
+# This module checks that an output Lambert grid (e.g. wofs_mpas_output.grid)
+# is covered by a regional MPAS mesh, before MPASSIT/UPP are run on it:
+#
+#   mpas_gridcheck.py wofs_mpas.static.nc [-g wofs_mpas_output.grid] [-o mask.nc]
+#
+# All grid points are projected to the plane of the grid at once and matched
+# to their nearest cell center with a k-d tree of the cells. A grid point is
+#
+#   0  in the interior of the mesh
+#   1  in the relaxation zone (bdyMaskCell 1-5 of the nearest cell)
+#   2  in the specified zone (bdyMaskCell 6-7)
+#   3  out of the mesh (farther than one cell spacing from any cell center)
+#
+# The counts and the minimum distances from the grid to the relaxation zone
+# and to the specified zone are printed (or how deep a zone reaches into the
+# grid), the codes can be written as a (ny, nx) mask with "-o".
+# The exit status is 1 when a grid point is not in the interior, so that a
+# run script can stop before the forecast, e.g.
+#
+#   mpas_gridcheck.py $domname.static.nc -g wofs_mpas_output.grid || exit 1
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from netCDF4 import Dataset
+
+import mpas_profile
+import mpas_remap
+
+zone_names = ["interior", "relaxation zone", "specified zone", "out of mesh"]
+
+boundary_zones = {"relaxation zone": (1, 5), "specified zone": (6, 7)}     # bdyMaskCell values
+
+########################################################################
+
+def zone_distance(cells, nx, ny, dx, dy):
+    '''Signed distance (m) from the grid rectangle to the cells (in grid units)
+
+    Positive: the distance from the rectangle to the nearest cell outside of it.
+    Negative: the cells reach into the grid, minus the depth of the deepest one
+    from the nearest side of the rectangle.
+    '''
+
+    if len(cells) == 0:
+        return float('inf')
+
+    x, y = cells[:,0], cells[:,1]
+    inside = (x >= 0.0) & (x <= nx-1) & (y >= 0.0) & (y <= ny-1)
+    if inside.any():
+        depth = np.minimum(np.minimum(x[inside], (nx-1)-x[inside])*dx, np.minimum(y[inside], (ny-1)-y[inside])*dy)
+        return -depth.max()
+
+    ddx = np.maximum(np.maximum(-x, x-(nx-1)), 0.0)*dx
+    ddy = np.maximum(np.maximum(-y, y-(ny-1)), 0.0)*dy
+    return np.hypot(ddx, ddy).min()
+
+########################################################################
+
+def grid_coverage(latCell, lonCell, bdyMaskCell, gridspec, prof=None):
+    '''Zone code (ny, nx) of each grid point and the signed distances (m) from the grid to the
+       relaxation and specified zones (see zone_distance), by the names in boundary_zones
+    '''
+
+    import cartopy.crs as ccrs
+    from scipy.spatial import cKDTree
+
+    if prof is None:
+        prof = mpas_profile.Profiler('mpas_gridcheck')
+
+    nx, ny = gridspec["nx"], gridspec["ny"]
+    dx, dy = gridspec["dx"], gridspec["dy"]
+
+    with prof.stage("project"):
+        xyz   = mpas_remap.grid_projection(gridspec).transform_points(ccrs.PlateCarree(), np.degrees(lonCell), np.degrees(latCell))
+        cells = np.stack([xyz[:,0]/dx, xyz[:,1]/dy], axis=1)
+
+    with prof.stage("index"):
+        tree    = cKDTree(cells)
+        spacing = mpas_remap.mesh_spacing(cells, tree)
+
+    with prof.stage("match"):
+        jj, ii = np.divmod(np.arange(nx*ny), nx)
+        points = np.stack([ii, jj], axis=1).astype(np.float64)
+        dists, nearest = tree.query(points, distance_upper_bound=spacing)
+
+        inmesh = dists <= spacing
+        zone   = np.full(nx*ny, 3, dtype=np.int8)
+        mask   = np.asarray(bdyMaskCell)[nearest[inmesh]]
+        zone[inmesh] = np.where(mask == 0, 0, np.where(mask <= 5, 1, 2))
+
+    prof.count("points_checked", nx*ny)
+
+    # Distances from the grid rectangle to the cells of each boundary zone
+    bdymask   = np.asarray(bdyMaskCell)
+    distances = {}
+    for name, (lower, upper) in boundary_zones.items():
+        distances[name] = zone_distance(cells[(bdymask >= lower) & (bdymask <= upper)], nx, ny, dx, dy)
+
+    return zone.reshape(ny, nx), distances
+
+########################################################################
+
+def write_mask(fname, zone, gridspec, meshfile):
+    '''Write the zone codes of the grid points to a netCDF file'''
+
+    ny, nx = zone.shape
+    with Dataset(fname, 'w') as ncfile:
+        ncfile.createDimension('nx', nx)
+        ncfile.createDimension('ny', ny)
+        for key, value in gridspec.items():
+            ncfile.setncattr(key, value)
+        ncfile.setncattr('meshfile', os.path.realpath(meshfile))
+
+        var = ncfile.createVariable('coverage', 'i1', ('ny', 'nx'), zlib=True)
+        var.setncattr('long_name', 'MPAS mesh coverage of the grid points')
+        var.setncattr('flag_values', np.arange(len(zone_names), dtype=np.int8))
+        var.setncattr('flag_meanings', ' '.join(name.replace(' ','_') for name in zone_names))
+        var[:] = zone
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Check that an output grid is covered by a regional MPAS mesh',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('meshfile',help='Regional MPAS file with the cell locations and bdyMaskCell, e.g. static or init file')
+
+    parser.add_argument('-v','--verbose',   help='Verbose output',                              action="store_true", default=False)
+    parser.add_argument('-g','--outgrid',   help='Output grid specification file',              type=str, default=mpas_remap.default_gridspec)
+    parser.add_argument('-o','--outfile',   help='Write the coverage mask of the grid points to this netCDF file', type=str, default=None)
+    mpas_profile.add_arguments(parser)
+
+    args = parser.parse_args()
+
+    for fname in (args.meshfile, args.outgrid):
+        if not os.path.lexists(fname):
+            print(f"ERROR: file {fname} not found.")
+            sys.exit(1)
+
+    prof = mpas_profile.Profiler.from_args('mpas_gridcheck', args)
+
+    time0 = time.time()
+
+    gridspec = mpas_remap.read_gridspec(args.outgrid)
+
+    with prof.stage("read"), Dataset(args.meshfile, 'r') as mesh:
+        latCell = mesh.variables['latCell'][:]
+        lonCell = mesh.variables['lonCell'][:]
+        if 'bdyMaskCell' in mesh.variables:
+            bdyMaskCell = mesh.variables['bdyMaskCell'][:]
+        else:
+            print(f"WARNING: no bdyMaskCell in {args.meshfile}, the lateral boundary zone is not checked.")
+            bdyMaskCell = np.zeros(len(latCell), dtype=np.int32)
+
+    zone, distances = grid_coverage(latCell, lonCell, bdyMaskCell, gridspec, prof)
+
+    npoints = zone.size
+    print(f"Output grid {os.path.basename(args.outgrid)} ({gridspec['nx']}x{gridspec['ny']}) on {args.meshfile}:")
+    for code, name in enumerate(zone_names):
+        count = np.count_nonzero(zone == code)
+        print(f"    {name:16s}: {count:9d} points ({100.0*count/npoints:6.2f}%)")
+
+    for name, distance in distances.items():
+        if np.isinf(distance):
+            continue
+        elif distance < 0.0:
+            print(f"    The {name} reaches {-distance/1000.0:.1f} km into the output grid.")
+        else:
+            print(f"    Distance from the grid to the {name}: {distance/1000.0:.1f} km")
+
+    if args.verbose and np.any(zone > 0):
+        jj, ii = np.nonzero(zone > 0)
+        print(f"    Grid points not in the interior are in i = {ii.min()}-{ii.max()}, j = {jj.min()}-{jj.max()}")
+
+    if args.outfile is not None:
+        write_mask(args.outfile, zone, gridspec, args.meshfile)
+        print(f"Coverage mask written to {args.outfile}.")
+
+    print(f"Used ({time.time()-time0:.1f}) seconds.")
+
+    prof.finish()
+
+    if np.any(zone > 0):
+        sys.exit(1)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+#
+# This module keeps the MPAS mesh geometry of a patch file in shared memory,
+# so that the many plot processes launched on one node attach to one copy
+# of it, instead of each unpickling its own (hundreds of MB for the 3-km
+# CONUS mesh).
+#
+# The geometry is stored as plain NumPy arrays under /dev/shm (or the directory
+# in MPAS_MESHSTORE), one directory per mesh, named by the fingerprint of the
+# patch file (its real path, size and modification time):
+#
+#   verts.npy       cell vertices (lon, lat) of all cells, concatenated
+#   offsets.npy     cell i has vertices verts[offsets[i]:offsets[i+1]]
+#   bbox.npy        bounding box (lonmin, lonmax, latmin, latmax) of the cells
+#   block_bbox.npy  bounding box of each block of "block_size" consecutive cells,
+#                   a coarse spatial index as the cells are in Hilbert order
+#   cell_order.npy, cell_rank.npy  permutation of the cells (mpas_cellorder.py)
+#
+# The plot processes map these files read-only with np.load(mmap_mode='r'),
+# which does not copy them. Each attached process is registered with a file
+# "clients/<pid>". A store that is released is removed when its last client
+# detaches, and the clients that have died are not counted.
+#
+# Usage in a job script:
+#
+#   mpas_meshstore.py load wofs_mpas.1894063.patches
+#   plot_mpaspatch.py --meshstore -p wofs_mpas.1894063.patches ... &   (many)
+#   wait
+#   mpas_meshstore.py release wofs_mpas.1894063.patches
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import fcntl
+import atexit
+import shutil
+import hashlib
+import argparse
+import contextlib
+
+import numpy as np
+
+block_size = 4096                  # number of cells of each block of the spatial index
+
+arraynames = ["verts", "offsets", "bbox", "block_bbox", "cell_order", "cell_rank"]
+
+attached = {}                      # geometries attached by this process, by (store directory, pid)
+
+########################################################################
+
+def store_root():
+    return os.environ.get("MPAS_MESHSTORE", "/dev/shm/mpas_meshstore")
+
+########################################################################
+
+def patch_fingerprint(patchfile):
+    '''Fingerprint of a patch file, from its real path, size and modification time'''
+
+    realpath = os.path.realpath(patchfile)
+    stat     = os.stat(realpath)
+
+    return hashlib.sha1(f"{realpath}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+
+########################################################################
+
+@contextlib.contextmanager
+def locked(storedir):
+    '''Hold the lock of a store while its clients are changed'''
+
+    with open(os.path.join(storedir, "lock"), 'a') as lockfile:
+        fcntl.flock(lockfile, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+########################################################################
+
+def live_clients(storedir):
+    '''Process IDs of the clients of a store, the files of dead clients are removed'''
+
+    clientdir = os.path.join(storedir, "clients")
+    pids = []
+    for client in os.listdir(clientdir):
+        pid = int(client)
+        try:
+            os.kill(pid, 0)
+            pids.append(pid)
+        except ProcessLookupError:
+            os.remove(os.path.join(clientdir, client))
+        except PermissionError:                     # alive, but run by another user
+            pids.append(pid)
+
+    return pids
+
+########################################################################
+
+class MeshGeometry:
+    '''Cell polygons of an MPAS mesh as flat arrays, in the order of the patch file'''
+
+    def __init__(self, arrays, storedir=None):
+        for name in arraynames:
+            setattr(self, name, arrays[name])
+        self.nCells   = len(self.offsets) - 1
+        self.storedir = storedir
+
+    #-------------------------------------------------------------------
+
+    @classmethod
+    def from_patches(cls, patch_collection):
+
+        paths   = patch_collection.get_paths()
+        nverts  = np.array([len(cell_path.vertices) for cell_path in paths], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(nverts)))
+        verts   = np.concatenate([cell_path.vertices for cell_path in paths]).astype(np.float64)
+
+        bbox = np.stack([np.minimum.reduceat(verts[:,0], offsets[:-1]), np.maximum.reduceat(verts[:,0], offsets[:-1]),
+                         np.minimum.reduceat(verts[:,1], offsets[:-1]), np.maximum.reduceat(verts[:,1], offsets[:-1])], axis=1)
+
+        blocks     = np.arange(0, len(paths), block_size)
+        block_bbox = np.stack([np.minimum.reduceat(bbox[:,0], blocks), np.maximum.reduceat(bbox[:,1], blocks),
+                               np.minimum.reduceat(bbox[:,2], blocks), np.maximum.reduceat(bbox[:,3], blocks)], axis=1)
+
+        cell_order = getattr(patch_collection, "cell_order", None)
+        if cell_order is None:                      # patch file in MPAS order
+            cell_order = np.arange(len(paths))
+        cell_rank  = getattr(patch_collection, "cell_rank", np.argsort(cell_order))
+
+        return cls({ "verts": verts, "offsets": offsets, "bbox": bbox, "block_bbox": block_bbox,
+                     "cell_order": np.asarray(cell_order), "cell_rank": np.asarray(cell_rank) })
+
+    #-------------------------------------------------------------------
+
+    def cell_vertices(self, cells):
+        '''Vertices of the cells, as views into verts'''
+
+        return [self.verts[self.offsets[cell]:self.offsets[cell+1]] for cell in cells]
+
+    #-------------------------------------------------------------------
+
+    def visible_cells(self, lonmin, lonmax, latmin, latmax):
+        '''Cells of the blocks that intersect the longitude/latitude box, in few contiguous ranges'''
+
+        visible = ( (self.block_bbox[:,1] >= lonmin) & (self.block_bbox[:,0] <= lonmax) &
+                    (self.block_bbox[:,3] >= latmin) & (self.block_bbox[:,2] <= latmax) )
+
+        return np.flatnonzero(np.repeat(visible, block_size)[:self.nCells])
+
+########################################################################
+
+def create_store(patchfile, load_patches):
+    '''Put the geometry of a patch file in shared memory, returns the store directory'''
+
+    fingerprint = patch_fingerprint(patchfile)
+    storedir    = os.path.join(store_root(), fingerprint)
+    if os.path.isdir(storedir):
+        print(f"Mesh store of {patchfile} exists in {storedir}.")
+        return storedir
+
+    geometry = MeshGeometry.from_patches(load_patches(patchfile))
+
+    # Written under a temporary name, so that clients never see a partial store
+    tmpdir = f"{storedir}.tmp{os.getpid()}"
+    os.makedirs(os.path.join(tmpdir, "clients"))
+    for name in arraynames:
+        np.save(os.path.join(tmpdir, f"{name}.npy"), getattr(geometry, name))
+
+    with open(os.path.join(tmpdir, "meta.json"), 'w') as metafile:
+        json.dump({ "patchfile": os.path.realpath(patchfile), "nCells": geometry.nCells,
+                    "block_size": block_size, "created": time.strftime('%Y-%m-%dT%H:%M:%S') }, metafile)
+
+    try:
+        os.rename(tmpdir, storedir)
+    except OSError:                                 # created by another process meanwhile
+        shutil.rmtree(tmpdir)
+
+    print(f"Mesh store of {patchfile} ({geometry.nCells} cells) created in {storedir}.")
+    return storedir
+
+########################################################################
+
+def attach(patchfile):
+    '''Map the geometry of a patch file from shared memory, returns None if it is not there'''
+
+    storedir = os.path.join(store_root(), patch_fingerprint(patchfile))
+    if not os.path.isdir(storedir):
+        return None
+
+    # Attached once per process, a plot server or a watching plotter attaches for every plot
+    key = (storedir, os.getpid())
+    if key in attached:
+        if os.path.lexists(os.path.join(storedir, "released")):
+            detach(attached[key])                   # lets the store go with its last client
+            return None
+        return attached[key]
+
+    try:
+        with locked(storedir):
+            if os.path.lexists(os.path.join(storedir, "released")):
+                return None
+            open(os.path.join(storedir, "clients", str(os.getpid())), 'w').close()
+
+        arrays = {name: np.load(os.path.join(storedir, f"{name}.npy"), mmap_mode='r') for name in arraynames}
+    except OSError:                                 # removed meanwhile
+        return None
+
+    geometry = MeshGeometry(arrays, storedir)
+    attached[key] = geometry
+    atexit.register(detach, geometry)
+
+    return geometry
+
+########################################################################
+
+def detach(geometry):
+    '''Unregister this process from the store, the store is removed if it was released and is not used'''
+
+    storedir = geometry.storedir
+    if storedir is None:
+        return
+
+    attached.pop((storedir, os.getpid()), None)
+    if not os.path.isdir(storedir):
+        geometry.storedir = None
+        return
+
+    with locked(storedir):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(storedir, "clients", str(os.getpid())))
+
+        if os.path.lexists(os.path.join(storedir, "released")) and len(live_clients(storedir)) == 0:
+            shutil.rmtree(storedir)
+
+    geometry.storedir = None
+
+########################################################################
+
+def release(storedir):
+    '''Release a store, it is removed now or when its last client detaches'''
+
+    with locked(storedir):
+        open(os.path.join(storedir, "released"), 'w').close()
+        nclients = len(live_clients(storedir))
+        if nclients == 0:
+            shutil.rmtree(storedir)
+
+    return nclients
+
+########################################################################
+
+def list_stores():
+    '''Print the stores on this node'''
+
+    root = store_root()
+    if not os.path.isdir(root):
+        return
+
+    for fingerprint in sorted(os.listdir(root)):
+        storedir = os.path.join(root, fingerprint)
+        metafname = os.path.join(storedir, "meta.json")
+        if not os.path.lexists(metafname):
+            continue
+
+        with open(metafname, 'r') as metafile:
+            meta = json.load(metafile)
+
+        size = sum(os.path.getsize(os.path.join(storedir, f"{name}.npy")) for name in arraynames)
+        with locked(storedir):
+            nclients = len(live_clients(storedir))
+        status = "released" if os.path.lexists(os.path.join(storedir, "released")) else "active"
+        print(f"{fingerprint}: {meta['nCells']:9d} cells, {size/1024**2:9.1f} MB, {nclients:3d} clients, {status:8s} {meta['patchfile']}")
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Keep MPAS mesh geometry in shared memory for plot_mpaspatch.py',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('command',   help='load: create the stores; release: remove them after the last client; list: show the stores',
+                                     choices=["load", "release", "list"])
+    parser.add_argument('patchfiles',help='MPAS patch files from get_mpaspatches.py', nargs='*')
+
+    parser.add_argument('-a','--all',help='Release all stores on this node',       action="store_true", default=False)
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        list_stores()
+
+    elif args.command == "load":
+        import plot_mpaspatch
+
+        if len(args.patchfiles) == 0:
+            print("ERROR: need a MPAS patch file.")
+            sys.exit(1)
+
+        for patchfile in args.patchfiles:
+            if not os.path.isfile(patchfile):
+                print(f"ERROR: patch file {patchfile} not found.")
+                sys.exit(1)
+            create_store(patchfile, plot_mpaspatch.load_mpas_patches)
+
+    else:
+        if args.all:
+            root = store_root()
+            storedirs = [os.path.join(root, fp) for fp in os.listdir(root)] if os.path.isdir(root) else []
+            storedirs = [storedir for storedir in storedirs if os.path.lexists(os.path.join(storedir, "meta.json"))]
+        else:
+            storedirs = [os.path.join(store_root(), patch_fingerprint(patchfile)) for patchfile in args.patchfiles]
+
+        for storedir in storedirs:
+            if not os.path.isdir(storedir):
+                print(f"No mesh store in {storedir}.")
+                continue
+            nclients = release(storedir)
+            if nclients > 0:
+                print(f"Released {storedir}, it will be removed after its {nclients} clients are done.")
+            else:
+                print(f"Removed {storedir}.")
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+#
+# This module computes the hourly (bucket) precipitation from the run-total
+# accumulated precipitation (APCP) in the UPP GRIB2 files of a forecast,
+#
+#   MPAS-A_yyyymmddHH_XXfHY.grib2  ->  MPAS-A_PCP_yyyymmddHH_XXfHY.grib2
+#
+# The APCP message of each file is found by its inventory line (see
+# mpas_grib2.py), only that message is read and decoded. The field of the
+# previous hour is kept in memory, so each file is read once, the previous
+# hour of the first processed hour is read from its file. Each output file
+# gets the run-total APCP and the hourly APCP ("hr1-hr2 hour acc fcst"), or
+#
+#   --full   : the whole input file followed by the hourly APCP (MPAS-A_PCP_*),
+#   --hourly : the hourly APCP only (HR_PCP_* of run_calpcp.sh).
+#
+# With "--full" or "--hourly", the files of the first hours without an hourly
+# APCP, and the files without APCP (e.g. f00), are copied as they are.
+#
+# The hours are processed as soon as their files are complete, when UPP has
+# touched "done.upp_HH" in the work directory, or when the size of the file
+# has not changed for one polling interval with "--marker ''". For example,
+#
+#   mpas_pcp.py -e 36 --wait 7200 --full /scratch/wofs_mpas/2023041400/upp
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import re
+import sys
+import glob
+import time
+import shutil
+import argparse
+
+import numpy as np
+
+import mpas_profile
+import mpas_grib2
+import mpas_watch
+
+apcp_match = r":APCP:surface 0:0-[0-9]+ hour acc fcst"      # run-total precipitation in the UPP files
+
+########################################################################
+
+def find_case(wrkdir, timeout, interval=10.0):
+    '''Date time and case string "yyyymmddHH_XX" of the UPP files in wrkdir'''
+
+    pattern = re.compile(r"^MPAS-A_([0-9]{10}_.*)f[0-9]{2,3}\.grib2$")
+
+    time0 = time.time()
+    while True:
+        for fname in sorted(glob.glob(os.path.join(wrkdir, "MPAS-A_[0-9]*f??*.grib2"))):
+            matched = pattern.match(os.path.basename(fname))
+            if matched:
+                return matched[1]
+
+        if time.time()-time0 > timeout:
+            return None
+        time.sleep(interval)
+
+########################################################################
+
+def read_apcp(fname, prof):
+    '''Run-total APCP message of a UPP file, as (message bytes, field, start and end hours)'''
+
+    import eccodes
+
+    with prof.stage("inventory"):
+        messages = mpas_grib2.match(mpas_grib2.scan_inventory(fname), apcp_match)
+    if len(messages) == 0:
+        raise ValueError(f"No run-total APCP in {fname}")
+
+    msg = messages[0]
+    with prof.stage("decode"):
+        data = mpas_grib2.read_bytes(fname, [msg])[0]
+        gid  = eccodes.codes_new_from_message(data)
+        try:
+            values = eccodes.codes_get_values(gid)
+            if eccodes.codes_get(gid, 'bitmapPresent'):
+                values[values == eccodes.codes_get(gid, 'missingValue')] = np.nan
+        finally:
+            eccodes.codes_release(gid)
+
+    prof.count("bytes_read", msg.length)
+
+    return data, values, msg.startStep, msg.endStep
+
+########################################################################
+
+def bucket_message(data, values, hour1, hour2):
+    '''GRIB2 message of the precipitation accumulated from hour1 to hour2, from the APCP message "data" of hour2'''
+
+    import eccodes
+
+    gid = eccodes.codes_new_from_message(data)
+    try:
+        eccodes.codes_set(gid, 'startStep', int(hour1))
+        eccodes.codes_set(gid, 'endStep',   int(hour2))
+
+        missing = np.isnan(values)
+        if missing.any():
+            eccodes.codes_set(gid, 'bitmapPresent', 1)
+            values = np.where(missing, eccodes.codes_get(gid, 'missingValue'), values)
+        eccodes.codes_set_values(gid, values)
+
+        return eccodes.codes_get_message(gid)
+    finally:
+        eccodes.codes_release(gid)
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Compute the hourly precipitation from the accumulated precipitation in UPP GRIB2 files',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('wrkdir',           help='Work directory with the UPP files MPAS-A_yyyymmddHH_XXfHY.grib2', nargs='?', default='./')
+
+    parser.add_argument('-s','--starthour', help='Forecast starting hour',                       type=int, default=0)
+    parser.add_argument('-e','--endhour',   help='Forecast end hour',                            type=int, default=48)
+    parser.add_argument('-p','--prefix',    help='Prefix of the output files',                   type=str, default='MPAS-A_PCP')
+    parser.add_argument('--full',           help='Write the whole input file followed by the hourly precipitation',
+                                            action="store_true", default=False)
+    parser.add_argument('--hourly',         help='Write the hourly precipitation only, as the old HR_PCP files',
+                                            action="store_true", default=False)
+    parser.add_argument('-w','--wait',      help='Seconds to wait for each file, 0 for no waiting on complete files', type=float, default=0.0)
+    parser.add_argument('--marker',         help="Marker file of a complete file, '' to check the size of the file instead",
+                                            type=str, default='done.upp_{hour:02d}')
+    mpas_profile.add_arguments(parser)
+
+    args = parser.parse_args()
+
+    if args.full and args.hourly:
+        print("ERROR: options --full and --hourly cannot be used together.")
+        sys.exit(1)
+
+    if not os.path.isdir(args.wrkdir):
+        print(f"ERROR: work directory {args.wrkdir} not found.")
+        sys.exit(1)
+
+    prof = mpas_profile.Profiler.from_args('mpas_pcp', args)
+
+    case = find_case(args.wrkdir, args.wait)
+    if case is None:
+        print(f"ERROR: no UPP file MPAS-A_yyyymmddHH_XXfHY.grib2 found in {args.wrkdir}.")
+        sys.exit(1)
+
+    print(f"Work directory   : {args.wrkdir}")
+    print(f"Date time & case : {case}")
+
+    previous = None                             # (hour, field) of the previous hour
+    for hour in range(args.starthour, args.endhour+1):
+
+        infile  = os.path.join(args.wrkdir, f"MPAS-A_{case}f{hour:02d}.grib2")
+        outfile = os.path.join(args.wrkdir, f"{args.prefix}_{case}f{hour:02d}.grib2")
+
+        if os.path.lexists(outfile):
+            print(f"File: {outfile} exists. Skiping hour: {hour:02d}.")
+            previous = None
+            continue
+
+        marker  = os.path.join(args.wrkdir, args.marker.format(hour=hour)) if args.marker else ''
+        with prof.stage("wait"):
+            ready = mpas_watch.wait_for_file(infile, marker, args.wait)
+        if not ready:
+            print(f"ERROR: file {infile} is not complete after {args.wait} seconds.")
+            sys.exit(1)
+
+        try:
+            data, field, hour1, hour2 = read_apcp(infile, prof)
+        except ValueError as ex:                # no APCP at the initial time, the file is copied as before
+            print(f"WARNING: {ex}, copying it.")
+            with prof.stage("write"):
+                shutil.copyfile(infile, outfile)
+            print(f"{infile} => {outfile} ....")
+            previous = None
+            continue
+
+        if previous is None and hour2 > 1:      # the first hour of a restarted job, the previous hour from disk
+            prevfile = os.path.join(args.wrkdir, f"MPAS-A_{case}f{hour-1:02d}.grib2")
+            if os.path.lexists(prevfile):
+                try:
+                    _, prevfield, _, prevhour = read_apcp(prevfile, prof)
+                    previous = (prevhour, prevfield)
+                except ValueError:
+                    pass
+
+        with prof.stage("write"):
+            if previous is None or previous[0] <= hour1 or hour2 <= previous[0]:
+                bucket = None                   # the first hours, the run total is the hourly precipitation
+                if hour2 > 1:
+                    print(f"WARNING: no previous hour for {infile}, its APCP is from hour {hour1:g} to {hour2:g}.")
+            else:
+                bucket = bucket_message(data, np.maximum(field - previous[1], 0.0), previous[0], hour2)
+
+            if bucket is None and (args.full or args.hourly):
+                shutil.copyfile(infile, outfile)
+            else:
+                with open(outfile, 'wb') as outgrib:
+                    if args.full:
+                        with open(infile, 'rb') as ingrib:
+                            outgrib.write(ingrib.read())
+                    elif not args.hourly:
+                        outgrib.write(data)
+                    if bucket is not None:
+                        outgrib.write(bucket)
+
+        print(f"{infile} -> {outfile} ....")
+        prof.count("hours_processed")
+
+        previous = (hour2, field)
+
+    prof.finish()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+#
+# This module provides the timing instrumentation shared by the Python tools,
+# and the number of worker processes they may use (get_nprocess).
+#
+# A Profiler collects named stage timers and counters (bytes read, cells
+# drawn, ...) for one invocation of a tool. When enabled with "--profile",
+# a record is written at the end of the run:
+#
+#   --profile               print a summary to the standard output
+#   --profile run.json      append one JSON record per invocation
+#   --profile run.csv       append one CSV row per invocation
+#
+# and "--cprofile FILE" dumps the cProfile statistics of the whole run, which
+# can be browsed with "python -m pstats FILE".
+#
+# Each counter also gets a throughput (per second) over the stage that was
+# active when it was first counted, or over an explicitly named stage, e.g.
+# cells drawn per second of "savefig".
+#
+# The peak resident memory (RSS) of every stage is reported as well. On Linux
+# the RSS high-water mark is reset when a stage starts, so the peak belongs to
+# that stage. With "--trace-memory", the peak of the Python allocations
+# (including NumPy arrays) is also tracked with tracemalloc, at some cost.
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import sys
+import csv
+import json
+import time
+import resource
+import contextlib
+import tracemalloc
+
+########################################################################
+
+def add_arguments(parser):
+    '''Add the profiling options to an argparse parser'''
+
+    parser.add_argument('--profile',  help='Report stage timings & counters, to the screen or a .json/.csv file',
+                                      nargs='?', const='-', type=str, default=None)
+    parser.add_argument('--cprofile', help='Dump cProfile statistics of the run to this file', type=str, default=None)
+    parser.add_argument('--trace-memory', help='Track the peak Python allocations of each stage with tracemalloc',
+                                      action='store_true', default=False)
+
+########################################################################
+
+def parse_size(sizestr):
+    '''Convert a memory size like "800M" or "2.5G" to bytes'''
+
+    units = {'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+
+    sizestr = sizestr.strip().upper().rstrip('B')
+    if sizestr and sizestr[-1] in units:
+        return int(float(sizestr[:-1])*units[sizestr[-1]])
+    return int(float(sizestr))
+
+########################################################################
+
+def get_peak_rss():
+    '''Peak resident memory (bytes) of this process since the last reset_peak_rss()'''
+
+    try:
+        with open('/proc/self/status', 'r') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])*1024
+    except OSError:
+        pass
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+
+def reset_peak_rss():
+    '''Reset the RSS high-water mark, only possible on Linux'''
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+########################################################################
+
+def get_nprocess(ntasks=None):
+    '''Number of worker processes for ntasks, limited by the CPUs this process may run on
+       and by the Slurm allocation'''
+
+    try:
+        ncpus = len(os.sched_getaffinity(0))
+    except AttributeError:                      # not available on macOS
+        ncpus = os.cpu_count()
+
+    slurm_cpus = os.environ.get("SLURM_CPUS_PER_TASK")
+    if slurm_cpus is not None and slurm_cpus.isdigit():
+        ncpus = min(ncpus, int(slurm_cpus))
+
+    if ntasks is not None:
+        ncpus = min(ncpus, ntasks)
+
+    return max(1, ncpus)
+
+########################################################################
+
+class Profiler:
+    '''Stage timers and counters of one tool invocation'''
+
+    def __init__(self, program, outfile=None, cprofile=None, argv=None, trace_memory=False):
+
+        self.program  = program
+        self.outfile  = outfile
+        self.cprofile = cprofile
+        self.argv     = sys.argv[1:] if argv is None else argv
+        self.enabled  = outfile is not None or cprofile is not None
+        self.tracemem = trace_memory and self.enabled
+
+        self.stages   = {}          # name -> [seconds, calls, peak RSS, peak traced]
+        self.counters = {}          # name -> value
+        self.rates    = {}          # counter name -> stage name
+        self.active   = []          # stack of the running stages, [name, peak RSS, peak traced]
+
+        self.start()
+
+    @classmethod
+    def from_args(cls, program, args, argv=None):
+        return cls(program, getattr(args,'profile',None), getattr(args,'cprofile',None), argv,
+                   getattr(args,'trace_memory',False))
+
+    #-------------------------------------------------------------------
+
+    def start(self):
+        self.time0   = time.perf_counter()
+        self.tstamp  = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.profile = None
+        if self.tracemem and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.cprofile is not None:
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    #-------------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        '''Time a named stage, nested stages are timed on their own'''
+
+        if not self.enabled:
+            yield
+            return
+
+        self.fold_peaks(self.active)
+        self.active.append([name, 0, 0])
+        tstart = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - tstart
+            current = self.active.pop()
+            self.fold_peaks([current])
+            for entry in self.active:            # enclosing stages see the peaks of this one
+                entry[1] = max(entry[1], current[1])
+                entry[2] = max(entry[2], current[2])
+
+            timer = self.stages.setdefault(name, [0.0, 0, 0, 0])
+            timer[0] += elapsed
+            timer[1] += 1
+            timer[2]  = max(timer[2], current[1])
+            timer[3]  = max(timer[3], current[2])
+
+    #-------------------------------------------------------------------
+
+    def fold_peaks(self, entries):
+        '''Fold the memory peaks since the last reset into the stage entries and reset them'''
+
+        peak_rss    = get_peak_rss()
+        peak_traced = tracemalloc.get_traced_memory()[1] if self.tracemem else 0
+
+        for entry in entries:
+            entry[1] = max(entry[1], peak_rss)
+            entry[2] = max(entry[2], peak_traced)
+
+        reset_peak_rss()
+        if self.tracemem and hasattr(tracemalloc, 'reset_peak'):     # Python >= 3.9
+            tracemalloc.reset_peak()
+
+    #-------------------------------------------------------------------
+
+    def count(self, name, value=1, per=None):
+        '''Add value to a named counter
+
+        Its throughput is computed over stage "per", or the stage running now.
+        '''
+
+        if not self.enabled:
+            return
+
+        self.counters[name] = self.counters.get(name, 0) + value
+        if name not in self.rates:
+            if per is not None:
+                self.rates[name] = per
+            elif self.active:
+                self.rates[name] = self.active[-1][0]
+
+    #-------------------------------------------------------------------
+
+    def record(self):
+        '''Return the profiling record as a dictionary'''
+
+        wall = time.perf_counter() - self.time0
+
+        rates = {}
+        for name, stage in self.rates.items():
+            seconds = self.stages.get(stage, [0.0])[0]
+            if seconds > 0.0:
+                rates[f"{name}_per_s"] = self.counters[name]/seconds
+
+        return { "program"  : self.program,
+                 "argv"     : ' '.join(self.argv),
+                 "start"    : self.tstamp,
+                 "host"     : os.uname().nodename,
+                 "wall"     : wall,
+                 "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024,
+                 "stages"   : {name: {"seconds": t, "calls": n, "peak_rss_mb": rss/1024**2, "peak_traced_mb": traced/1024**2}
+                               for name, (t, n, rss, traced) in self.stages.items()},
+                 "counters" : dict(self.counters),
+                 "rates"    : rates }
+
+    #-------------------------------------------------------------------
+
+    def finish(self):
+        '''Write out the profiling record, called once at the end of the run'''
+
+        if not self.enabled:
+            return
+
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.cprofile)
+            print(f"cProfile statistics written to {self.cprofile}.")
+
+        if self.outfile is None:
+            return
+
+        record = self.record()
+
+        if self.outfile == '-':
+            print(f"\n---- Profile of {self.program}: {record['wall']:.3f} seconds, max RSS {record['max_rss_mb']:.1f} MB ----")
+            for name, timer in record["stages"].items():
+                memstr = f"peak RSS {timer['peak_rss_mb']:9.1f} MB"
+                if self.tracemem:
+                    memstr += f", traced {timer['peak_traced_mb']:9.1f} MB"
+                print(f"    {name:24s}: {timer['seconds']:10.3f} s  ({timer['calls']} calls) {memstr}")
+            for name, value in record["counters"].items():
+                print(f"    {name:24s}: {value:14,}")
+            for name, value in record["rates"].items():
+                print(f"    {name:24s}: {value:14,.1f}")
+
+        elif self.outfile.endswith('.csv'):
+            row = { "program": record["program"], "start": record["start"],
+                    "host": record["host"], "wall": f"{record['wall']:.4f}", "argv": record["argv"],
+                    "max_rss_mb": f"{record['max_rss_mb']:.1f}" }
+            for name, timer in record["stages"].items():
+                row[f"{name}_s"]      = f"{timer['seconds']:.4f}"
+                row[f"{name}_rss_mb"] = f"{timer['peak_rss_mb']:.1f}"
+                if self.tracemem:
+                    row[f"{name}_traced_mb"] = f"{timer['peak_traced_mb']:.1f}"
+            row.update(record["counters"])
+            row.update({name: f"{value:.1f}" for name, value in record["rates"].items()})
+
+            # Rows appended to an existing file follow its header
+            fieldnames = list(row.keys())
+            newfile = not os.path.lexists(self.outfile) or os.path.getsize(self.outfile) == 0
+            if not newfile:
+                with open(self.outfile, 'r', newline='') as csvfile:
+                    fieldnames = next(csv.reader(csvfile))
+
+            with open(self.outfile, 'a', newline='') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, restval='', extrasaction='ignore')
+                if newfile:
+                    writer.writeheader()
+                writer.writerow(row)
+
+        else:
+            with open(self.outfile, 'a') as jsonfile:
+                jsonfile.write(json.dumps(record)+"\n")
+
+########################################################################
+
+def save_figure(figure, figname, dpi, profiler):
+    '''Save a figure as PNG, timed as the "savefig" stage (drawing and PNG encoding)'''
+
+    with profiler.stage("savefig"):
+        figure.savefig(figname, format='png', dpi=dpi)
@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+#
+# This module remaps MPAS cell values to a Lambert conformal output grid
+# (e.g. wofs_mpas_output.grid) with precomputed sparse weights.
+#
+# The weights from the nCells MPAS cells to the nx*ny grid points are kept in a
+# scipy.sparse CSR matrix, so that a field (any variable or level) is remapped
+# with one sparse matrix-vector product. Three methods are supported:
+#
+#   nearest      value of the cell nearest to the grid point
+#   barycentric  linear interpolation in the Delaunay triangle of cell centers
+#                that contains the grid point
+#   area         average of the cells whose centers fall in the grid box,
+#                weighted by the cell areas; grid boxes without a cell center
+#                (mesh coarser than the grid) take the nearest cell
+#
+# Grid points out of the mesh have no weights and are masked.
+#
+# The weights are computed in the projection plane of the output grid and
+# cached in a ".remap.npz" file next to the MPAS file, for example
+# "wofs_mpas.1894063.barycentric.wofs_mpas_output.remap.npz". The cache
+# records a fingerprint of the cell locations and the grid specification,
+# and is recomputed when either does not match.
+#
+# Precompute the weights with:
+#
+#   mpas_remap.py wofs_mpas.history.2023-04-14_00.00.00.nc -m barycentric
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import sys
+import ast
+import time
+import hashlib
+import argparse
+
+import numpy as np
+import scipy.sparse as sparse
+
+from netCDF4 import Dataset
+
+import mpas_profile
+
+remap_methods = ["nearest", "barycentric", "area"]
+
+default_gridspec = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wofs_mpas_output.grid")
+
+########################################################################
+
+def read_gridspec(fname):
+    '''Read an output grid specification, a Python dictionary with comments'''
+
+    data = []
+    with open(fname,'r') as f:
+        for line in f:
+            if line.lstrip().startswith('#'):
+                continue
+            data.append(line.lstrip().rstrip())
+
+    # reconstructing the data as a dictionary
+    return ast.literal_eval(' '.join(data))
+
+########################################################################
+
+def grid_projection(gridspec):
+    '''Cartopy projection of the output grid, the grid point (i,j) is at (i*dx, j*dy)
+
+    The grid is centered at (ctrlon, ctrlat), or starts at its first point
+    (lon1, lat1) when they are given, e.g. for the grid of a GRIB2 file. The
+    Earth is a sphere of "radius" when it is given.
+    '''
+
+    import cartopy.crs as ccrs
+
+    globe = None
+    if "radius" in gridspec:
+        globe = ccrs.Globe(ellipse=None, semimajor_axis=gridspec["radius"], semiminor_axis=gridspec["radius"])
+
+    if "lat1" in gridspec:
+        proj = ccrs.LambertConformal(central_longitude=gridspec["ctrlon"], central_latitude=gridspec["ctrlat"],
+                     standard_parallels=(gridspec["stdlat1"], gridspec["stdlat2"]), globe=globe)
+        xctr, yctr = proj.transform_point(gridspec["lon1"], gridspec["lat1"], ccrs.PlateCarree(globe=globe))
+        xctr, yctr = -xctr, -yctr
+    else:
+        xctr = (gridspec["nx"]-1)/2*gridspec["dx"]
+        yctr = (gridspec["ny"]-1)/2*gridspec["dy"]
+
+    return ccrs.LambertConformal(central_longitude=gridspec["ctrlon"], central_latitude=gridspec["ctrlat"],
+                 false_easting=xctr, false_northing=yctr,
+                 standard_parallels=(gridspec["stdlat1"], gridspec["stdlat2"]), globe=globe)
+
+########################################################################
+
+def grid_extent(gridspec):
+    '''Extent (x0, x1, y0, y1) of the grid boxes in the projection plane, for imshow'''
+
+    return ( -0.5*gridspec["dx"], (gridspec["nx"]-0.5)*gridspec["dx"],
+             -0.5*gridspec["dy"], (gridspec["ny"]-0.5)*gridspec["dy"] )
+
+########################################################################
+
+def mesh_fingerprint(latCell, lonCell):
+    '''Fingerprint of an MPAS mesh from its cell locations'''
+
+    sha = hashlib.sha1()
+    sha.update(np.ascontiguousarray(latCell, dtype=np.float64).tobytes())
+    sha.update(np.ascontiguousarray(lonCell, dtype=np.float64).tobytes())
+
+    return sha.hexdigest()[:16]
+
+########################################################################
+
+def cache_fname(meshfile, nCells, suffix, cachedir=None):
+    '''Name of a cache file derived from an MPAS mesh, following the patch file convention'''
+
+    if cachedir is None:
+        cachedir = os.path.dirname(meshfile)
+
+    prefix = os.path.basename(meshfile).split('.')[0]
+
+    return os.path.join(cachedir, f"{prefix}.{nCells}.{suffix}")
+
+########################################################################
+
+def mesh_spacing(points, tree):
+    '''Typical distance between neighbouring cell centers'''
+
+    sample = points[::max(1, len(points)//10000)]
+    dists, _ = tree.query(sample, k=2)
+
+    return np.median(dists[:,1])
+
+########################################################################
+
+def remap_weights(latCell, lonCell, gridspec, method="barycentric", areaCell=None):
+    '''Sparse weights (nx*ny, nCells) from the MPAS cells to the grid points
+
+    The grid points are ordered as a C array of shape (ny, nx).
+    '''
+
+    import cartopy.crs as ccrs
+    from scipy.spatial import cKDTree
+
+    nx, ny = gridspec["nx"], gridspec["ny"]
+    dx, dy = gridspec["dx"], gridspec["dy"]
+    nCells = len(latCell)
+    npoints = nx*ny
+
+    # Cell centers in the grid projection plane, in units of the grid spacing
+    xyz = grid_projection(gridspec).transform_points(ccrs.PlateCarree(), np.degrees(lonCell), np.degrees(latCell))
+    cells = np.stack([xyz[:,0]/dx, xyz[:,1]/dy], axis=1)
+
+    jj, ii = np.divmod(np.arange(npoints), nx)
+    points = np.stack([ii, jj], axis=1).astype(np.float64)
+
+    tree    = cKDTree(cells)
+    spacing = mesh_spacing(cells, tree)
+
+    if method == "nearest" or method == "area":
+        # Grid points farther than one cell spacing from any cell are out of the mesh
+        dists, nearest = tree.query(points, distance_upper_bound=spacing)
+        valid = dists <= spacing
+        rows  = np.flatnonzero(valid)
+        cols  = nearest[valid]
+        vals  = np.ones(len(rows))
+
+    if method == "area":
+        # Cells in each grid box, the boxes with cells replace the nearest-cell weights
+        ic = np.rint(cells[:,0]).astype(np.int64)
+        jc = np.rint(cells[:,1]).astype(np.int64)
+        inside = (ic >= 0) & (ic < nx) & (jc >= 0) & (jc < ny)
+        boxes  = jc[inside]*nx + ic[inside]
+        area   = np.ones(nCells) if areaCell is None else np.asarray(areaCell, dtype=np.float64)
+
+        boxed = np.zeros(npoints, dtype=bool)
+        boxed[boxes] = True
+        keep  = ~boxed[rows]
+        rows  = np.concatenate([rows[keep], boxes])
+        cols  = np.concatenate([cols[keep], np.flatnonzero(inside)])
+        vals  = np.concatenate([vals[keep], area[inside]])
+
+    elif method == "barycentric":
+        from scipy.spatial import Delaunay
+
+        triangles = Delaunay(cells)
+        simplex   = triangles.find_simplex(points)
+        rows      = np.flatnonzero(simplex >= 0)
+        simplex   = simplex[rows]
+
+        # Barycentric coordinates from the affine transform of each triangle
+        transform = triangles.transform[simplex]
+        bary      = np.einsum('nij,nj->ni', transform[:,:2,:], points[rows]-transform[:,2,:])
+        bary      = np.concatenate([bary, 1.0-bary.sum(axis=1, keepdims=True)], axis=1)
+
+        # The triangles spanning the concave parts of the mesh boundary are out of the mesh
+        vertices = triangles.simplices[simplex]
+        corners  = cells[vertices]
+        edges    = np.linalg.norm(corners - np.roll(corners, 1, axis=1), axis=2).max(axis=1)
+        inmesh   = edges <= 2.0*spacing
+
+        rows = np.repeat(rows[inmesh], 3)
+        cols = vertices[inmesh].ravel()
+        vals = bary[inmesh].ravel()
+
+    elif method != "nearest":
+        raise ValueError(f"Unknown remap method: {method}")
+
+    weights = sparse.csr_matrix((vals, (rows, cols)), shape=(npoints, nCells))
+    weights.sum_duplicates()
+
+    # Normalize the rows, so that the weights of each grid point sum to one
+    rowsum = np.asarray(weights.sum(axis=1)).ravel()
+    rowsum[rowsum == 0.0] = 1.0
+    weights = sparse.diags(1.0/rowsum) @ weights
+
+    return weights.tocsr()
+
+########################################################################
+
+class Remapper:
+    '''Remap MPAS cell values to the output grid with cached sparse weights'''
+
+    def __init__(self, weights, gridspec, method):
+        self.weights  = weights
+        self.gridspec = gridspec
+        self.method   = method
+        self.shape    = (gridspec["ny"], gridspec["nx"])
+        self.valid    = np.diff(weights.indptr) > 0
+
+    #-------------------------------------------------------------------
+
+    def __call__(self, field):
+        '''Remap a field on the cells to a masked (ny, nx) array'''
+
+        values  = np.ma.filled(np.ma.asarray(field, dtype=np.float64), np.nan)
+        gridded = self.weights @ values
+
+        return np.ma.masked_invalid(np.where(self.valid, gridded, np.nan).reshape(self.shape))
+
+    #-------------------------------------------------------------------
+
+    @classmethod
+    def load(cls, meshfile, gridspecfile=None, method="barycentric", cachedir=None, prof=None, verbose=False,
+             gridspec=None, gridname=None):
+        '''Read the cached weights of the mesh in meshfile, or compute and cache them
+
+        The output grid is read from gridspecfile, or given by gridspec and its name gridname.
+        '''
+
+        if prof is None:
+            prof = mpas_profile.Profiler('mpas_remap')
+
+        if gridspec is None:
+            if gridspecfile is None:
+                gridspecfile = default_gridspec
+            gridspec = read_gridspec(gridspecfile)
+            gridname = os.path.splitext(os.path.basename(gridspecfile))[0]
+
+        with Dataset(meshfile, 'r') as mesh:
+            nCells  = mesh.dimensions["nCells"].size
+            latCell = mesh.variables['latCell'][:]
+            lonCell = mesh.variables['lonCell'][:]
+            areaCell = mesh.variables['areaCell'][:] if 'areaCell' in mesh.variables else None
+
+        fingerprint = mesh_fingerprint(latCell, lonCell)
+        cachefile   = cache_fname(meshfile, nCells, f"{method}.{gridname}.remap.npz", cachedir)
+
+        if os.path.lexists(cachefile):
+            with np.load(cachefile) as cache:
+                if str(cache["fingerprint"]) == fingerprint and ast.literal_eval(str(cache["gridspec"])) == gridspec:
+                    weights = sparse.csr_matrix((cache["data"], cache["indices"], cache["indptr"]), shape=tuple(cache["shape"]))
+                    if verbose:
+                        print(f"Remap weights loaded from {cachefile}.")
+                    return cls(weights, gridspec, method)
+
+            print(f"Remap weights in {cachefile} are for another mesh or grid, recomputing.")
+
+        print(f"Computing {method} remap weights of {nCells} cells to the {gridspec['nx']}x{gridspec['ny']} grid ...")
+        with prof.stage("remap weights"):
+            weights = remap_weights(latCell, lonCell, gridspec, method, areaCell)
+
+        try:
+            np.savez(cachefile, data=weights.data, indices=weights.indices, indptr=weights.indptr,
+                     shape=np.array(weights.shape), fingerprint=fingerprint, gridspec=repr(gridspec), method=method)
+            print(f"Remap weights written to {cachefile}.")
+        except OSError as ex:
+            print(f"WARNING: cannot cache the remap weights ({ex}).")
+
+        return cls(weights, gridspec, method)
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Precompute the remap weights from an MPAS mesh to an output grid',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('meshfile',help='MPAS file that contains the cell locations')
+
+    parser.add_argument('-v','--verbose',   help='Verbose output',                              action="store_true", default=False)
+    parser.add_argument('-m','--method',    help='Remap method',                                choices=remap_methods, default="barycentric")
+    parser.add_argument('-g','--gridspec',  help='Output grid specification file',              type=str, default=default_gridspec)
+    parser.add_argument('-o','--outdir',    help='Directory of the cache file, default to that of the MPAS file', type=str, default=None)
+    mpas_profile.add_arguments(parser)
+
+    args = parser.parse_args()
+
+    if not os.path.lexists(args.meshfile):
+        print(f"ERROR: MPAS file {args.meshfile} not found.")
+        sys.exit(1)
+
+    if not os.path.lexists(args.gridspec):
+        print(f"ERROR: grid specification {args.gridspec} not found.")
+        sys.exit(1)
+
+    prof = mpas_profile.Profiler.from_args('mpas_remap', args)
+
+    time0 = time.time()
+    remap = Remapper.load(args.meshfile, args.gridspec, args.method, args.outdir, prof, args.verbose)
+
+    print(f"{np.count_nonzero(remap.valid)} of {remap.valid.size} grid points are covered by the mesh, "
+          f"{remap.weights.nnz} weights. Used ({time.time()-time0:.1f}) seconds.")
+
+    prof.finish()
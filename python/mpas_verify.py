@@ -0,0 +1,401 @@
+#!/usr/bin/env python
+#
+# This module scores MPAS forecasts against the HRRR or RRFS analyses in
+# GRIB2 files:
+#
+#   mpas_verify.py -a '/lfs4/BMC/hrrr/%Y%m%d/hrrr.t%Hz.wrfprsf00.grib2' \
+#                  -o HT_2023041400.csv wofs_mpas.diag.2023-04-14_*.nc
+#
+# The analysis file of each forecast file is named by its valid time, the
+# template "-a" is expanded with strftime. The MPAS cell fields are remapped
+# to the grid of the analyses (read from the first analysis file) with the
+# cached sparse weights of mpas_remap.py. The analysis fields are found by
+# their inventory lines and only those messages are decoded (mpas_grib2.py).
+# The grid relative winds of the analyses are rotated to the Earth.
+#
+# The bias (forecast - analysis), RMSE and correlation of each variable and
+# forecast hour are computed over the grid points covered by both, one
+# forecast file per worker process. The scores are written to a CSV file,
+# or a netCDF file with "-o *.nc", one record per variable and hour.
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import sys
+import csv
+import glob
+import time
+import datetime
+import argparse
+
+import multiprocessing as mp
+
+import numpy as np
+
+from netCDF4 import Dataset
+
+import mpas_profile
+import mpas_remap
+import mpas_grib2
+
+# MPAS variable (diagnostics stream) and the inventory line of the same field in the analyses
+verify_fields = {
+    't2m'                   : r":TMP:heightAboveGround 2:",
+    'q2'                    : r":SPFH:heightAboveGround 2:",
+    'u10'                   : r":UGRD:heightAboveGround 10:",
+    'v10'                   : r":VGRD:heightAboveGround 10:",
+    'mslp'                  : r":(MSLMA|PRMSL):meanSea 0:",
+    'refl10cm_max'          : r":REFC:atmosphere 0:",
+    'height_850hPa'         : r":HGT:isobaricInhPa 850:",
+    'temperature_850hPa'    : r":TMP:isobaricInhPa 850:",
+    'uzonal_850hPa'         : r":UGRD:isobaricInhPa 850:",
+    'umeridional_850hPa'    : r":VGRD:isobaricInhPa 850:",
+    'height_500hPa'         : r":HGT:isobaricInhPa 500:",
+    'temperature_500hPa'    : r":TMP:isobaricInhPa 500:",
+    'uzonal_500hPa'         : r":UGRD:isobaricInhPa 500:",
+    'umeridional_500hPa'    : r":VGRD:isobaricInhPa 500:",
+    'height_250hPa'         : r":HGT:isobaricInhPa 250:",
+    'uzonal_250hPa'         : r":UGRD:isobaricInhPa 250:",
+    'umeridional_250hPa'    : r":VGRD:isobaricInhPa 250:",
+}
+
+# Wind components, (U, V) of the analyses are rotated together
+vector_pairs = [ ('u10', 'v10'), ('uzonal_850hPa', 'umeridional_850hPa'),
+                 ('uzonal_500hPa', 'umeridional_500hPa'), ('uzonal_250hPa', 'umeridional_250hPa') ]
+
+score_names = ['count', 'bias', 'rmse', 'corr']
+
+########################################################################
+
+def grid_gridspec(grid):
+    '''Grid specification of mpas_remap.py for the Lambert grid of a GRIB2 file'''
+
+    if grid['template'] != 30:
+        raise ValueError(f"grid template 3.{grid['template']} is not supported, only Lambert conformal (3.30)")
+    if grid['scanmode'] & 0xE0 != 0x40:
+        raise ValueError(f"scanning mode {grid['scanmode']:#04x} is not supported, only south to north rows (0x40)")
+
+    lon180 = lambda lon: (lon+180.0) % 360.0 - 180.0
+
+    return { 'ctrlat' : grid['lad'],    'ctrlon' : lon180(grid['lov']),
+             'stdlat1': grid['latin1'], 'stdlat2': grid['latin2'],
+             'lat1'   : grid['la1'],    'lon1'   : lon180(grid['lo1']),
+             'nx'     : grid['nx'],     'ny'     : grid['ny'],
+             'dx'     : grid['dx'],     'dy'     : grid['dy'],
+             'radius' : grid['radius'] }
+
+########################################################################
+
+def wind_rotation(gridspec):
+    '''Angle (radians) from the Earth to the grid of the Lambert grid points'''
+
+    import cartopy.crs as ccrs
+
+    nx, ny = gridspec["nx"], gridspec["ny"]
+    proj   = mpas_remap.grid_projection(gridspec)
+
+    jj, ii = np.divmod(np.arange(nx*ny), nx)
+    lons   = ccrs.PlateCarree(globe=proj.globe).transform_points(proj, ii*gridspec["dx"], jj*gridspec["dy"])[:,0]
+
+    lat1, lat2 = np.radians(gridspec["stdlat1"]), np.radians(gridspec["stdlat2"])
+    if abs(lat1-lat2) < 1.0e-6:
+        cone = np.sin(lat1)
+    else:
+        cone = np.log(np.cos(lat1)/np.cos(lat2)) / np.log(np.tan(np.pi/4+lat2/2)/np.tan(np.pi/4+lat1/2))
+
+    dlon = (lons - gridspec["ctrlon"] + 180.0) % 360.0 - 180.0
+
+    return (cone*np.radians(dlon)).reshape(ny, nx)
+
+########################################################################
+
+def scores(fcst, anal):
+    '''Number of points, bias, RMSE and correlation of fcst against anal, over the points valid in both'''
+
+    fvalues = np.ma.filled(np.ma.asarray(fcst, dtype=np.float64), np.nan).ravel()
+    avalues = np.asarray(anal, dtype=np.float64).ravel()
+
+    valid = np.isfinite(fvalues) & np.isfinite(avalues)
+    count = np.count_nonzero(valid)
+    if count == 0:
+        return 0, np.nan, np.nan, np.nan
+
+    fvalues, avalues = fvalues[valid], avalues[valid]
+    diff = fvalues - avalues
+
+    fanom = fvalues - fvalues.mean()
+    aanom = avalues - avalues.mean()
+    denom = np.sqrt(np.dot(fanom, fanom)*np.dot(aanom, aanom))
+
+    return count, diff.mean(), np.sqrt(np.dot(diff, diff)/count), (np.dot(fanom, aanom)/denom if denom > 0.0 else np.nan)
+
+########################################################################
+
+def valid_time(fname):
+    '''Valid time and start time of an MPAS file, from "xtime" and "config_start_time"'''
+
+    with Dataset(fname, 'r') as mesh:
+        xtime = mesh.variables['xtime'][0].tobytes().decode('utf-8').strip()
+        start = mesh.getncattr('config_start_time').strip() if 'config_start_time' in mesh.ncattrs() else None
+
+    parse = lambda tstr: datetime.datetime.strptime(tstr, '%Y-%m-%d_%H:%M:%S')
+
+    return parse(xtime), (parse(start) if start else None)
+
+########################################################################
+
+verify_state = {}
+
+def verify_file(task):
+    '''Scores of the variables of one MPAS forecast file, a task of the worker processes
+
+    Returns the score rows and the names of the fields found in the analysis.
+    '''
+
+    fcstfile, fhour, validtime = task
+
+    state = verify_state
+    prof  = mpas_profile.Profiler('mpas_verify')
+    rows  = []
+
+    analfile = validtime.strftime(state['analysis'])
+    if not os.path.lexists(analfile):
+        print(f"WARNING: analysis {analfile} of {fcstfile} not found, skipped.", flush=True)
+        return rows, set()
+
+    with prof.stage("inventory"):
+        try:
+            messages = mpas_grib2.scan_inventory(analfile)
+        except ValueError as ex:
+            print(f"WARNING: {ex}, {analfile} skipped.", flush=True)
+            return rows, set()
+
+    fields  = {}
+    matched = set()                             # the fields found in the analysis
+    with prof.stage("read"), Dataset(fcstfile, 'r') as mesh:
+        for varname, pattern in state['fields'].items():
+            selected = mpas_grib2.match(messages, pattern)
+            if len(selected) == 0:
+                continue
+            matched.add(varname)
+
+            if varname not in mesh.variables:
+                continue
+
+            msg = selected[0]
+            try:
+                ongrid = grid_gridspec(msg.grid) == state['gridspec']
+            except ValueError:
+                ongrid = False
+            if not ongrid:
+                print(f"WARNING: {msg.name} in {analfile} is not on the grid of the first analysis, skipped.", flush=True)
+                continue
+
+            with prof.stage("decode"):
+                anal = mpas_grib2.decode_message((analfile, msg))
+            prof.count("bytes_read", msg.length)
+
+            with prof.stage("remap"):
+                fcst = state['remap'](mesh.variables[varname][0])
+            prof.count("points_remapped", fcst.size)
+
+            fields[varname] = (fcst, anal, msg)
+
+    # Winds of the analysis relative to the Earth
+    for uname, vname in vector_pairs:
+        if uname in fields and vname in fields and fields[uname][2].grid['resflags'] & 0x08:
+            ugrid, vgrid = fields[uname][1], fields[vname][1]
+            cosa, sina   = np.cos(state['rotation']), np.sin(state['rotation'])
+            fields[uname] = (fields[uname][0],  cosa*ugrid + sina*vgrid, fields[uname][2])
+            fields[vname] = (fields[vname][0], -sina*ugrid + cosa*vgrid, fields[vname][2])
+        elif (uname in fields) != (vname in fields):
+            print(f"WARNING: {uname} and {vname} are scored together, only {uname if uname in fields else vname} is in {fcstfile} and {analfile}.", flush=True)
+            fields.pop(uname, None)
+            fields.pop(vname, None)
+
+    with prof.stage("score"):
+        for varname, (fcst, anal, msg) in fields.items():
+            level = f"{msg.typeOfLevel} {msg.level:g}"
+            rows.append([varname, level, fhour, validtime.strftime('%Y-%m-%d_%H:%M:%S'), *scores(fcst, anal)])
+
+    return rows, matched
+
+########################################################################
+
+def write_csv(fname, rows):
+    '''Write the scores to a CSV file'''
+
+    with open(fname, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['variable', 'level', 'fhour', 'valid_time'] + score_names)
+        for row in rows:
+            writer.writerow(row[:4] + [row[4]] + [f"{value:.6g}" for value in row[5:]])
+
+########################################################################
+
+def write_netcdf(fname, rows, attrs):
+    '''Write the scores to a netCDF file, one record per variable, level and forecast hour'''
+
+    with Dataset(fname, 'w') as ncfile:
+        ncfile.createDimension('record', len(rows))
+        for key, value in attrs.items():
+            ncfile.setncattr(key, value)
+
+        for column, name in enumerate(['variable', 'level', 'fhour', 'valid_time']):
+            if column == 2:
+                var = ncfile.createVariable(name, 'f4', ('record',))
+                var.setncattr('units', 'hours')
+                var[:] = np.array([row[column] for row in rows], dtype=np.float32)
+            else:
+                var = ncfile.createVariable(name, str, ('record',))
+                for record, row in enumerate(rows):
+                    var[record] = row[column]
+
+        long_names = ['Number of grid points', 'Mean forecast minus analysis',
+                      'Root mean square difference', 'Correlation of forecast and analysis']
+        for column, (name, long_name) in enumerate(zip(score_names, long_names)):
+            var = ncfile.createVariable(name, 'i4' if name == 'count' else 'f8', ('record',))
+            var.setncattr('long_name', long_name)
+            var[:] = np.array([row[4+column] for row in rows])
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Score MPAS forecasts against HRRR/RRFS analyses in GRIB2 files',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('fcstfiles', nargs='+',help='MPAS forecast files (diagnostics or history), or their patterns')
+
+    parser.add_argument('-v','--verbose',   help='Verbose output',                              action="store_true", default=False)
+    parser.add_argument('-a','--analysis',  help='Analysis GRIB2 file of the valid time, a strftime template', type=str, required=True)
+    parser.add_argument('-g','--gridfile',  help='MPAS file with the cell locations, default the first forecast file', type=str, default=None)
+    parser.add_argument('-m','--method',    help='Remap method',                                choices=mpas_remap.remap_methods, default="barycentric")
+    parser.add_argument('-f','--fields',    help='Variables to be scored [v1,v2,...], default all that are available', type=str, default=None)
+    parser.add_argument('--match',          help='Inventory match of a variable in the analyses, e.g. "refl10cm_1km=:REFD:heightAboveGround 1000:", can be repeated',
+                                            action="append", default=[])
+    parser.add_argument('-o','--outfile',   help='Scores output file, .csv or .nc',             type=str, default='mpas_verify.csv')
+    parser.add_argument('-n','--nprocess',  help='Number of worker processes',                   type=int, default=None)
+    parser.add_argument('--cachedir',       help='Directory of the remap weights, default to that of the grid file', type=str, default=None)
+    mpas_profile.add_arguments(parser)
+
+    args = parser.parse_args()
+
+    fcstfiles = sorted(set(fname for pattern in args.fcstfiles for fname in glob.glob(pattern)))
+    if len(fcstfiles) == 0:
+        print(f"ERROR: no MPAS file matches {args.fcstfiles}.")
+        sys.exit(1)
+
+    gridfile = fcstfiles[0] if args.gridfile is None else args.gridfile
+    if not os.path.lexists(gridfile):
+        print(f"ERROR: grid file {gridfile} not found.")
+        sys.exit(1)
+
+    fields = dict(verify_fields)
+    for item in args.match:
+        varname, sep, pattern = item.partition('=')
+        if not sep:
+            print(f"ERROR: option --match must be \"varname=pattern\", get \"{item}\".")
+            sys.exit(1)
+        fields[varname] = pattern
+
+    if args.fields is not None:
+        varnames = args.fields.split(',')
+        unknown  = [varname for varname in varnames if varname not in fields]
+        if unknown:
+            print(f"ERROR: no analysis field for {unknown}, use option --match.")
+            sys.exit(1)
+        fields = { varname: fields[varname] for varname in varnames }
+
+    prof = mpas_profile.Profiler.from_args('mpas_verify', args)
+
+    time0 = time.time()
+
+    #
+    # Forecast hours and the grid of the analyses
+    #
+    tasks = []
+    with prof.stage("read"):
+        for fcstfile in fcstfiles:
+            validtime, starttime = valid_time(fcstfile)
+            tasks.append((fcstfile, validtime, starttime))
+
+    inittime = tasks[0][2] if tasks[0][2] is not None else min(task[1] for task in tasks)
+    tasks    = [(fcstfile, (validtime-inittime).total_seconds()/3600.0, validtime) for fcstfile, validtime, _ in tasks]
+
+    gridspec = None
+    for fcstfile, fhour, validtime in tasks:
+        analfile = validtime.strftime(args.analysis)
+        if os.path.lexists(analfile):
+            messages = mpas_grib2.scan_inventory(analfile)
+            try:
+                gridspec = grid_gridspec(messages[0].grid)
+            except ValueError as ex:
+                print(f"ERROR: {analfile}: {ex}.")
+                sys.exit(1)
+            break
+
+    if gridspec is None:
+        print(f"ERROR: no analysis file {args.analysis} found for the forecast files.")
+        sys.exit(1)
+
+    print(f"Forecast of {inittime:%Y-%m-%d_%H:%M:%S}: {len(tasks)} files, analyses on the {gridspec['nx']}x{gridspec['ny']} grid of {analfile}")
+
+    gridname = f"lambert{gridspec['nx']}x{gridspec['ny']}"
+    with prof.stage("weights"):
+        remap = mpas_remap.Remapper.load(gridfile, None, args.method, args.cachedir, prof, args.verbose,
+                                         gridspec=gridspec, gridname=gridname)
+        rotation = wind_rotation(gridspec) if any(uname in fields for uname, _ in vector_pairs) else None
+
+    # The workers inherit the remap weights, so they must be forked
+    verify_state.update(analysis=args.analysis, fields=fields, gridspec=gridspec, remap=remap, rotation=rotation)
+
+    nprocess = args.nprocess if args.nprocess is not None else mpas_profile.get_nprocess(len(tasks))
+
+    rows    = []
+    matched = set()
+    with prof.stage("verify"):
+        if nprocess > 1 and len(tasks) > 1:
+            with mp.get_context('fork').Pool(min(nprocess, len(tasks))) as pool:
+                results = pool.map(verify_file, tasks)
+        else:
+            results = [verify_file(task) for task in tasks]
+
+    for frows, fmatched in results:
+        rows.extend(frows)
+        matched |= fmatched
+
+    order = list(fields.keys())
+    rows.sort(key=lambda row: (order.index(row[0]), row[2]))
+
+    if args.verbose:
+        for row in rows:
+            print(f"    {row[0]:20s} {row[1]:24s} f{row[2]:04.1f}: n={row[4]:8d} bias={row[5]:10.4g} rmse={row[6]:10.4g} corr={row[7]:7.4f}")
+
+    if args.outfile.endswith('.nc'):
+        write_netcdf(args.outfile, rows, { 'init_time': f"{inittime:%Y-%m-%d_%H:%M:%S}", 'analysis': args.analysis,
+                                           'method': args.method, 'gridfile': os.path.realpath(gridfile) })
+    else:
+        write_csv(args.outfile, rows)
+
+    print(f"Scores of {len(rows)} variables/hours written to {args.outfile}. Used ({time.time()-time0:.1f}) seconds.")
+
+    prof.finish()
+
+    # A pattern that matches nothing is a wrong pattern or analysis, not a missing file
+    unmatched = [varname for varname in fields if varname not in matched]
+    if len(unmatched) > 0:
+        print("ERROR: no message of the analyses matches the fields")
+        for varname in unmatched:
+            print(f"    {varname:20s} \"{fields[varname]}\"")
+        print("       use option --match to give their inventory patterns, or -f to verify the other fields only.")
+        sys.exit(1)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+#
+# This module watches a directory for the forecast files (MPAS history/diag
+# files, UPP GRIB2 files) and hands them to the plotting programs as soon as
+# they are complete, instead of polling from cron every 30 minutes.
+#
+# The directory is scanned every "--poll" seconds. On Linux, the scans are
+# woken up early by inotify events of the directory, so a file is found
+# seconds after it is written. Inotify does not see the files written by
+# other nodes of a Lustre file system, the periodic scan covers them.
+#
+# A file is complete when its marker file is there, e.g. "done.upp_{hour:02d}"
+# where {hour} is the forecast hour from "...fHH.grib2" and {name} is the
+# file name, or without a marker, when its size has not changed for
+# "--settle" seconds. For example,
+#
+#   plot_grib2.py --watch /scratch/wofs_mpas/2023041400/upp --pattern 'MPAS-A_*f??.grib2' \
+#                 --marker 'done.upp_{hour:02d}' -o images refc
+#   plot_mpaspatch.py --watch /scratch/wofs_mpas/2023041400/fcst --pattern 'wofs_mpas.diag.*.nc' \
+#                 -p wofs_mpas.1894063.patches -o images refl10cm_max t2m
+#
+# or, to see the files found by the watcher only,
+#
+#   mpas_watch.py /scratch/wofs_mpas/2023041400/fcst -p 'wofs_mpas.diag.*.nc' --timeout 3600
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import re
+import sys
+import glob
+import time
+import select
+import argparse
+
+########################################################################
+
+def add_arguments(parser, pattern):
+    '''Add the watching options to an argparse parser'''
+
+    parser.add_argument('--watch',   help='Watch this directory and plot the files matching --pattern as soon as they are complete',
+                                     type=str, default=None)
+    parser.add_argument('--pattern', help=f'File name pattern of the watched files, default "{pattern}"', type=str, default=pattern)
+    parser.add_argument('--marker',  help="Marker file of a complete file, e.g. 'done.upp_{hour:02d}', the file size is checked when not given",
+                                     type=str, default='')
+    parser.add_argument('--poll',    help='Seconds between the scans of the watched directory', type=float, default=10.0)
+    parser.add_argument('--settle',  help='Seconds a file without marker must keep its size to be complete', type=float, default=10.0)
+    parser.add_argument('--timeout', help='Stop watching after this many seconds without a new file, 0 for never', type=float, default=0.0)
+
+########################################################################
+
+def marker_name(marker, fname):
+    '''Marker file of "fname" from the template "marker", '' when the template does not apply to the file'''
+
+    if not marker:
+        return ''
+
+    basename = os.path.basename(fname)
+    matched  = re.search(r"f([0-9]{2,3})\.[^.]+$", basename)
+    try:
+        return os.path.join(os.path.dirname(fname), marker.format(name=basename, hour=int(matched[1]) if matched else None))
+    except (TypeError, ValueError):         # no forecast hour in the file name
+        return ''
+
+########################################################################
+
+def file_ready(fname, marker, sizes, settle=10.0):
+    '''Check that a file is complete, by its marker file or by its size not
+       changing for "settle" seconds (sizes keeps the sizes seen and the
+       times they were first seen)'''
+
+    if not os.path.lexists(fname):
+        return False
+
+    if marker:
+        return os.path.lexists(marker)
+
+    size = os.path.getsize(fname)
+    now  = time.time()
+    if fname not in sizes or sizes[fname][0] != size:
+        sizes[fname] = (size, now)
+        return False
+
+    return size > 0 and now - sizes[fname][1] >= settle
+
+########################################################################
+
+def wait_for_file(fname, marker, timeout, interval=10.0):
+    '''Wait until a file is complete, returns False on timeout'''
+
+    if timeout <= 0:                            # no waiting, the files are already complete
+        return os.path.lexists(fname)
+
+    sizes = {}
+    time0 = time.time()
+    while not file_ready(fname, marker, sizes, interval):
+        if time.time()-time0 > timeout:
+            return False
+        time.sleep(interval)
+
+    return True
+
+########################################################################
+
+class DirectoryEvents:
+    '''Wait for the changes of a directory with inotify, or sleep when inotify is not available'''
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO    = 0x00000080
+    IN_CREATE      = 0x00000100
+
+    def __init__(self, wrkdir):
+
+        self.fd = -1
+        try:
+            import ctypes, ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd   = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+                if libc.inotify_add_watch(fd, os.fsencode(wrkdir), mask) >= 0:
+                    self.fd = fd
+                else:
+                    os.close(fd)
+        except (OSError, AttributeError):       # not Linux
+            pass
+
+        if self.fd < 0:
+            print(f"WARNING: no inotify for {wrkdir}, polling it.")
+
+    def wait(self, timeout):
+        '''Wait until the directory changes or for timeout seconds'''
+
+        if self.fd < 0:
+            time.sleep(timeout)
+            return
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            time.sleep(0.2)                     # collect the events of one write together
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+########################################################################
+
+def watch_files(wrkdir, pattern, marker='', poll=10.0, timeout=0.0, settle=10.0):
+    '''Yield the files matching "pattern" in wrkdir, in name order, as soon as each one is complete
+
+    The files there at the start are yielded first. A file without a marker is
+    complete when its size has not changed for "settle" seconds, however many
+    times the directory is scanned in between. The generator ends after
+    "timeout" seconds without a new file, it never ends with timeout 0.
+    '''
+
+    events = DirectoryEvents(wrkdir)
+
+    done  = set()
+    sizes = {}
+    time0 = time.time()
+    try:
+        while True:
+            pending = False
+            for fname in sorted(glob.glob(os.path.join(wrkdir, pattern))):
+                if fname in done:
+                    continue
+
+                if file_ready(fname, marker_name(marker, fname), sizes, settle):
+                    done.add(fname)
+                    sizes.pop(fname, None)
+                    yield fname
+                    time0 = time.time()
+                else:
+                    pending = True
+
+            interval = min(poll, settle) if pending else poll
+            if timeout > 0:
+                remaining = time0 + timeout - time.time()
+                if remaining <= 0:
+                    return
+                interval = min(interval, remaining)
+
+            events.wait(interval)
+    finally:
+        events.close()
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Print the files of a directory as soon as they are complete',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('wrkdir',           help='Directory to be watched')
+
+    parser.add_argument('-p','--pattern',   help='File name pattern of the watched files',          type=str, default='*')
+    parser.add_argument('--marker',         help="Marker file of a complete file, e.g. 'done.upp_{hour:02d}', the file size is checked when not given",
+                                            type=str, default='')
+    parser.add_argument('--poll',           help='Seconds between the scans of the directory',      type=float, default=10.0)
+    parser.add_argument('--settle',         help='Seconds a file without marker must keep its size to be complete', type=float, default=10.0)
+    parser.add_argument('--timeout',        help='Stop after this many seconds without a new file, 0 for never', type=float, default=0.0)
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.wrkdir):
+        print(f"ERROR: directory {args.wrkdir} not found.")
+        sys.exit(1)
+
+    for fname in watch_files(args.wrkdir, args.pattern, args.marker, args.poll, args.timeout, args.settle):
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {fname}", flush=True)
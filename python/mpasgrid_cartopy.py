@@ -1,6 +1,5 @@
 #!/usr/bin/env python
 #
-from asyncore import read
 import os, sys
 import numpy as np
 
@@ -16,8 +15,22 @@ import ast
 
 import argparse
 
+import mpas_profile
+
 #import strmrpt
 
+########################################################################
+
+def grid_outline(nx, ny, dx, dy):
+    '''Closed outline of a nx*ny grid in its projection coordinates, from the edge points only'''
+
+    x1d = np.arange(nx)*dx
+    y1d = np.arange(ny)*dy
+
+    xs = np.concatenate((x1d, np.full(ny-1, x1d[-1]), x1d[-2::-1], np.zeros(ny-1)))
+    ys = np.concatenate((np.zeros(nx), y1d[1:], np.full(nx-1, y1d[-1]), y1d[-2::-1]))
+
+    return xs, ys
 
 #@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
 #
@@ -46,9 +59,12 @@ if __name__ == "__main__":
     parser.add_argument('-outgrid'       ,help='Plot an output grid, "True" get grid from arguments, or filename',type=str, default=False)
     parser.add_argument('-latlon'        ,help='Base map latlon or lambert',action='store_true', default=False)
     parser.add_argument('-name'          ,help='Name of the WoF grid',type=str, default="wofs_poly")
+    mpas_profile.add_arguments(parser)
 
     args = parser.parse_args()
 
+    prof = mpas_profile.Profiler.from_args('mpasgrid_cartopy', args)
+
     basmap = "lambert"
     if args.latlon:
         basmap = "latlon"
@@ -145,14 +161,6 @@ if __name__ == "__main__":
     dxhr = 3000.0
     dyhr = 3000.0
 
-    xsize=(nxhr-1)*dxhr
-    ysize=(nyhr-1)*dyhr
-
-    x1hr = np.linspace(0.0,xsize,num=nxhr)
-    y1hr = np.linspace(0.0,ysize,num=nyhr)
-
-    x2hr, y2hr = np.meshgrid(x1hr,y1hr)
-
     xctr = (nxhr-1)/2*dxhr
     yctr = (nyhr-1)/2*dyhr
 
@@ -203,14 +211,6 @@ if __name__ == "__main__":
 
     if outgrid:
 
-        xsize1=(nx1-1)*dx1
-        ysize1=(ny1-1)*dy1
-
-        x1d = np.linspace(0.0,xsize1,num=nx1)
-        y1d = np.linspace(0.0,ysize1,num=ny1)
-
-        x2d1, y2d1 = np.meshgrid(x1d,y1d)
-
         xctr1 = (nx1-1)/2*dx1
         yctr1 = (ny1-1)/2*dy1
 
@@ -283,22 +283,14 @@ if __name__ == "__main__":
     # Plot original HRRR grid range
     #
     #-----------------------------------------------------------------------
-    if args.latlon:
-        nx, ny = x2hr.shape
-        for i in range(0,nx):
-            plt.text(x2hr[i,    0], y2hr[i,    0], '.', color='r', transform=proj_hrrr)
-            plt.text(x2hr[i, ny-1], y2hr[i, ny-1], '.', color='r', transform=proj_hrrr)
-
-        for j in range(0,ny):
-            plt.text(x2hr[0,    j], y2hr[0,   j], '.', color='r', transform=proj_hrrr)
-            plt.text(x2hr[nx-1, j], y2hr[nx-1,j], '.', color='r', transform=proj_hrrr)
-    else:
-        plt.plot(x2hr[:,      0], y2hr[:,     0], color='r', linewidth=0.5, transform=proj_hrrr)
-        plt.plot(x2hr[:, nxhr-1], y2hr[:,nxhr-1], color='r', linewidth=0.5, transform=proj_hrrr)
-        plt.plot(x2hr[0,      :], y2hr[0,     :], color='r', linewidth=0.5, transform=proj_hrrr)
-        plt.plot(x2hr[nyhr-1, :], y2hr[nyhr-1,:], color='r', linewidth=0.5, transform=proj_hrrr)
+    #
+    # One line through the edge points, it is transformed as a whole in both base maps
+    #
+    with prof.stage("boundaries"):
+        xhr, yhr = grid_outline(nxhr, nyhr, dxhr, dyhr)
+        plt.plot(xhr, yhr, color='r', linewidth=0.5, transform=proj_hrrr)
 
-    plt.text(x2hr[30,30],y2hr[30,30],'HRRR grid', color='r', transform=proj_hrrr)
+    plt.text(30*dxhr,30*dyhr,'HRRR grid', color='r', transform=proj_hrrr)
 
     #-----------------------------------------------------------------------
     #
@@ -362,9 +354,8 @@ if __name__ == "__main__":
         #    plt.text(x, y, '.', color='blue', horizontalalignment='center',
         #                verticalalignment='bottom',transform=carr)
 
-    for lon,lat in lonlats:
-        plt.text(lon, lat, '*', color='r', horizontalalignment='center',
-                                           verticalalignment='center',transform=carr)
+    lons, lats = zip(*lonlats)
+    plt.plot(lons, lats, linestyle='none', marker='*', color='r', transform=carr)
 
 
     #ctrlat1 = (rlist[0]+rlist[1])/2.0
@@ -396,20 +387,12 @@ if __name__ == "__main__":
     #-----------------------------------------------------------------------
 
     if outgrid:
-        if args.latlon:
-            for i in range(0,ny1):
-                plt.text(x2d1[i,     0], y2d1[i,     0], '.', color='g', transform=proj1)
-                plt.text(x2d1[i, nx1-1], y2d1[i, nx1-1], '.', color='g', transform=proj1)
-
-            for j in range(0,nx1):
-                plt.text(x2d1[0,     j], y2d1[0,    j], '.', color='g', transform=proj1)
-                plt.text(x2d1[ny1-1, j], y2d1[ny1-1,j], '.', color='g', transform=proj1)
-        else:
-            plt.plot(x2d1[:,     0], y2d1[:,    0], color='g', linewidth=1.5,transform=proj1)
-            plt.plot(x2d1[:, nx1-1], y2d1[:,nx1-1], color='g', linewidth=1.5,transform=proj1)
-            plt.plot(x2d1[0,     :], y2d1[0,    :], color='g', linewidth=1.5,transform=proj1)
-            plt.plot(x2d1[ny1-1, :], y2d1[ny1-1,:], color='g', linewidth=1.5,transform=proj1)
-            plt.text(x2d1[ny1-40,20],y2d1[ny1-40,20],'Output grid',color='g',transform=proj1)
+        with prof.stage("boundaries"):
+            x1, y1 = grid_outline(nx1, ny1, dx1, dy1)
+            plt.plot(x1, y1, color='g', linewidth=1.5,transform=proj1)
+
+        if not args.latlon:
+            plt.text(20*dx1,(ny1-40)*dy1,'Output grid',color='g',transform=proj1)
 
         plt.text(ctrlon1,ctrlat1,'o',color='g',horizontalalignment='center',
                                             verticalalignment='center',transform=carr)
@@ -424,6 +407,8 @@ if __name__ == "__main__":
         #print('Output grid: ctrlat1 = %f, ctrlon1 = %f' %(ctrlat1,ctrlon1))
     #
     print(f"Saving figure to {figname} ...")
-    figure.savefig(figname, format='png')
+    mpas_profile.save_figure(figure, figname, figure.dpi, prof)
+
+    prof.finish()
 
     plt.show()
@@ -3,6 +3,18 @@
 # This module plots GRIB2 2D/3D fields on a horizontal slice
 # using xarray enginee or cfgrib.
 #
+# With "-b", it plots a set of files in a pool of worker processes, e.g.
+#
+#   plot_grib2.py -b "MPAS-A_2023041400_*f??.grib2" t,refd -t hybrid -l 0,max -o figures
+#
+# The colour scale of each variable and level is shared by all files.
+#
+# With "--watch", it plots the files of a directory as soon as UPP writes them,
+#
+#   plot_grib2.py --watch upp --pattern "MPAS-A_*f??.grib2" --marker "done.upp_{hour:02d}" refc -o figures
+#
+# The grid, map background and plotting workers are set up once for all files.
+#
 #-----------------------------------------------------------------------
 #
 # By Yunheng Wang (NOAA/NSSL, 2023.04.26)
@@ -13,40 +25,24 @@
 import os
 import sys
 import re
+import glob
 import math
 import argparse
+import functools
 
-import numpy as np
+import multiprocessing as mp
 
-''' By default matplotlib will try to open a display windows of the plot, even
-though sometimes we just want to save a plot. Somtimes this can cause the
-program to crash if the display can't open. The two commands below makes it so
-matplotlib doesn't try to open a window
-'''
-import matplotlib
-matplotlib.use('Agg')
-
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
-# '''
-# cm = Color Map. Within the matplotlib.cm module will contain access to a number
-# of colormaps for a plot. A reference to colormaps can be found at:
-#
-#     - https://matplotlib.org/examples/color/colormaps_reference.html
-# '''
-import matplotlib.cm as cm
-import matplotlib.colors as mcolors
-from metpy.plots import ctables
-
-#import scipy.interpolate as interpolate
-from shapely.geometry.polygon import Polygon
+import numpy as np
 
+import csv
 
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
+import mpas_profile
+import mpas_gribindex
+import mpas_grib2
+import mpas_watch
 
-import csv
-import xarray as xr
+# The plotting modules (Matplotlib, MetPy, Cartopy) are slow to import,
+# they are loaded only after the arguments and the input file have been checked.
 
 #import strmrpt
 
@@ -94,7 +90,7 @@ def get_var_contours(varname,var2d,cntlevels):
 
     if varname.startswith('refl'):
         # Use reflectivity color map and range
-        mycolors = ctables.colortables['NWSReflectivity']
+        mycolors = list(ctables.colortables['NWSReflectivity'])   # do not modify the registered table
         mycolors.insert(0,(1,1,1))
         color_map = mcolors.ListedColormap(mycolors)
     elif varname.startswith('tp'):
@@ -176,6 +172,509 @@ def get_var_contours(varname,var2d,cntlevels):
 
     return color_map, normc, cntlevels, ticks_list
 
+########################################################################
+
+def decode_level(variables, level, prof):
+    '''Decode one level of the lazily loaded GRIB2 variables, None for 2D variables or "max" for the column maximum
+
+    Only the messages of the level are decoded, the column maximum is reduced
+    level by level. With two variables, their difference is returned.
+    '''
+
+    if level == "max":
+        varmax = None
+        for k in range(variables[0].shape[0]):
+            vardata = decode_level(variables, k, prof)
+            varmax  = vardata if varmax is None else np.maximum(varmax, vardata)
+        return varmax
+
+    with prof.stage("decode"):
+        fields = [variable.values if level is None else variable[level].values for variable in variables]
+    prof.count("bytes_read", sum(field.nbytes for field in fields))
+
+    return fields[0] if len(fields) == 1 else fields[0] - fields[1]
+
+########################################################################
+
+def grid_matches(proj, extent, shape, glons, glats):
+    '''Check that the grid box centers from the grid definition are at the latitudes/longitudes of the file'''
+
+    import cartopy.crs as ccrs
+
+    ny, nx = shape
+    if glons.shape != shape:
+        return False
+
+    dx = (extent[1]-extent[0])/nx
+    dy = (extent[3]-extent[2])/ny
+    for j, i in [(0, 0), (0, nx-1), (ny-1, 0), (ny-1, nx-1), (ny//2, nx//2)]:
+        x, y = proj.transform_point(glons[j,i], glats[j,i], ccrs.PlateCarree())
+        if abs(x-extent[0]-(i+0.5)*dx) > 0.25*abs(dx) or abs(y-extent[2]-(j+0.5)*dy) > 0.25*abs(dy):
+            return False
+
+    return True
+
+########################################################################
+
+_pixel_maps = {}
+
+def pixel_mapping(ax, proj, extent, shape, cachedir=None):
+    '''Index of the grid box under each pixel of the map axes (-1 out of the grid), and the extent of the axes
+
+    The mapping depends only on the grid and the map, it is computed once and
+    kept in the cache directory of the GRIB2 indices.
+    '''
+
+    import hashlib
+
+    ny, nx = shape
+    bbox = ax.get_window_extent()
+    npx, npy = int(round(bbox.width)), int(round(bbox.height))
+    extent_ax = tuple(ax.get_extent())
+
+    key = repr((proj.proj4_init, tuple(extent), shape, ax.projection.proj4_init, extent_ax, (npy, npx)))
+    if key in _pixel_maps:
+        return _pixel_maps[key], extent_ax
+
+    cachefile = os.path.join(mpas_gribindex.cache_root(cachedir), f"pixmap.{hashlib.sha1(key.encode()).hexdigest()[:16]}.npy")
+    if os.path.lexists(cachefile):
+        _pixel_maps[key] = np.load(cachefile)
+        return _pixel_maps[key], extent_ax
+
+    x0, x1, y0, y1 = extent_ax
+    xs = x0 + (np.arange(npx)+0.5)*(x1-x0)/npx
+    ys = y0 + (np.arange(npy)+0.5)*(y1-y0)/npy
+    xx, yy = np.meshgrid(xs, ys)
+
+    points = proj.transform_points(ax.projection, xx, yy)
+    with np.errstate(invalid='ignore'):
+        ii = np.floor((points[:,:,0]-extent[0])/(extent[1]-extent[0])*nx)
+        jj = np.floor((points[:,:,1]-extent[2])/(extent[3]-extent[2])*ny)
+        ingrid = (ii >= 0) & (ii < nx) & (jj >= 0) & (jj < ny)
+
+    pixels = np.full((npy, npx), -1, dtype=np.int32)
+    pixels[ingrid] = (jj[ingrid]*nx + ii[ingrid]).astype(np.int32)
+
+    try:
+        os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+        np.save(cachefile, pixels)
+    except OSError as ex:
+        print(f"WARNING: cannot cache the pixel mapping ({ex}).")
+
+    _pixel_maps[key] = pixels
+    return pixels, extent_ax
+
+########################################################################
+
+def parse_levels(vertlevels, nlevels):
+    '''Levels to be plotted from option "-l", "l1-l2" or "l1,l2,...", "max" is the column maximum'''
+
+    levels = range(0, nlevels)
+
+    if vertlevels is not None:
+        pattern = re.compile("^([0-9]+)-([0-9]+)$")
+        pmatched = pattern.match(vertlevels)
+        if pmatched:
+            levels = range(int(pmatched[1]), int(pmatched[2]))
+        else:
+            levels = [item if item == "max" else int(item) for item in vertlevels.split(',')]
+
+    return list(levels)
+
+########################################################################
+
+def frame_title(varname, diffstr, varunits, fcsttime, level):
+    '''Output file name suffix and title of the plot of a level, None for 2D variables'''
+
+    if level is None:
+        return "", f"{varname}{diffstr} ({varunits}) valid at {fcsttime}"
+    elif level == "max":
+        return f"_{level}", f"colum maximum {varname}{diffstr} ({varunits}) valid at {fcsttime}"
+    else:
+        return f"_K{level:02d}", f"{varname}{diffstr} ({varunits}) valid at {fcsttime} on level {level:02d}"
+
+########################################################################
+
+def import_plotting():
+    '''Import the plotting modules, only after the arguments and the input file have been checked'''
+
+    global plt, mticker, cm, mcolors, ctables, ccrs, cfeature
+
+    #
+    # By default matplotlib will try to open a display windows of the plot, even
+    # though sometimes we just want to save a plot. Somtimes this can cause the
+    # program to crash if the display can't open. The two commands below makes it so
+    # matplotlib doesn't try to open a window
+    #
+    import matplotlib
+    matplotlib.use('Agg')
+
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as mticker
+    # '''
+    # cm = Color Map. Within the matplotlib.cm module will contain access to a number
+    # of colormaps for a plot. A reference to colormaps can be found at:
+    #
+    #     - https://matplotlib.org/examples/color/colormaps_reference.html
+    # '''
+    import matplotlib.cm as cm
+    import matplotlib.colors as mcolors
+    from metpy.plots import ctables
+
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+
+########################################################################
+
+def map_projections(basmap, gribgrid, fcstfile, glons, glats):
+    '''Projection of the map, and the native projection and extent of the grid (None to draw contours)'''
+
+    carr= ccrs.PlateCarree()
+
+    #-----------------------------------------------------------------------
+    #
+    # Lambert grid for HRRR
+    #
+    #-----------------------------------------------------------------------
+
+    if basmap == "lambert":
+        ctrlat = 38.5
+        ctrlon = -97.5    # -97.5  # 262.5
+        stdlat1 = 38.5
+        stdlat2 = 38.5
+
+        nxhr = 1799
+        nyhr = 1059
+        dxhr = 3000.0
+        dyhr = 3000.0
+
+        xctr = (nxhr-1)/2*dxhr
+        yctr = (nyhr-1)/2*dyhr
+
+        proj_map=ccrs.LambertConformal(central_longitude=ctrlon, central_latitude=ctrlat,
+                     false_easting=xctr, false_northing= yctr, secant_latitudes=None,
+                     standard_parallels=(stdlat1, stdlat2), globe=None)
+
+    else:
+        proj_map = carr
+
+    #
+    # Native projection of the grid, the fields are drawn as images of their grid boxes
+    #
+    proj_grid   = None
+    extent_grid = None
+    if gribgrid is not None:
+        proj_grid = mpas_grib2.grid_projection(gribgrid)
+        if proj_grid is None:
+            print(f"Grid template 3.{gribgrid['template']} is not supported, drawn with filled contours.")
+        else:
+            extent_grid = mpas_grib2.grid_extent(gribgrid, proj_grid)
+            if not grid_matches(proj_grid, extent_grid, glats.shape, glons, glats):
+                print(f"WARNING: grid definition of {fcstfile} does not match its latitudes/longitudes, drawn with filled contours.")
+                proj_grid = None
+            elif basmap == "lambert" and gribgrid['template'] == 30:
+                proj_map = proj_grid
+
+    return proj_map, proj_grid, extent_grid
+
+########################################################################
+
+def map_axes(basmap, proj_map):
+    '''Map axes in the current figure'''
+
+    carr = ccrs.PlateCarree()
+
+    ax = plt.axes(projection=proj_map)
+    if basmap == "latlon":
+        ax.set_extent([-135.0,-60.0,20.0,55.0],crs=carr)
+    else:
+        ax.set_extent([-125.0,-70.0,22.0,52.0],crs=carr)
+
+    return ax
+
+########################################################################
+
+def plot_field(varplt, varname, varunits, outtlt, figname, basmap, projs, glons, glats, colorscale, indexdir, prof):
+    '''Draw a field on the map and save the figure, projs from map_projections() and colorscale from get_var_contours()'''
+
+    proj_map, proj_grid, extent_grid = projs
+    color_map, normc, cntlevels, ticks_list = colorscale
+
+    style = 'ggplot'
+
+    figure = plt.figure(figsize = (12,12) )
+
+    ax = map_axes(basmap, proj_map)
+
+    if proj_grid is None:
+        with prof.stage("contour"):
+            #
+            # Use tricontourf
+            #
+            #cntr = ax.tricontourf(glons, glats, varplt, levels=24, antialiased=True, cmap=color_map, transform=carr)
+            #cntr = ax.tricontourf(glons, glats, varplt, cntlevels, antialiased=False, cmap=color_map, norm=normc, transform=carr)
+
+            cntr = ax.contourf(glons, glats, varplt, cntlevels, antialiased=False, cmap=color_map, norm=normc, transform=ccrs.PlateCarree() )
+
+            prof.count("points_contoured", varplt.size)
+    else:
+        with prof.stage("render"):
+            normi = normc if normc is not None else mcolors.BoundaryNorm(cntlevels, color_map.N)
+            if ax.projection == proj_grid:
+                cntr = ax.imshow(varplt, origin='lower', extent=extent_grid, transform=proj_grid,
+                                 cmap=color_map, norm=normi, interpolation='nearest')
+            else:
+                pixels, extent_ax = pixel_mapping(ax, proj_grid, extent_grid, varplt.shape, indexdir)
+                image = np.ma.masked_array(varplt.ravel()[pixels], mask=pixels < 0)
+                cntr = ax.imshow(image, origin='lower', extent=extent_ax, transform=ax.projection,
+                                 cmap=color_map, norm=normi, interpolation='nearest')
+
+            prof.count("points_rendered", varplt.size)
+
+    # https://matplotlib.org/api/colorbar_api.html
+    #
+    cax = figure.add_axes([ax.get_position().x1+0.01,ax.get_position().y0,0.02,ax.get_position().height])
+    cbar = plt.colorbar(cntr, cax=cax, ticks=ticks_list)
+    cbar.set_label(f'{varname} ({varunits})')
+
+    with prof.stage("features"):
+        ax.coastlines(resolution='50m')
+        #ax.stock_img()
+        #ax.add_feature(cfeature.OCEAN)
+        #ax.add_feature(cfeature.LAND, edgecolor='black')
+        #ax.add_feature(cfeature.LAKES, edgecolor='black',facecolor='white')
+        #ax.add_feature(cfeature.RIVERS)
+        ax.add_feature(cfeature.BORDERS)
+        ax.add_feature(cfeature.STATES,linewidth=0.1)
+        gl = ax.gridlines(draw_labels=True,linewidth=0.2, color='gray', alpha=0.7, linestyle='--')
+        gl.xlocator = mticker.FixedLocator([-140,-120, -100, -80, -60])
+        gl.ylocator = mticker.FixedLocator([10,20,30,40,50,60])
+        gl.top_labels = False
+        gl.left_labels = True  #default already
+        gl.right_labels = False
+        gl.bottom_labels = True
+
+    # Create the title as you see fit
+    ax.set_title(outtlt)
+    plt.style.use(style) # Set the style that we choose above
+
+    print(f"Saving figure to {figname} ...")
+    mpas_profile.save_figure(figure, figname, 100, prof)
+    plt.close(figure)
+
+    #plt.show()
+
+########################################################################
+
+batch_state = {}
+
+def batch_range(task):
+    '''Ranges (min, max) of the levels of a variable in a GRIB2 file, a batch task'''
+
+    fcstfile, varname, levels = task
+
+    prof   = mpas_profile.Profiler('plot_grib2')
+    ranges = []
+    with mpas_gribindex.open_dataset(fcstfile, batch_state['filters'], batch_state['indexdir']) as mesh:
+        for level in levels:
+            varplt = decode_level([mesh[varname]], level, prof)
+            ranges.append((np.nanmin(varplt), np.nanmax(varplt)))
+
+    return ranges
+
+def batch_plot(task):
+    '''Plot the levels of a variable in a GRIB2 file, a batch task'''
+
+    fcstfile, varname, levels = task
+
+    state = batch_state
+    prof  = mpas_profile.Profiler('plot_grib2')
+    with mpas_gribindex.open_dataset(fcstfile, state['filters'], state['indexdir']) as mesh:
+        variable = mesh[varname]
+        fcsttime = np.datetime_as_string(variable.valid_time, unit='m')
+        for level in levels:
+            varplt = decode_level([variable], level, prof)
+            outlvl, outtlt = frame_title(varname, "", variable.units, fcsttime, level)
+            figname = os.path.join(state['outdir'], f"{varname}.{fcsttime}{outlvl}_{state['basmap']}.png")
+            colorscale = state['colorscales'].get((varname, level))
+            if colorscale is None:                      # watch mode, the scale of this frame
+                colorscale = get_var_contours(varname, varplt, state['cntlevel'])
+            plot_field(varplt, varname, variable.units, outtlt, figname, state['basmap'], state['projs'],
+                       state['glons'], state['glats'], colorscale, state['indexdir'], prof)
+
+    return len(levels)
+
+########################################################################
+
+def batch_outdir(args):
+    '''Output directory of the batch and watch modes'''
+
+    outdir = './' if args.outfile is None else args.outfile
+    if not os.path.isdir(outdir):
+        print(f"ERROR: output directory {outdir} not found, option -o must be a directory in the batch mode.")
+        sys.exit(1)
+
+    return outdir
+
+########################################################################
+
+def batch_setup(args, basmap, filters, cntlevel, fcstfile, varnames, outdir, prof):
+    '''Set up the grid, the map background and the state shared by the batch workers
+       from the GRIB2 file "fcstfile", returns the levels to be plotted of each variable'''
+
+    #
+    # Grid and levels of the variables
+    #
+    with prof.stage("read"), mpas_gribindex.open_dataset(fcstfile, filters, args.indexdir) as mesh:
+        glats = np.array(mesh.latitude)
+        glons = np.array(mesh.longitude)
+
+        varlevels = {}
+        for varname in varnames:
+            if varname not in list(mesh.keys()):
+                print(f"ERROR: variable \"{varname}\" was not found in {fcstfile}.")
+                sys.exit(1)
+
+            varndim = len(mesh[varname].shape)
+            if varndim == 2:
+                varlevels[varname] = [None]
+            elif varndim == 3:
+                varlevels[varname] = parse_levels(args.vertLevels, mesh[varname].shape[0])
+            else:
+                print(f"ERROR: do not supported {varndim} dimensions array of {varname}.")
+                sys.exit(1)
+
+    gribgrid = None
+    if not args.contour:
+        messages = mpas_grib2.scan_inventory(fcstfile)
+        if len(messages) > 0:
+            gribgrid = messages[0].grid
+
+    import_plotting()
+
+    # The colour scales are set by plot_batch(), or for each frame
+    batch_state.update(filters=filters, indexdir=args.indexdir, outdir=outdir, basmap=basmap,
+                       glons=glons, glats=glats, cntlevel=cntlevel, colorscales={})
+
+    #
+    # Map background, the pixel mapping of the grid and the Natural Earth features
+    #
+    projs = map_projections(basmap, gribgrid, fcstfile, glons, glats)
+    batch_state['projs'] = projs
+
+    with prof.stage("background"):
+        if projs[1] is not None:
+            figure = plt.figure(figsize = (12,12) )
+            ax = map_axes(basmap, projs[0])
+            if ax.projection != projs[1]:
+                pixel_mapping(ax, projs[1], projs[2], glons.shape, args.indexdir)
+            plt.close(figure)
+
+        try:
+            for feature in (cfeature.COASTLINE.with_scale('50m'), cfeature.BORDERS, cfeature.STATES):
+                list(feature.geometries())
+        except Exception as ex:
+            print(f"WARNING: cannot load the map features ahead ({ex}).")
+
+    return varlevels
+
+########################################################################
+
+def plot_batch(args, basmap, filters, cntlevel, prof):
+    '''Plot the variables "args.varname" (comma separated) at levels "args.vertLevels" of all files
+       matching the patterns "args.fcstfiles", in a pool of worker processes
+
+    The workers are forked after the grid, the colour scales of the variables (over
+    all files) and the map background are set up, so they share them.
+    '''
+
+    fcstfiles = sorted(set(fname for pattern in args.fcstfiles for fname in glob.glob(pattern)))
+    varnames  = args.varname.split(',')
+    if len(fcstfiles) == 0:
+        print(f"ERROR: no GRIB2 file matches {args.fcstfiles}.")
+        sys.exit(1)
+
+    outdir = batch_outdir(args)
+
+    # The workers inherit the plotting modules and the state of the batch, so they must be forked
+    forked   = mp.get_context('fork')
+    nprocess = args.nprocess if args.nprocess is not None else mpas_profile.get_nprocess(len(fcstfiles)*len(varnames))
+
+    with prof.stage("index"), forked.Pool(min(nprocess, len(fcstfiles))) as pool:
+        pool.map(functools.partial(mpas_gribindex.build_index, cachedir=args.indexdir), fcstfiles)
+
+    varlevels = batch_setup(args, basmap, filters, cntlevel, fcstfiles[0], varnames, outdir, prof)
+    tasks = [(fcstfile, varname, varlevels[varname]) for varname in varnames for fcstfile in fcstfiles]
+
+    #
+    # Colour scales shared by all files, from the ranges of the variables over the files
+    #
+    ranges = {}
+    if cntlevel is None:
+        with prof.stage("scan"), forked.Pool(min(nprocess, len(tasks))) as pool:
+            for (fcstfile, varname, levels), franges in zip(tasks, pool.map(batch_range, tasks)):
+                for level, (pmin, pmax) in zip(levels, franges):
+                    vmin, vmax = ranges.get((varname, level), (pmin, pmax))
+                    ranges[(varname, level)] = (np.fmin(vmin, pmin), np.fmax(vmax, pmax))
+    else:
+        for fcstfile, varname, levels in tasks:
+            ranges.update({(varname, level): (0.0, 0.0) for level in levels})
+
+    batch_state['colorscales'] = { key: get_var_contours(key[0], np.array(prange), cntlevel) for key, prange in ranges.items() }
+
+    with prof.stage("plot"), forked.Pool(min(nprocess, len(tasks))) as pool:
+        nframes = sum(pool.imap_unordered(batch_plot, tasks))
+
+    prof.count("frames_plotted", nframes)
+    print(f"Plotted {nframes} frames of {len(fcstfiles)} files.")
+
+########################################################################
+
+def watch_batch(args, basmap, filters, cntlevel, prof):
+    '''Plot the variables "args.varname" (comma separated) of the files matching
+       args.pattern in args.watch as soon as they are complete
+
+    The grid, levels and map background come from the first file. The pool of
+    workers is forked once after they are set up and is kept for all files. The
+    colour scales are from "-c", or from each frame.
+    '''
+
+    if not os.path.isdir(args.watch):
+        print(f"ERROR: directory {args.watch} not found.")
+        sys.exit(1)
+
+    varnames = [varname for item in args.fcstfiles+[args.varname] for varname in item.split(',')]
+    outdir   = batch_outdir(args)
+    forked   = mp.get_context('fork')
+    nprocess = args.nprocess if args.nprocess is not None else mpas_profile.get_nprocess(len(varnames))
+
+    pool   = None
+    nfiles = 0
+    print(f"Watching {os.path.join(args.watch, args.pattern)} for {', '.join(varnames)} ...", flush=True)
+    try:
+        for fcstfile in mpas_watch.watch_files(args.watch, args.pattern, args.marker, args.poll, args.timeout, args.settle):
+
+            with prof.stage("index"):
+                mpas_gribindex.build_index(fcstfile, args.indexdir)
+
+            if pool is None:
+                varlevels = batch_setup(args, basmap, filters, cntlevel, fcstfile, varnames, outdir, prof)
+                pool = forked.Pool(nprocess)
+
+            tasks = [(fcstfile, varname, varlevels[varname]) for varname in varnames]
+            with prof.stage("plot"):
+                nframes = sum(pool.imap_unordered(batch_plot, tasks))
+
+            prof.count("frames_plotted", nframes)
+            nfiles += 1
+            print(f"Plotted {nframes} frames of {fcstfile}.", flush=True)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print(f"No new file in {args.timeout} seconds, stopped watching {args.watch} after {nfiles} files.")
+
 #@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
 #
 # Main function defined to return correct sys.exit() calls
@@ -197,8 +696,8 @@ if __name__ == "__main__":
     'lowCloudLayer', 'middleCloudLayer',    'highCloudLayer',  'cloudCeiling',
     'cloudBase',   'nominalTop',            'isothermZero',    'highestTroposphericFreezing',
     'adiabaticCondensation',                'equilibrium',     'unknown']
-    parser.add_argument('fcstfiles',nargs='+', help='GRIB2 files')
-    parser.add_argument('varname', help='Name of variable to be plotted',type=str, default=None)
+    parser.add_argument('fcstfiles',nargs='*', help='GRIB2 files')
+    parser.add_argument('varname', nargs='?', help='Name of variable to be plotted, v1,v2,... in the batch and watch modes',type=str, default=None)
 
     parser.add_argument('-v','--verbose',   help='Verbose output',                 action="store_true", default=False)
     #parser.add_argument('-latlon'       ,   help='Base map latlon or lambert',action='store_true', default=True)
@@ -209,14 +708,60 @@ if __name__ == "__main__":
     parser.add_argument('-f','--filter',     help=f'grib2 field filter',  type=str, default=None)
     parser.add_argument('-l','--vertLevels',help='Vertical levels to be plotted [l1,l2,l3,...]',  type=str, default=None)
     parser.add_argument('-c','--cntLevels', help='Contour levels [cmin,cmin,cinc]',               type=str, default=None)
+    parser.add_argument('--contour',        help='Draw filled contours instead of the grid boxes',   action="store_true", default=False)
     parser.add_argument('-o','--outfile',   help='Name of output image or output directory',      type=str, default=None)
+    parser.add_argument('-b','--batch',     help='Batch mode, plot the variables varname=v1,v2,... in all files matching the patterns fcstfiles',
+                                            action="store_true", default=False)
+    parser.add_argument('-n','--nprocess',  help='Number of worker processes in the batch mode',  type=int, default=None)
+    parser.add_argument('--indexdir',       help='Cache directory of the GRIB2 index files, default $MPAS_GRIBINDEX or ~/.cache/mpas_gribindex',
+                                            type=str, default=None)
+    mpas_watch.add_arguments(parser, 'MPAS-A_*f??.grib2')
+    mpas_profile.add_arguments(parser)
 
     args = parser.parse_args()
 
+    if args.varname is None and len(args.fcstfiles) > 0:    # "fcstfiles" takes all positional arguments
+        args.varname = args.fcstfiles.pop()
+    if args.varname is None or (len(args.fcstfiles) == 0 and args.watch is None):
+        parser.error("the following arguments are required: fcstfiles, varname")
+
+    prof = mpas_profile.Profiler.from_args('plot_grib2', args)
+
     basmap = "latlon"
     if not args.latlon:
         basmap = "lambert"
 
+    if args.filter is not None:
+        filters = eval(args.filter)
+    else:
+        filters = {}
+
+    typeoflevel = 'hybrid'  # isobaricInhPa, surface, hybrid
+    if args.typeOfLevel in typeoflevels:
+        typeoflevel = args.typeOfLevel
+    filters['typeOfLevel'] = typeoflevel
+
+    #
+    # decode contour specifications
+    #
+    if args.cntLevels is None:
+        cntlevel = None
+    else:
+        cntlevel = [float(item) for item in args.cntLevels.split(',')]
+        #if len(cntlevel) != 3:
+        #    print(f"Option -c must be [cmin,cmax,cinc]. Got \"{cntlevel}\"")
+        #    sys.exit(0)
+
+    if args.watch is not None:
+        watch_batch(args, basmap, filters, cntlevel, prof)
+        prof.finish()
+        sys.exit(0)
+
+    if args.batch:
+        plot_batch(args, basmap, filters, cntlevel, prof)
+        prof.finish()
+        sys.exit(0)
+
     fcstfiles = []
     varnames  = []
     for fcstfile in args.fcstfiles:
@@ -248,19 +793,20 @@ if __name__ == "__main__":
         print(f"Found too many files. Got \"{fcstfiles}\"")
         sys.exit(0)
 
-    if args.filter is not None:
-        filters = eval(args.filter)
-    else:
-        filters = {}
+    if os.path.lexists(fcstfile):
 
-    typeoflevel = 'hybrid'  # isobaricInhPa, surface, hybrid
-    if args.typeOfLevel in typeoflevels:
-        typeoflevel = args.typeOfLevel
-    filters['typeOfLevel'] = typeoflevel
+        # Grid definition of the file, to draw the fields in their native projection
+        gribgrid = None
+        if not args.contour:
+            with prof.stage("inventory"):
+                messages = mpas_grib2.scan_inventory(fcstfile)
+            if len(messages) > 0:
+                gribgrid = messages[0].grid
 
-    if os.path.lexists(fcstfile):
+        with prof.stage("read"):
+            # The dataset stays open, the levels are decoded only when they are plotted
+            mesh = mpas_gribindex.open_dataset(fcstfile, filters, args.indexdir)
 
-        with xr.open_dataset(fcstfile, engine='cfgrib', filter_by_keys=filters) as mesh:
             #
             # decode gridfile for latitudes/longitudes
             #
@@ -296,7 +842,6 @@ if __name__ == "__main__":
             varunits = variable.units
             varndim  = len(variable.shape)
             varshapes = variable.shape
-            vardata   = variable.values
             vartime   = variable.valid_time
             if varndim == 3:
                 varlevels = variable[typeoflevel]
@@ -304,8 +849,11 @@ if __name__ == "__main__":
                 varlevels = [0]
 
         if caldiff:
-            with xr.open_dataset(fcstfiles[1], engine='cfgrib', filter_by_keys=filters) as mesh:
-                vardata = vardata - mesh[varname].values
+            with prof.stage("read"):
+                mesh2 = mpas_gribindex.open_dataset(fcstfiles[1], filters, args.indexdir)
+            variables = [variable, mesh2[varname]]
+        else:
+            variables = [variable]
     else:
         print("ERROR: need a GRIB2 file.")
         sys.exit(0)
@@ -314,19 +862,9 @@ if __name__ == "__main__":
     fcstfname = fcsttime
 
     if varndim == 2:
-        levels=[0]
+        levels=[None]
     elif varndim == 3:
-        levels=range(0,len(varlevels))
-
-        if args.vertLevels is not None:
-            pattern = re.compile("^([0-9]+)-([0-9]+)$")
-            pmatched = pattern.match(args.vertLevels)
-            if pmatched:
-                levels=range(int(pmatched[1]),int(pmatched[2]))
-            elif args.vertLevels in ["max",]:
-                levels=["max",]
-            else:
-                levels = [int(item) for item in args.vertLevels.split(',')]
+        levels = parse_levels(args.vertLevels, len(varlevels))
     else:
         print(f"Do not supported {varndim} dimensions array.")
         sys.exit(0)
@@ -347,53 +885,9 @@ if __name__ == "__main__":
         outdir  = os.path.dirname(args.outfile)
         outfile = os.path.basename(args.outfile)
 
-    #
-    # decode contour specifications
-    #
-    if args.cntLevels is None:
-        cntlevel = None
-    else:
-        cntlevel = [float(item) for item in args.cntLevels.split(',')]
-        #if len(cntlevel) != 3:
-        #    print(f"Option -c must be [cmin,cmax,cinc]. Got \"{cntlevel}\"")
-        #    sys.exit(0)
+    import_plotting()
 
-    #-----------------------------------------------------------------------
-    #
-    # Lambert grid for HRRR
-    #
-    #-----------------------------------------------------------------------
-
-    carr= ccrs.PlateCarree()
-
-    if basmap == "lambert":
-        ctrlat = 38.5
-        ctrlon = -97.5    # -97.5  # 262.5
-        stdlat1 = 38.5
-        stdlat2 = 38.5
-
-        nxhr = 1799
-        nyhr = 1059
-        dxhr = 3000.0
-        dyhr = 3000.0
-
-        xsize=(nxhr-1)*dxhr
-        ysize=(nyhr-1)*dyhr
-
-        x1hr = np.linspace(0.0,xsize,num=nxhr)
-        y1hr = np.linspace(0.0,ysize,num=nyhr)
-
-        x2hr, y2hr = np.meshgrid(x1hr,y1hr)
-
-        xctr = (nxhr-1)/2*dxhr
-        yctr = (nyhr-1)/2*dyhr
-
-        proj_hrrr=ccrs.LambertConformal(central_longitude=ctrlon, central_latitude=ctrlat,
-                     false_easting=xctr, false_northing= yctr, secant_latitudes=None,
-                     standard_parallels=(stdlat1, stdlat2), globe=None)
-
-    else:
-        proj_hrrr = None
+    projs = map_projections(basmap, gribgrid, fcstfile, glons, glats)
 
     #-----------------------------------------------------------------------
     #
@@ -401,80 +895,22 @@ if __name__ == "__main__":
     #
     #-----------------------------------------------------------------------
 
-    style = 'ggplot'
-
     for l in levels:
 
-        if varndim == 3:
-            if l == "max":
-                varplt = np.max(vardata,axis=0)
-                outlvl = f"_{l}"
-                outtlt = f"colum maximum {varname}{diffstr} ({varunits}) valid at {fcsttime}"
-            else:
-                varplt = vardata[l,:,:]
-                outlvl = f"_K{l:02d}"
-                outtlt = f"{varname}{diffstr} ({varunits}) valid at {fcsttime} on level {l:02d}"
-        elif varndim == 2:
-            varplt = vardata[:,:]
-            outlvl = ""
-            outtlt = f"{varname}{diffstr} ({varunits}) valid at {fcsttime}"
-        else:
-            print(f"Variable {varname} is in wrong shape: {varshapes}.")
-            sys.exit(0)
-
-        color_map, normc, cntlevels, ticks_list = get_var_contours(varname,varplt,cntlevel)
-
-        figure = plt.figure(figsize = (12,12) )
-
-        if basmap == "latlon":
-            carr._threshold = carr._threshold/10.
-            ax = plt.axes(projection=carr)
-            ax.set_extent([-135.0,-60.0,20.0,55.0],crs=carr)
-        else:
-            ax = plt.axes(projection=proj_hrrr)
-            ax.set_extent([-125.0,-70.0,22.0,52.0],crs=carr)
-
-        #
-        # Use tricontourf
-        #
-        #cntr = ax.tricontourf(glons, glats, varplt, levels=24, antialiased=True, cmap=color_map, transform=carr)
-        #cntr = ax.tricontourf(glons, glats, varplt, cntlevels, antialiased=False, cmap=color_map, norm=normc, transform=carr)
-
-        cntr = ax.contourf(glons, glats, varplt, cntlevels, antialiased=False, cmap=color_map, norm=normc, transform=carr )
+        varplt = decode_level(variables, l, prof)
+        outlvl, outtlt = frame_title(varname, diffstr, varunits, fcsttime, l)
 
-        # https://matplotlib.org/api/colorbar_api.html
-        #
-        cax = figure.add_axes([ax.get_position().x1+0.01,ax.get_position().y0,0.02,ax.get_position().height])
-        cbar = plt.colorbar(cntr, cax=cax, ticks=ticks_list)
-        cbar.set_label(f'{varname} ({varunits})')
-
-        ax.coastlines(resolution='50m')
-        #ax.stock_img()
-        #ax.add_feature(cfeature.OCEAN)
-        #ax.add_feature(cfeature.LAND, edgecolor='black')
-        #ax.add_feature(cfeature.LAKES, edgecolor='black',facecolor='white')
-        #ax.add_feature(cfeature.RIVERS)
-        ax.add_feature(cfeature.BORDERS)
-        ax.add_feature(cfeature.STATES,linewidth=0.1)
-        gl = ax.gridlines(draw_labels=True,linewidth=0.2, color='gray', alpha=0.7, linestyle='--')
-        gl.xlocator = mticker.FixedLocator([-140,-120, -100, -80, -60])
-        gl.ylocator = mticker.FixedLocator([10,20,30,40,50,60])
-        gl.top_labels = False
-        gl.left_labels = True  #default already
-        gl.right_labels = False
-        gl.bottom_labels = True
-
-        # Create the title as you see fit
-        ax.set_title(outtlt)
-        plt.style.use(style) # Set the style that we choose above
+        colorscale = get_var_contours(varname,varplt,cntlevel)
 
         #
         if defaultoutfile:
             outfile = f"{varname}{diffstr}.{fcstfname}{outlvl}_{basmap}.png"
 
         figname = os.path.join(outdir,outfile)
-        print(f"Saving figure to {figname} ...")
-        figure.savefig(figname, format='png', dpi=100)
-        plt.close(figure)
+        plot_field(varplt, varname, varunits, outtlt, figname, basmap, projs, glons, glats, colorscale, args.indexdir, prof)
+
+    mesh.close()
+    if caldiff:
+        mesh2.close()
 
-        #plt.show()
+    prof.finish()
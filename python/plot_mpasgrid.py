@@ -17,35 +17,14 @@ import argparse
 
 import numpy as np
 
-''' By default matplotlib will try to open a display windows of the plot, even
-though sometimes we just want to save a plot. Somtimes this can cause the
-program to crash if the display can't open. The two commands below makes it so
-matplotlib doesn't try to open a window
-'''
-import matplotlib
-matplotlib.use('Agg')
-
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
-# '''
-# cm = Color Map. Within the matplotlib.cm module will contain access to a number
-# of colormaps for a plot. A reference to colormaps can be found at:
-#
-#     - https://matplotlib.org/examples/color/colormaps_reference.html
-# '''
-import matplotlib.cm as cm
-import matplotlib.colors as colors
-from metpy.plots import ctables
-
-#import scipy.interpolate as interpolate
-from shapely.geometry.polygon import Polygon
+from netCDF4 import Dataset
 
+import mpas_profile
+import mpas_remap
+import mpas_domain
 
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-
-import csv
-from netCDF4 import Dataset
+# The plotting modules (Matplotlib, MetPy, Cartopy, Shapely) are slow to import,
+# they are loaded only after the arguments and the input file have been checked.
 
 #import strmrpt
 
@@ -117,6 +96,60 @@ def get_var_contours(varname,var2d,colormaps,cntlevels):
 
     return color_map, normc, cntlevels
 
+########################################################################
+
+def load_triangulation(gridfile, nCells, glons, glats, lonlats=None, name=None, prof=None, verbose=False):
+    '''Triangulation of the cell centers, read from its cache next to gridfile or computed and cached
+
+    glons/glats are the cells of the domain "name" when a domain is given, and
+    the triangles whose centroid is out of the domain polygon "lonlats" are masked.
+    '''
+
+    import matplotlib.tri as mtri
+
+    if prof is None:
+        prof = mpas_profile.Profiler('plot_mpasgrid')
+
+    fingerprint = mpas_remap.mesh_fingerprint(glats, glons)
+    domain      = repr(("great circle", lonlats)) if lonlats is not None else ""
+    cachefile   = mpas_remap.cache_fname(gridfile, nCells, "tri.npz" if name is None else f"{name}.tri.npz")
+
+    triangles = None
+    mask      = None
+    if os.path.lexists(cachefile):
+        with np.load(cachefile) as cache:
+            if str(cache["fingerprint"]) == fingerprint:
+                triangles = cache["triangles"]
+                if str(cache["domain"]) == domain:
+                    mask = cache["mask"]
+                    if verbose:
+                        print(f"Triangulation loaded from {cachefile}.")
+            else:
+                print(f"Triangulation in {cachefile} is for another mesh, recomputing.")
+
+    if triangles is not None and mask is not None:
+        return mtri.Triangulation(glons, glats, triangles, mask if mask.size > 0 else None)
+
+    if triangles is None:
+        print(f"Triangulating {len(glons)} cells ...")
+        with prof.stage("triangulation"):
+            triangles = mtri.Triangulation(glons, glats).triangles
+
+    with prof.stage("triangle mask"):
+        if lonlats is not None:
+            centroids = np.stack([np.mean(glons[triangles], axis=1), np.mean(glats[triangles], axis=1)], axis=1)
+            mask = ~mpas_domain.points_in_polygon(centroids[:,0], centroids[:,1], lonlats)
+        else:
+            mask = np.zeros(0, dtype=bool)
+
+    try:
+        np.savez(cachefile, triangles=triangles, mask=mask, fingerprint=fingerprint, domain=domain)
+        print(f"Triangulation written to {cachefile}.")
+    except OSError as ex:
+        print(f"WARNING: cannot cache the triangulation ({ex}).")
+
+    return mtri.Triangulation(glons, glats, triangles, mask if mask.size > 0 else None)
+
 #@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
 #
 # Main function defined to return correct sys.exit() calls
@@ -143,12 +176,24 @@ if __name__ == "__main__":
     parser.add_argument('-l','--vertLevels',help='Vertical levels to be plotted [l1,l2,l3,...]',  type=str, default=None)
     parser.add_argument('-c','--cntLevels', help='Contour levels [cmin,cmin,cinc]',               type=str, default=None)
     parser.add_argument('-o','--outfile',   help='Name of output image or output directory',      type=str, default=None)
+    parser.add_argument('-r','--remap',     help='Remap to the output grid with cached weights and draw it as an image, instead of contouring the cells',
+                                            choices=mpas_remap.remap_methods, default=None)
+    parser.add_argument('--outgrid',        help='Output grid specification for "--remap"',        type=str, default=mpas_remap.default_gridspec)
+    mpas_profile.add_arguments(parser)
 
     args = parser.parse_args()
 
+    prof = mpas_profile.Profiler.from_args('plot_mpasgrid', args)
+
     basmap = "latlon"
     if not args.latlon:
         basmap = "lambert"
+    if args.remap is not None:
+        basmap = "outgrid"          # drawn in the projection of the output grid
+
+        if not os.path.lexists(args.outgrid):
+            print(f"ERROR: output grid specification {args.outgrid} not found.")
+            sys.exit(1)
 
     fcstfile = args.fcstfile
     varname  = args.varname
@@ -158,7 +203,7 @@ if __name__ == "__main__":
 
     if os.path.lexists(fcstfile):
 
-        with Dataset(fcstfile, 'r') as mesh:
+        with prof.stage("read"), Dataset(fcstfile, 'r') as mesh:
             nCells   = mesh.dimensions["nCells"].size
             nlevels  = mesh.dimensions["nVertLevels"].size
             try:
@@ -213,6 +258,8 @@ if __name__ == "__main__":
             varshapes = variable.shape
             vardata  = variable[:]
 
+            prof.count("bytes_read", vardata.nbytes)
+
     else:
         print("ERROR: need a MPAS history/diag file.")
         sys.exit(0)
@@ -256,7 +303,7 @@ if __name__ == "__main__":
     if args.gridfile is not None:
         gridfile = args.gridfile
 
-    with Dataset(gridfile, 'r') as grid:
+    with prof.stage("read"), Dataset(gridfile, 'r') as grid:
         lats = grid.variables['latCell'][:]
         lons = grid.variables['lonCell'][:]
 
@@ -264,19 +311,34 @@ if __name__ == "__main__":
         glons = ((lons * (180 / np.pi) )%360 + 540)%360 -180.
 
     #
-    # decode gridfile for latitudes/longitudes
+    # Remapping weights to the output grid, computed once and cached
+    #
+    remap = None
+    if args.remap is not None:
+        remap = mpas_remap.Remapper.load(gridfile, args.outgrid, args.remap, prof=prof, verbose=args.verbose)
+
     #
-    out_masked = False
+    # decode domain polygon, only the cells in it are plotted
+    #
+    lonlats = None
+    domname = None
+    incells = None
     if args.domain is not None and os.path.lexists(args.domain):
 
-        with open(args.domain, 'r') as csvfile:
-            reader = csv.reader(csvfile)
-            next(reader);next(reader);next(reader);
-            lonlats=[]
-            for row in reader:
-                lonlats.append((float(row[1]),float(row[0])))
-        out_masked = True
-        lonlats.append(lonlats[0])
+        lonlats, inpoint = mpas_domain.read_custom_pts(args.domain)
+        domname    = mpas_domain.domain_name(args.domain)
+
+        inside  = mpas_domain.domain_mask(gridfile, np.asarray(glons), np.asarray(glats), lonlats, domname, inpoint, prof, args.verbose)
+        incells = np.flatnonzero(inside)
+        if len(incells) == 0:
+            print(f"ERROR: no MPAS cell is in the domain of {args.domain}.")
+            sys.exit(1)
+
+        if args.verbose:
+            print(f"{len(incells)} of {nCells} cells are in the domain {domname}.")
+
+        glons = glons[incells]
+        glats = glats[incells]
     #
     # Output file dir / file name
     #
@@ -291,6 +353,7 @@ if __name__ == "__main__":
     else:
         outdir  = os.path.dirname(args.outfile)
         outfile = os.path.basename(args.outfile)
+        defaultoutfile = False
 
     #
     # decode contour specifications
@@ -303,6 +366,34 @@ if __name__ == "__main__":
             print(f"Option -c must be [cmin,cmax,cinc]. Got \"{cntlevel}\"")
             sys.exit(0)
 
+    #
+    # Plotting modules, imported here to keep the listing and error paths fast.
+    #
+    # By default matplotlib will try to open a display windows of the plot, even
+    # though sometimes we just want to save a plot. Somtimes this can cause the
+    # program to crash if the display can't open. The two commands below makes it so
+    # matplotlib doesn't try to open a window
+    #
+    import matplotlib
+    matplotlib.use('Agg')
+
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as mticker
+    # '''
+    # cm = Color Map. Within the matplotlib.cm module will contain access to a number
+    # of colormaps for a plot. A reference to colormaps can be found at:
+    #
+    #     - https://matplotlib.org/examples/color/colormaps_reference.html
+    # '''
+    import matplotlib.cm as cm
+    import matplotlib.colors as colors
+    from metpy.plots import ctables
+
+    #import scipy.interpolate as interpolate
+
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+
     #-----------------------------------------------------------------------
     #
     # Lambert grid for HRRR
@@ -322,14 +413,6 @@ if __name__ == "__main__":
         dxhr = 3000.0
         dyhr = 3000.0
 
-        xsize=(nxhr-1)*dxhr
-        ysize=(nyhr-1)*dyhr
-
-        x1hr = np.linspace(0.0,xsize,num=nxhr)
-        y1hr = np.linspace(0.0,ysize,num=nyhr)
-
-        x2hr, y2hr = np.meshgrid(x1hr,y1hr)
-
         xctr = (nxhr-1)/2*dxhr
         yctr = (nyhr-1)/2*dyhr
 
@@ -340,6 +423,15 @@ if __name__ == "__main__":
     else:
         proj_hrrr = None
 
+    if remap is not None:
+        proj_grid   = mpas_remap.grid_projection(remap.gridspec)
+        extent_grid = mpas_remap.grid_extent(remap.gridspec)
+    else:
+        #
+        # Triangulation of the cells, shared by all contour calls
+        #
+        triang = load_triangulation(gridfile, nCells, np.asarray(glons), np.asarray(glats), lonlats, domname, prof, args.verbose)
+
     #-----------------------------------------------------------------------
     #
     # Plot field
@@ -358,7 +450,7 @@ if __name__ == "__main__":
     #
     general_colormap = cm.gist_ncar
 
-    mycolors = ctables.colortables['NWSReflectivity']
+    mycolors = list(ctables.colortables['NWSReflectivity'])   # do not modify the registered table
     mycolors.insert(0,(1,1,1))
     ref_colormap = colors.ListedColormap(mycolors)
     style = 'ggplot'
@@ -384,6 +476,9 @@ if __name__ == "__main__":
                 print(f"Variable {varname} is in wrong shape: {varshapes}.")
                 sys.exit(0)
 
+            if incells is not None:
+                varplt = varplt[incells]
+
             color_map, normc, cntlevels = get_var_contours(varname,varplt,(general_colormap,ref_colormap),cntlevel)
 
             figure = plt.figure(figsize = (12,12) )
@@ -392,44 +487,75 @@ if __name__ == "__main__":
                 carr._threshold = carr._threshold/10.
                 ax = plt.axes(projection=carr)
                 ax.set_extent([-135.0,-60.0,20.0,55.0],crs=carr)
+            elif basmap == "outgrid":
+                ax = plt.axes(projection=proj_grid)
+                ax.set_extent(extent_grid,crs=proj_grid)
             else:
                 ax = plt.axes(projection=proj_hrrr)
                 ax.set_extent([-125.0,-70.0,22.0,52.0],crs=carr)
 
-            #
-            # Use tricontourf
-            #
-            #cntr = ax.tricontourf(glons, glats, varplt, levels=24, antialiased=True, cmap=color_map, transform=carr)
-            cntr = ax.tricontourf(glons, glats, varplt, cntlevels, antialiased=False, cmap=color_map, norm=normc, transform=carr)
+            if remap is not None:
+                with prof.stage("remap"):
+                    if incells is not None:     # cells out of the domain are masked
+                        cellplt = np.ma.masked_all(nCells, dtype=np.float64)
+                        cellplt[incells] = varplt
+                        gridded = remap(cellplt)
+                    else:
+                        gridded = remap(varplt)
+
+                with prof.stage("contour"):
+                    #
+                    # The grid is in the axes projection, so it is drawn as an image in the
+                    # color bands of the contours: each point takes the middle value of its band,
+                    # which tricontourf colors with normc, and the points out of the bands are blank
+                    #
+                    bands = np.asarray(cntlevels, dtype=np.float64)
+                    mids  = 0.5*(bands[:-1] + bands[1:])
+                    data  = np.ma.filled(np.ma.asarray(gridded, dtype=np.float64), np.nan)
+                    iband = np.digitize(data, bands, right=True)
+                    iband[data == bands[0]] = 1
+                    blank = ~np.isfinite(data) | (iband < 1) | (iband >= len(bands))
+                    banded = np.ma.masked_where(blank, mids[np.clip(iband-1, 0, len(mids)-1)])
+                    cntr = ax.imshow(banded, origin='lower', extent=extent_grid, transform=proj_grid,
+                                     cmap=color_map, norm=normc, interpolation='nearest')
+
+                    prof.count("points_remapped", gridded.size)
 
-            #
-            # mask out interpolation parts
-            #
-            if out_masked:
-                polygon1 = Polygon( lonlats )
-                ax.add_geometries([polygon1], crs=ccrs.Geodetic(), facecolor='w', edgecolor='none')
+            else:
+                with prof.stage("contour"):
+                    #
+                    # Use tricontourf
+                    #
+                    #cntr = ax.tricontourf(glons, glats, varplt, levels=24, antialiased=True, cmap=color_map, transform=carr)
+                    cntr = ax.tricontourf(triang, varplt, cntlevels, antialiased=False, cmap=color_map, norm=normc, transform=carr)
+
+                    prof.count("cells_contoured", len(varplt))
 
             # https://matplotlib.org/api/colorbar_api.html
             #
             cax = figure.add_axes([ax.get_position().x1+0.01,ax.get_position().y0,0.02,ax.get_position().height])
-            cbar = plt.colorbar(cntr, cax=cax)
+            if remap is not None:       # the color bands of the contours
+                cbar = plt.colorbar(cntr, cax=cax, boundaries=bands, values=mids)
+            else:
+                cbar = plt.colorbar(cntr, cax=cax)
             cbar.set_label(f'{varname} ({varunits})')
 
-            ax.coastlines(resolution='50m')
-            #ax.stock_img()
-            #ax.add_feature(cfeature.OCEAN)
-            #ax.add_feature(cfeature.LAND, edgecolor='black')
-            #ax.add_feature(cfeature.LAKES, edgecolor='black',facecolor='white')
-            #ax.add_feature(cfeature.RIVERS)
-            ax.add_feature(cfeature.BORDERS)
-            ax.add_feature(cfeature.STATES,linewidth=0.1)
-            gl = ax.gridlines(draw_labels=True,linewidth=0.2, color='gray', alpha=0.7, linestyle='--')
-            gl.xlocator = mticker.FixedLocator([-140,-120, -100, -80, -60])
-            gl.ylocator = mticker.FixedLocator([10,20,30,40,50,60])
-            gl.top_labels = False
-            gl.left_labels = True  #default already
-            gl.right_labels = False
-            gl.bottom_labels = True
+            with prof.stage("features"):
+                ax.coastlines(resolution='50m')
+                #ax.stock_img()
+                #ax.add_feature(cfeature.OCEAN)
+                #ax.add_feature(cfeature.LAND, edgecolor='black')
+                #ax.add_feature(cfeature.LAKES, edgecolor='black',facecolor='white')
+                #ax.add_feature(cfeature.RIVERS)
+                ax.add_feature(cfeature.BORDERS)
+                ax.add_feature(cfeature.STATES,linewidth=0.1)
+                gl = ax.gridlines(draw_labels=True,linewidth=0.2, color='gray', alpha=0.7, linestyle='--')
+                gl.xlocator = mticker.FixedLocator([-140,-120, -100, -80, -60])
+                gl.ylocator = mticker.FixedLocator([10,20,30,40,50,60])
+                gl.top_labels = False
+                gl.left_labels = True  #default already
+                gl.right_labels = False
+                gl.bottom_labels = True
 
             # Create the title as you see fit
             ax.set_title(outtlt)
@@ -441,7 +567,9 @@ if __name__ == "__main__":
 
             figname = os.path.join(outdir,outfile)
             print(f"Saving figure to {figname} ...")
-            figure.savefig(figname, format='png', dpi=600)
+            mpas_profile.save_figure(figure, figname, 600, prof)
             plt.close(figure)
 
             #plt.show()
+
+    prof.finish()
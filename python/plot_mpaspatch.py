@@ -19,38 +19,58 @@ import os
 import sys
 import re, math
 import argparse
+import json
+import socket
 
 import numpy as np
 
-#''' By default matplotlib will try to open a display windows of the plot, even
-#though sometimes we just want to save a plot. Somtimes this can cause the
-#program to crash if the display can't open. The two commands below makes it so
-#matplotlib doesn't try to open a window
-#'''
-import matplotlib
-matplotlib.use('Agg')
-
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
-# '''
-# cm = Color Map. Within the matplotlib.cm module will contain access to a number
-# of colormaps for a plot. A reference to colormaps can be found at:
-#
-#     - https://matplotlib.org/examples/color/colormaps_reference.html
-# '''
-import matplotlib.cm as cm
-import matplotlib.colors as mcolors
-from metpy.plots import ctables
-
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-
 from netCDF4 import Dataset
 import pickle as pkle
 
-import matplotlib.collections as mplcollections
-import matplotlib.patches as patches
-import matplotlib.path as path
+import mpas_profile
+import mpas_meshstore
+import mpas_watch
+
+# The plotting modules (Matplotlib, MetPy, Cartopy) are slow to import, they are
+# loaded by import_plot_modules() only when a figure is actually drawn.
+
+# Last line sent back by plot_mpaspatch_server.py with the exit status of a request
+STATUS_TAG = "@@STATUS@@ "
+
+########################################################################
+
+def import_plot_modules():
+    '''Import the plotting modules into the global name space'''
+
+    global matplotlib, plt, mticker, cm, mcolors, ctables, ccrs, cfeature
+    global mplcollections, patches, path
+
+    #''' By default matplotlib will try to open a display windows of the plot, even
+    #though sometimes we just want to save a plot. Somtimes this can cause the
+    #program to crash if the display can't open. The two commands below makes it so
+    #matplotlib doesn't try to open a window
+    #'''
+    import matplotlib
+    matplotlib.use('Agg')
+
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as mticker
+    # '''
+    # cm = Color Map. Within the matplotlib.cm module will contain access to a number
+    # of colormaps for a plot. A reference to colormaps can be found at:
+    #
+    #     - https://matplotlib.org/examples/color/colormaps_reference.html
+    # '''
+    import matplotlib.cm as cm
+    import matplotlib.colors as mcolors
+    from metpy.plots import ctables
+
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+
+    import matplotlib.collections as mplcollections
+    import matplotlib.patches as patches
+    import matplotlib.path as path
 
 ########################################################################
 
@@ -92,6 +112,8 @@ def update_progress(job_title, progress):
 
 def get_mpas_patches(meshfile, pickle_fname=None):
 
+    import_plot_modules()
+
     print(f"Using pickle file: {pickle_fname}.")
 
     if(pickle_fname is not None and os.path.isfile(pickle_fname)):
@@ -179,6 +201,29 @@ def get_mpas_patches(meshfile, pickle_fname=None):
 
 ########################################################################
 
+class PatchCache:
+    '''Keep the MPAS patch collections in memory, reloading a patch file only when it changes'''
+
+    def __init__(self):
+        self.collections = {}
+
+    def __call__(self, pickle_fname):
+
+        if not os.path.isfile(pickle_fname):
+            return load_mpas_patches(pickle_fname)      # it prints the error message and exits
+
+        key   = os.path.realpath(pickle_fname)
+        mtime = os.path.getmtime(key)
+
+        if key not in self.collections or self.collections[key][0] != mtime:
+            self.collections[key] = (mtime, load_mpas_patches(pickle_fname))
+        else:
+            print(f"Using patches of {pickle_fname} in memory.")
+
+        return self.collections[key][1]
+
+########################################################################
+
 def load_mpas_patches(pickle_fname):
 
     print(f"Using pickle file: {pickle_fname}")
@@ -208,6 +253,113 @@ def load_mpas_patches(pickle_fname):
         sys.exit(-1)
         #return None
 
+########################################################################
+
+def read_mpas_levels(fcstfiles, varnames, operator, varndim, levels, t=0, max_bytes=None, prof=None):
+    '''Read the horizontal slices to be plotted, yields (level, values on cells)
+
+    The vertical levels are read in chunks of as many levels as fit in
+    max_bytes together with the operand, masked and difference copies.
+    The column maximum ("max") is reduced chunk by chunk, so that a 3D
+    variable is never held in memory as a whole when a budget is given.
+    '''
+
+    if prof is None:
+        prof = mpas_profile.Profiler('read_mpas_levels')
+
+    meshes = [Dataset(fcstfile, 'r') for fcstfile in fcstfiles]
+
+    def read_slab(k0=None, k1=None):
+        '''Read levels [k0,k1) of the variable (or expression), differenced between the files'''
+        result = None
+        for mesh in meshes:
+            values = []
+            for varname in varnames:
+                variable = mesh.variables[varname]
+                if varndim == 1:
+                    values.append(variable[:])
+                elif varndim == 2:
+                    values.append(variable[t,:])
+                elif varndim == 230:
+                    values.append(variable[:,k0:k1])
+                else:
+                    values.append(variable[t,:,k0:k1])
+                prof.count("bytes_read", values[-1].nbytes)
+
+            if operator is not None:
+                values = eval(f"x {operator} y",{"x":values[0],"y":values[1]})
+            else:
+                values = values[0]
+
+            result = values if result is None else result - values
+        return result
+
+    try:
+        if varndim in (1, 2):
+            with prof.stage("read"):
+                varplt = read_slab()
+            yield levels[0], varplt
+            return
+
+        variable = meshes[0].variables[varnames[0]]
+        nCells, nvert = variable.shape[-2:]
+
+        if max_bytes is None:
+            nchunk = nvert
+        else:
+            level_bytes = nCells*(variable.dtype.itemsize+1)*(len(meshes)*len(varnames)+1)
+            nchunk = max(1, min(nvert, max_bytes//level_bytes))
+
+        if list(levels) == ["max"]:
+            colmax = None
+            for k0 in range(0, nvert, nchunk):
+                with prof.stage("read"):
+                    slab   = read_slab(k0, min(k0+nchunk, nvert))
+                    slab   = np.ma.max(slab, axis=1)
+                    colmax = slab if colmax is None else np.ma.maximum(colmax, slab)
+            yield "max", colmax
+            return
+
+        # Group the requested levels into slabs of at most nchunk levels
+        k0   = None
+        slab = None
+        for l in levels:
+            if slab is None or l < k0 or l >= k0+nchunk:
+                k0   = l
+                slab = None             # release the previous slab before reading the next one
+                with prof.stage("read"):
+                    slab = read_slab(k0, min(k0+nchunk, nvert))
+            yield l, slab[:, l-k0]
+    finally:
+        for mesh in meshes:
+            mesh.close()
+
+########################################################################
+
+def get_active_cells(varplt, color_map, normc, cull=True):
+    '''Find the cells that have to be drawn as patches
+
+    Masked/NaN cells are transparent anyway and never drawn. When the lowest
+    colour bin is white (reflectivity & precipitation), cells falling in that
+    bin are also skipped and covered by one background fill of the axes.
+
+    Returns the indices of the cells to be drawn and the background colour.
+    '''
+    values  = np.ma.masked_invalid(varplt)
+    active  = ~np.ma.getmaskarray(values)
+    bgcolor = color_map(0)
+
+    if cull and mcolors.same_color(bgcolor, 'white'):
+        rgba   = color_map(normc(values), bytes=True)
+        bgrgba = np.array(color_map(0, bytes=True), dtype=rgba.dtype)
+        active &= np.any(rgba != bgrgba, axis=1)
+    else:
+        bgcolor = 'white'
+
+    return np.flatnonzero(active), bgcolor
+
+########################################################################
+
 def get_var_contours(varname,var2d,cntlevels):
     '''set contour specifications'''
     #
@@ -227,7 +379,7 @@ def get_var_contours(varname,var2d,cntlevels):
 
     # Use reflectivity color map and range
     if varname.startswith('refl'):
-        mycolors = ctables.colortables['NWSReflectivity']
+        mycolors = list(ctables.colortables['NWSReflectivity'])   # do not modify the registered table
         mycolors.insert(0,(1,1,1))
         color_map = mcolors.ListedColormap(mycolors)
     elif varname.startswith('rain') or varname.startswith('prec_'):
@@ -309,21 +461,17 @@ def get_var_contours(varname,var2d,cntlevels):
 
     return color_map, normc, cmin, cmax, ticks_list
 
-#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
-#
-# Main function defined to return correct sys.exit() calls
-#
-#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+########################################################################
 
-if __name__ == "__main__":
+def parse_args(argv=None):
 
     parser = argparse.ArgumentParser(description='Plot MPAS grid variables using Cartopy',
                                      epilog='''        ---- Yunheng Wang (2022-10-08).
                                             ''')
                                      #formatter_class=CustomFormatter)
 
-    parser.add_argument('fcstfiles', nargs='+',help='MPAS forecast file')
-    parser.add_argument('varname', help='Name of variable to be plotted',type=str, default=None)
+    parser.add_argument('fcstfiles', nargs='*',help='MPAS forecast file, or more variables to be plotted with --watch')
+    parser.add_argument('varname', nargs='?',help='Name of variable to be plotted',type=str, default=None)
 
     parser.add_argument('-v','--verbose',   help='Verbose output',                             action="store_true", default=False)
     #parser.add_argument('-g','--gridfile',  help='Name of the MPAS file that contains cell grid',         type=str, default=None)
@@ -331,8 +479,62 @@ if __name__ == "__main__":
     parser.add_argument('-l','--vertLevels',help='Vertical levels to be plotted [l1,l2,l3,...]',  type=str, default=None)
     parser.add_argument('-c','--cntLevels', help='Contour levels [cmin,cmax,cinc]',               type=str, default=None)
     parser.add_argument('-o','--outfile',   help='Name of output image or output directory',              type=str, default=None)
+    parser.add_argument('--cull',           help='Do not draw cells in the lowest (white) colour bin',    action='store_true')
+    parser.add_argument('--no-cull',        help='Draw all cells',                       dest='cull', action='store_false')
+    parser.set_defaults(cull=True)
+    parser.add_argument('-s','--socket',    help='Send the plot request to plot_mpaspatch_server.py listening on this Unix socket', type=str, default=None)
+    parser.add_argument('--meshstore',      help='Attach to the mesh geometry in shared memory from mpas_meshstore.py, if it is there', action='store_true', default=False)
+    parser.add_argument('-m','--mem-budget',help='Memory budget for reading the variable, e.g. 2G. Levels are read in chunks to stay under it', type=str, default=None)
+    mpas_watch.add_arguments(parser, 'wofs_mpas.diag.*.nc')
+    mpas_profile.add_arguments(parser)
+
+    args = parser.parse_args(argv)
+    args.argv = sys.argv[1:] if argv is None else argv
+
+    if args.varname is None and len(args.fcstfiles) > 0:    # "fcstfiles" takes all positional arguments
+        args.varname = args.fcstfiles.pop()
+    if args.varname is None or (len(args.fcstfiles) == 0 and args.watch is None):
+        parser.error("the following arguments are required: fcstfiles, varname")
+
+    return args
+
+########################################################################
+
+def request_plot(sockname, argv):
+    '''Send a plot request to a running plot_mpaspatch_server.py and relay its output
 
-    args = parser.parse_args()
+    Returns the exit status of the request, or None when the server cannot be reached.
+    '''
+
+    request = {"cwd": os.getcwd(), "argv": argv}
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(sockname)
+    except OSError as ex:
+        client.close()
+        print(f"WARNING: plot server on {sockname} is not available ({ex}), plotting locally.")
+        return None
+
+    with client, client.makefile('rw') as stream:
+        stream.write(json.dumps(request)+"\n")
+        stream.flush()
+
+        for line in stream:
+            if line.startswith(STATUS_TAG):
+                return int(line[len(STATUS_TAG):])
+            sys.stdout.write(line)
+        sys.stdout.flush()
+
+    print("ERROR: plot server closed the connection unexpectedly.")
+    return -1
+
+########################################################################
+
+def plot_mpas(args, load_patches=load_mpas_patches):
+    '''Plot the variable and vertical levels requested by the command line arguments'''
+
+    prof = mpas_profile.Profiler.from_args('plot_mpaspatch', args, args.argv)
 
     basmap = "latlon"
 
@@ -363,10 +565,8 @@ if __name__ == "__main__":
     else:
         varnames=[varname]
 
-    caldiff = False
     diffstr = ""
     if len(fcstfiles) == 2:
-        caldiff = True
         fcstfile = fcstfiles[0]
         diffstr = "_diff"
     elif len(fcstfiles) == 1:
@@ -380,7 +580,7 @@ if __name__ == "__main__":
     #
     if os.path.lexists(fcstfile):
 
-        with Dataset(fcstfile, 'r') as mesh:
+        with prof.stage("read"), Dataset(fcstfile, 'r') as mesh:
             nCells   = mesh.dimensions["nCells"].size
             try:
                 nlevels = mesh.dimensions["nVertLevels"].size
@@ -439,18 +639,13 @@ if __name__ == "__main__":
             varunits = variable.getncattr('units')
             varndim  = variable.ndim
             varshapes = variable.shape
-            vardata   = variable[:]
             validtimestring = mesh.variables['xtime'][0].tobytes().decode('utf-8')
             if operator is not None:
-                vardata1 = mesh.variables[varnames[1]][:]
-                vardata = eval(f"x {operator} y",{"x":vardata,"y":vardata1})
                 varname = f"{varnames[0]}{operator}{varnames[1]}"
             else:
                 varname = varnames[0]
 
-        if caldiff:
-            with Dataset(fcstfiles[1], 'r') as mesh:
-                vardata = vardata - mesh.variables[varname][:]
+        # The data are read level by level in the plotting loop
     else:
         print("ERROR: need a MPAS history/diag file.")
         sys.exit(0)
@@ -527,6 +722,11 @@ if __name__ == "__main__":
         picklefile = picklefile+'.'+str(nCells)+'.'+'patches'
         picklefile = os.path.join(os.path.dirname(gridfile),picklefile)
 
+    if args.mem_budget is not None:
+        mem_budget = mpas_profile.parse_size(args.mem_budget)
+    else:
+        mem_budget = None
+
     #
     # Output file dir / file name
     #
@@ -560,6 +760,9 @@ if __name__ == "__main__":
     #
     #-----------------------------------------------------------------------
 
+    with prof.stage("imports"):
+        import_plot_modules()
+
     carr= ccrs.PlateCarree()
 
     if basmap == "lambert":
@@ -573,14 +776,6 @@ if __name__ == "__main__":
         dxhr = 3000.0
         dyhr = 3000.0
 
-        xsize=(nxhr-1)*dxhr
-        ysize=(nyhr-1)*dyhr
-
-        x1hr = np.linspace(0.0,xsize,num=nxhr)
-        y1hr = np.linspace(0.0,ysize,num=nyhr)
-
-        x2hr, y2hr = np.meshgrid(x1hr,y1hr)
-
         xctr = (nxhr-1)/2*dxhr
         yctr = (nyhr-1)/2*dyhr
 
@@ -611,39 +806,52 @@ if __name__ == "__main__":
     # nCells, but also nEdges of all nCells.
     #
     #patch_collection = get_mpas_patches(gridfile, picklefile)
-    patch_collection = load_mpas_patches(picklefile)
+    geometry = None
+    with prof.stage("geometry"):
+        if args.meshstore:
+            geometry = mpas_meshstore.attach(picklefile)
+            if geometry is None:
+                print(f"No mesh store of {picklefile} found, loading it.")
+
+        if geometry is None:
+            patch_collection = load_patches(picklefile)
+
+    # Patch files from get_mpaspatches.py keep the cells in Hilbert order, see mpas_cellorder.py
+    if geometry is not None:
+        cell_order = geometry.cell_order
+    else:
+        cell_order = getattr(patch_collection, "cell_order", None)
+    if cell_order is not None and len(cell_order) != nCells:
+        print(f"ERROR: the patch file is for a mesh of {len(cell_order)} cells, the forecast file has {nCells} cells.")
+        sys.exit(-1)
 
     times = [0]
     for t in times:
-        for l in levels:
+        for l, varplt in read_mpas_levels(fcstfiles, varnames, operator, varndim, levels, t, mem_budget, prof):
+
+            if cell_order is not None:
+                varplt = varplt[cell_order]
 
             if varndim == 3:
                 if l == "max":
-                    varplt = np.max(vardata,axis=2)[t,:]
                     outlvl = f"_{l}"
                     outtlt = f"colum maximum {varname}{diffstr} ({varunits}) valid at {fcsttime}"
                 else:
-                    varplt = vardata[t,:,l]
                     outlvl = f"_K{l:02d}"
                     outtlt = f"{varname}{diffstr} ({varunits}) valid at {fcsttime} on level {l:02d}"
             elif varndim == 230:
-                varplt = vardata[:,l]
                 outlvl = f"_K{l:02d}"
                 outtlt = f"{varname}{diffstr} ({varunits}) on level {l:02d}"
             elif varndim == 2:
-                varplt = vardata[t,:]
                 outlvl = ""
                 outtlt = f"{varname}{diffstr} ({varunits}) valid at {fcsttime}"
             elif varndim == 1:
-                varplt = vardata[:]
                 outlvl = ""
                 outtlt = f"{varname}{diffstr} ({varunits})"
             else:
                 print(f"Variable {varname} is in wrong shape: {varshapes}.")
                 sys.exit(0)
 
-            color_map, normc,cmin, cmax, ticks_list = get_var_contours(varname,varplt,cntlevel)
-
             figure = plt.figure(figsize = (12,12) )
 
             if basmap == "latlon":
@@ -654,15 +862,52 @@ if __name__ == "__main__":
                 ax = plt.axes(projection=proj_hrrr)
                 ax.set_extent([-125.0,-70.0,22.0,52.0],crs=carr)
 
-            patch_collection.set_array(varplt)
-            #patch_collection.set_edgecolors('w')       # No Edge Colors
-            patch_collection.set_antialiaseds(False)    # Blends things a little
-            patch_collection.set_cmap(color_map)        # Select our color_map
-            patch_collection.set_norm(normc)            # Select our normalization
-            patch_collection.set_clim(cmin,cmax)
+            with prof.stage("colour mapping"):
+                color_map, normc,cmin, cmax, ticks_list = get_var_contours(varname,varplt,cntlevel)
+
+                #
+                # Only cells out of the background colour bin are drawn, the others
+                # are covered by the axes background
+                #
+                if geometry is not None:
+                    ncells = geometry.nCells
+                    varplt = varplt[:ncells]
+
+                    # The cells out of the map are skipped as well, by blocks of the spatial index
+                    active, bgcolor = get_active_cells(varplt, color_map, normc, args.cull)
+                    active = np.intersect1d(active, geometry.visible_cells(*ax.get_extent(crs=carr)), assume_unique=True)
+
+                    frame_collection = mplcollections.PolyCollection(geometry.cell_vertices(active), closed=False)
+                    frame_collection.set_array(varplt[active])
+                else:
+                    cell_paths = patch_collection.get_paths()
+                    ncells     = len(cell_paths)
+                    varplt     = varplt[:ncells]
+
+                    active, bgcolor = get_active_cells(varplt, color_map, normc, args.cull)
+
+                    if len(active) == ncells:
+                        frame_collection = patch_collection
+                        frame_collection.set_array(varplt)
+                    else:
+                        frame_collection = mplcollections.PolyCollection([cell_paths[i].vertices for i in active], closed=False)
+                        frame_collection.set_array(varplt[active])
+
+                ax.set_facecolor(bgcolor)
+
+                if args.verbose:
+                    print(f"Drawing {len(active)} of {ncells} cells ...")
 
-            # Now apply the patch_collection to our axis '''
-            ax.add_collection(patch_collection)
+                #frame_collection.set_edgecolors('w')       # No Edge Colors
+                frame_collection.set_antialiaseds(False)    # Blends things a little
+                frame_collection.set_cmap(color_map)        # Select our color_map
+                frame_collection.set_norm(normc)            # Select our normalization
+                frame_collection.set_clim(cmin,cmax)
+
+                # Now apply the frame_collection to our axis '''
+                ax.add_collection(frame_collection)
+
+            prof.count("cells_drawn", len(active), per="savefig")
 
             #
             # Add a colorbar (if desired), and add a label to it. In this example the
@@ -672,26 +917,26 @@ if __name__ == "__main__":
             # https://matplotlib.org/api/colorbar_api.html
             #
             cax = figure.add_axes([ax.get_position().x1+0.01,ax.get_position().y0,0.02,ax.get_position().height])
-            cbar = plt.colorbar(patch_collection, cax=cax,ticks=ticks_list)
+            cbar = plt.colorbar(frame_collection, cax=cax,ticks=ticks_list)
             cbar.set_label(f'{varname} ({varunits})')
 
-            ax.coastlines(resolution='50m')
-            #ax.stock_img()
-            #ax.add_feature(cfeature.OCEAN)
-            #ax.add_feature(cfeature.LAND, edgecolor='black')
-            #ax.add_feature(cfeature.LAKES, edgecolor='black',facecolor='white')
-            #ax.add_feature(cfeature.RIVERS)
-            ax.add_feature(cfeature.BORDERS)
-            ax.add_feature(cfeature.STATES,linewidth=0.1)
-            gl = ax.gridlines(draw_labels=True,linewidth=0.2, color='gray', alpha=0.7, linestyle='--')
-            gl.xlocator = mticker.FixedLocator([-140,-120, -100, -80, -60])
-            gl.ylocator = mticker.FixedLocator([10,20,30,40,50,60])
-            gl.top_labels = False
-            gl.left_labels = True  #default already
-            gl.right_labels = False
-            gl.bottom_labels = True
-            #gl.ylabel_style = {'rotation': 45}
-
+            with prof.stage("features"):
+                ax.coastlines(resolution='50m')
+                #ax.stock_img()
+                #ax.add_feature(cfeature.OCEAN)
+                #ax.add_feature(cfeature.LAND, edgecolor='black')
+                #ax.add_feature(cfeature.LAKES, edgecolor='black',facecolor='white')
+                #ax.add_feature(cfeature.RIVERS)
+                ax.add_feature(cfeature.BORDERS)
+                ax.add_feature(cfeature.STATES,linewidth=0.1)
+                gl = ax.gridlines(draw_labels=True,linewidth=0.2, color='gray', alpha=0.7, linestyle='--')
+                gl.xlocator = mticker.FixedLocator([-140,-120, -100, -80, -60])
+                gl.ylocator = mticker.FixedLocator([10,20,30,40,50,60])
+                gl.top_labels = False
+                gl.left_labels = True  #default already
+                gl.right_labels = False
+                gl.bottom_labels = True
+                #gl.ylabel_style = {'rotation': 45}
 
             # Create the title as you see fit
             ax.set_title(outtlt)
@@ -703,8 +948,68 @@ if __name__ == "__main__":
 
             figname = os.path.join(outdir,outfile)
             print(f"Saving figure to {figname} ...")
-            figure.savefig(figname, format='png', dpi=100)
-            patch_collection.remove()
+            mpas_profile.save_figure(figure, figname, 100, prof)
+            frame_collection.remove()
             plt.close(figure)
 
             #plt.show()
+
+    prof.finish()
+
+########################################################################
+
+def watch_plots(args):
+    '''Plot the variables of the files matching args.pattern in args.watch as soon as
+       they are complete, the plotting modules and the cell patches stay loaded'''
+
+    import copy
+
+    if not os.path.isdir(args.watch):
+        print(f"ERROR: directory {args.watch} not found.")
+        sys.exit(1)
+
+    import_plot_modules()
+
+    load_patches = PatchCache()
+    varnames     = args.fcstfiles + [args.varname]
+
+    print(f"Watching {os.path.join(args.watch, args.pattern)} for {', '.join(varnames)} ...", flush=True)
+    for fcstfile in mpas_watch.watch_files(args.watch, args.pattern, args.marker, args.poll, args.timeout, args.settle):
+        for varname in varnames:
+            request = copy.copy(args)
+            request.fcstfiles = [fcstfile]
+            request.varname   = varname
+            request.argv      = [fcstfile, varname]
+
+            try:
+                with matplotlib.rc_context():   # plot styles should not leak into the next file
+                    plot_mpas(request, load_patches)
+            except SystemExit as ex:
+                if ex.code not in (None, 0):
+                    print(f"WARNING: plotting {varname} of {fcstfile} exited with {ex.code}.")
+            except Exception as ex:
+                print(f"ERROR: {type(ex).__name__}: {ex}")
+            sys.stdout.flush()
+
+    print(f"No new file in {args.timeout} seconds, stopped watching {args.watch}.")
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    args = parse_args()
+
+    if args.watch is not None:
+        watch_plots(args)
+        sys.exit(0)
+
+    if args.socket is not None:
+        status = request_plot(args.socket, sys.argv[1:])
+        if status is not None:
+            sys.exit(status)
+
+    plot_mpas(args)
@@ -438,6 +438,12 @@ if __name__ == "__main__":
     #patch_collection = get_mpas_patches(gridfile, picklefile)
     patch_collection = load_mpas_patches(picklefile)
 
+    # Patch files from get_mpaspatches.py keep the cells in Hilbert order, see mpas_cellorder.py
+    cell_order = getattr(patch_collection, "cell_order", None)
+    if cell_order is not None and len(cell_order) != nCells:
+        print(f"ERROR: the patch file is for a mesh of {len(cell_order)} cells, the forecast file has {nCells} cells.")
+        sys.exit(-1)
+
     times = [0]
     for t in times:
         for l in levels:
@@ -459,6 +465,9 @@ if __name__ == "__main__":
                 print(f"Variable {varname} is in wrong shape: {varshapes}.")
                 sys.exit(0)
 
+            if cell_order is not None:
+                varplt = varplt[cell_order]
+
             color_map, cmin, cmax = get_var_contours(varname,varplt,(general_colormap,ref_colormap),cntlevel)
 
             figure = plt.figure(figsize = (12,12) )
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+#
+# This module runs "plot_mpaspatch.py" as a long-running local plot server.
+#
+# The heavy modules (Matplotlib, Cartopy, MetPy, netCDF4) are imported once
+# and the MPAS cell patches are unpickled once per patch file, then kept in
+# memory. Plot requests are accepted over a Unix socket, so that the cost of
+# each image is essentially the rendering time only.
+#
+# Start the server on a node with:
+#
+#   plot_mpaspatch_server.py -p wofs_mpas.1894063.patches /tmp/plot_mpas.sock &
+#
+# then send requests with the usual arguments of "plot_mpaspatch.py" plus the
+# socket name, for example:
+#
+#   plot_mpaspatch.py -s /tmp/plot_mpas.sock -p wofs_mpas.1894063.patches \
+#                     -o fcst wofs_mpas.diag.2023-04-14_01.00.00.nc refl10cm_max
+#
+# The request falls back to plotting locally when the server is not running.
+# Stop the server with "plot_mpaspatch_server.py --stop /tmp/plot_mpas.sock".
+#
+#-----------------------------------------------------------------------
+#
+# By agent (2026.10.19)
+#
+#-----------------------------------------------------------------------
+
+import os
+import sys
+import json
+import socket
+import signal
+import argparse
+import contextlib
+
+import matplotlib
+
+import plot_mpaspatch as pmp
+
+########################################################################
+
+def handle_request(request, load_patches):
+    '''Run one plot request, returns its exit status'''
+
+    status = 0
+    cwd    = os.getcwd()
+    try:
+        os.chdir(request["cwd"])
+        args = pmp.parse_args(request["argv"])
+        with matplotlib.rc_context():          # plot styles should not leak into the next request
+            pmp.plot_mpas(args, load_patches)
+    except SystemExit as ex:
+        status = ex.code if isinstance(ex.code, int) else (0 if ex.code is None else 1)
+    except Exception as ex:
+        print(f"ERROR: {type(ex).__name__}: {ex}")
+        status = -1
+    finally:
+        os.chdir(cwd)
+
+    return status
+
+########################################################################
+
+def serve_plots(sockname, patchfiles, verbose=False):
+    '''Accept plot requests on the Unix socket until a "shutdown" request is received'''
+
+    pmp.import_plot_modules()
+
+    load_patches = pmp.PatchCache()
+    for patchfile in patchfiles:
+        load_patches(patchfile)
+
+    if os.path.exists(sockname):
+        os.remove(sockname)
+
+    # Make sure the socket file is removed when the job is cancelled
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(sockname)
+        server.listen()
+        print(f"Plot server is listening on {sockname} ...", flush=True)
+
+        while True:
+            conn, _ = server.accept()
+            with conn, conn.makefile('rw') as stream:
+                try:
+                    request = json.loads(stream.readline())
+                except ValueError:
+                    continue
+
+                if request.get("command") == "shutdown":
+                    stream.write(f"{pmp.STATUS_TAG}0\n")
+                    break
+
+                if verbose:
+                    print(f"Request: {' '.join(request['argv'])}", flush=True)
+
+                with contextlib.redirect_stdout(stream):
+                    status = handle_request(request, load_patches)
+
+                try:
+                    stream.write(f"{pmp.STATUS_TAG}{status}\n")
+                    stream.flush()
+                except OSError:
+                    pass            # client has gone away
+
+    finally:
+        server.close()
+        if os.path.exists(sockname):
+            os.remove(sockname)
+
+    print("Plot server stopped.")
+
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+#
+# Main function defined to return correct sys.exit() calls
+#
+#@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Serve plot_mpaspatch.py requests over a Unix socket',
+                                     epilog='''        ---- agent (2026-10-19).
+                                            ''')
+
+    parser.add_argument('socket',help='Name of the Unix socket to listen on')
+
+    parser.add_argument('-v','--verbose',   help='Verbose output',                                   action="store_true", default=False)
+    parser.add_argument('-p','--patchfile', help='MPAS patch file to be loaded at startup, can be repeated', action="append", default=[])
+    parser.add_argument('--stop',           help='Stop the server listening on the socket',          action="store_true", default=False)
+
+    args = parser.parse_args()
+
+    if args.stop:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(args.socket)
+            client.sendall(json.dumps({"command": "shutdown"}).encode()+b"\n")
+            client.recv(64)
+        sys.exit(0)
+
+    serve_plots(args.socket, args.patchfile, args.verbose)
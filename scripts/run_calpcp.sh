@@ -1,12 +1,10 @@
 #!/bin/bash
 
-module load wgrib2/2.0.8
-
 function usage {
     echo " "
     echo "    USAGE: $0 [options] [ENDHOUR] [WORKDIR] "
     echo " "
-    echo "    PURPOSE: Calculate hourly PCP from accumulated PCP in MPAS grib2 files using wgrib2."
+    echo "    PURPOSE: Calculate hourly PCP from accumulated PCP in MPAS grib2 files using mpas_pcp.py."
     echo "             Assume MPAS grib2 file pattern: MPAS-A_yyyymmddHH_XXfHY.grib2"
     echo "             Output grib2 file pattern     : MPAS-A_PCP_yyyymmddHH_XXfHY.grib2"
     echo " "
@@ -33,6 +31,9 @@ function usage {
 
 wrkdir='./'
 
+scpdir="$( cd "$( dirname "$0" )" && pwd )"              # dir of script
+pythondir=$(realpath $(dirname $scpdir))/python
+
 starthour=0
 endhour=48
 
@@ -105,62 +106,13 @@ else
     echo "Case name        : $castr"
 fi
 
-for hr2 in $(seq $starthour $endhour); do
-
-    hr2str=$(printf "%02d" $hr2)
-    infile2="MPAS-A_${dtstr}_${castr}f$hr2str.grib2"
-
-    final_file="HR_PCP_${dtstr}_${castr}f$hr2str.grib2"
-
-    if [[ -e $final_file ]]; then
-        echo "File: $final_file exists. Skiping hour: $hr2str."
-        continue
-    fi
-
-    #while [[ ! -e done.upp_${hr2str} ]]; do
-    #    echo "Waiting for done.upp_${hr2str}"
-    #    sleep 10
-    #done
-
-    if [[ $hr2 -lt 2 ]]; then
-        cp $infile2 $final_file
-    else
-        echo $hr2
-        hr1=$((10#$hr2-1))
-        hr1str=$(printf "%02d" $hr1)
-
-        infile1="MPAS-A_${dtstr}_${castr}f${hr1str}.grib2"
-
-        tmpfile1="pcp1.grib2"
-        tmpfile2="pcp2.grib2"
-        tmpfile3="pcp3.grib2"
-
-        #while [[ ! -e done.upp_${hr1str} ]]; do
-        #    echo "Waiting for done.upp_${hr1str}"
-        #    sleep 10
-        #done
-
-        #wgrib2 $infile1 -match_fs "APCP" -grib_out $tmpfile1
-        #wgrib2 $infile2 -match_fs "APCP" -grib_out $tmpfile2
-        wgrib2 $infile1 -for 98:98 -grib_out $tmpfile1
-        wgrib2 $infile2 -for 98:98 -grib_out $tmpfile2
-
-        wgrib2 $tmpfile1 -rpn sto_1 -import_grib $tmpfile2 -rpn sto_2 -set_grib_type same \
-            -if_reg "1:2" -rpn "rcl_2:rcl_1:-:clr_1:clr_2" -set_scaling same same \
-            -set_ftime "${hr1}-${hr2} hour acc fcst" -grib_out ${tmpfile3}
-
-        #echo "$infile2 -> $final_file ...."
-        #cat ${infile2} ${tmpfile3} > ${final_file}
-        mv ${tmpfile3} ${final_file}
-
-        #tmpfile="nopcp.grib2"
-        #wgrib2 ${outfile} -not APCP -grib ${tmpfile}
-        #cat ${tmpfile3} >> ${tmpfile}
-        #wgrib2 ${tmpfile} -new_grid_vectors "UGRD:VGRD:USTM:VSTM:VUCSH:VVCSH" -submsg_uv ${final_file}
-
-        rm -rf ${tmpfile} ${tmpfile1} ${tmpfile2} ${tmpfile3}
-    fi
+#
+# One Python process for all hours, the APCP field of the previous hour is kept in memory
+#
+# shellcheck source=/dev/null # to ignore source path error
+source $HOME/.python
+conda activate wofs_post
 
-done
+python3 ${pythondir}/mpas_pcp.py -s $starthour -e $endhour -p HR_PCP --hourly ./ || exit 1
 
 exit 0